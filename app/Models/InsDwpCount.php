@@ -40,6 +40,61 @@ protected static function boot()
         });
     }
 
+    /**
+     * Decode a pv value to the legacy shape ['waveforms' => [[th], [side]], 'timestamps' => [...], 'quality' => [...]]
+     *
+     * Accepts the plain JSON format as well as the compact format 2 written by
+     * the Python poller (DWP_PV_ENCODING=compact, see py/dwp-poll/waveform_codec.py).
+     */
+    public static function decodePv($pv): array
+    {
+        $data = is_string($pv) ? json_decode($pv, true) : $pv;
+        if (!is_array($data)) {
+            return [];
+        }
+        if (($data['v'] ?? 1) != 2 || !isset($data['data'])) {
+            return $data;
+        }
+
+        $raw = gzuncompress(base64_decode($data['data']));
+        if ($raw === false) {
+            return [];
+        }
+        $n = (int) ($data['n'] ?? 0);
+        $values = strlen($raw) ? array_values(unpack('v*', $raw)) : [];
+
+        // TH/Side are stored as first value + differences (mod 2^16)
+        $undelta = function (array $deltas): array {
+            $out = [];
+            $acc = 0;
+            foreach ($deltas as $d) {
+                $acc = ($acc + $d) & 0xFFFF;
+                $out[] = $acc;
+            }
+            return $out;
+        };
+
+        $timestamps = [];
+        if (isset($data['t0'])) {
+            $t = (int) $data['t0'];
+            $timestamps[] = $t;
+            foreach (array_slice($values, 2 * $n) as $gap) {
+                $t += $gap;
+                $timestamps[] = $t;
+            }
+        }
+
+        unset($data['v'], $data['enc'], $data['n'], $data['t0'], $data['data']);
+
+        return array_merge([
+            'waveforms' => [
+                $undelta(array_slice($values, 0, $n)),
+                $undelta(array_slice($values, $n, $n)),
+            ],
+            'timestamps' => $timestamps,
+        ], $data);
+    }
+
     /**
      * Get the device that manages this line
      */
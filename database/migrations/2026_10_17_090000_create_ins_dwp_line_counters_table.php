@@ -0,0 +1,33 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        // Last ins_dwp_counts.count handed out per line. The DWP poller reserves
+        // counts here atomically, in the same transaction as the insert, so
+        // several poller processes can never write the same count twice.
+        Schema::create('ins_dwp_line_counters', function (Blueprint $table) {
+            $table->id();
+            $table->timestamps();
+
+            $table->string('line')->unique(); // Same identifier as ins_dwp_counts.line
+            $table->unsignedBigInteger('count')->default(0); // Last count used on this line
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::dropIfExists('ins_dwp_line_counters');
+    }
+};
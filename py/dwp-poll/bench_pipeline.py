@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Replay / benchmark harness for the DWP cycle pipeline.
+
+Feeds synthetic (or recorded) TH/Side streams for N machines through
+DWPPoller.process_machine at accelerated time: a virtual clock advances one
+poll interval per tick and nothing sleeps. Finished cycles go through the
+real save queue, save workers, analysis and DatabaseManager batching; only
+the final INSERT is replaced by an in-memory table.
+
+Reports cycles/sec, per-stage latency percentiles and (optionally) memory
+allocations, so the poller can be sized for new lines without live presses.
+
+With --devices the whole poller runs instead, in real time: every device
+gets its polling task and reconnect supervisor, reading a simulated gateway
+(register_sources.SimulatedRegisterSource) with the given latency, drops
+and timeouts. That reports the tick budget, event loop lag and CPU use of a
+floor of that size.
+
+Usage:
+    python bench_pipeline.py --machines 40 --minutes 30
+    python bench_pipeline.py --machines 8 --replay cycles.jsonl --trace-alloc
+    python bench_pipeline.py --devices 100 --seconds 60 --drop-rate 0.001 --timeout-rate 0.001
+
+`--replay` takes a file with one `pv` value per line (JSON as stored in
+ins_dwp_counts, either encoding); each machine loops over those waveforms.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+import tracemalloc
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+
+import dwp_poll
+from dwp_poll import DatabaseManager, DeviceConfig, DWPPoller, MachineConfig
+from waveform_codec import decode_pv
+
+MACHINES_PER_DEVICE = 4
+
+
+# ----------------------------
+# IN-MEMORY DATABASE
+# ----------------------------
+class MemoryPool:
+    """Placeholder so DatabaseManager treats the "connection" as up."""
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class MemoryDatabaseManager(DatabaseManager):
+    """DatabaseManager with the real queueing, batching, counters and row
+    building, but the multi-row INSERT goes to a list."""
+
+    def __init__(self):
+        super().__init__({})
+        self.rows: List[tuple] = []
+        self.insert_ms: List[float] = []
+
+    async def connect(self):
+        self.pool = MemoryPool()
+        self.line_counts_seeded = True
+        self.flush_task = asyncio.create_task(self._flush_loop(), name="db-flush")
+
+    async def insert_cycles(self, cycles: List[dict]):
+        started = time.perf_counter()
+        for cycle_data in cycles:
+            line = cycle_data["line"]
+            self.line_counts[line] = self.line_counts.get(line, 0) + 1
+            self.rows.append(self.build_count_row(cycle_data, self.line_counts[line]))
+        self.insert_ms.append((time.perf_counter() - started) * 1000)
+
+    async def flush_status(self, force: bool = False) -> int:
+        # device status rows are not part of the benchmark
+        self.pending_status.clear()
+        return 0
+
+
+# ----------------------------
+# SIGNAL SOURCES
+# ----------------------------
+def synthetic_cycle(rng: random.Random, interval: float) -> Tuple[List[int], List[int]]:
+    """One press cycle: ramp up, hold with noise, release; 6-15 s long."""
+    n = int(rng.uniform(6, 15) / interval)
+    th_peak, side_peak = rng.randint(28, 50), rng.randint(28, 50)
+    ramp = max(2, n // 6)
+    th, side = [], []
+    for i in range(n):
+        shape = min(1.0, i / ramp, (n - 1 - i) / ramp)
+        th.append(max(0, int(th_peak * shape + rng.randint(-1, 1))))
+        side.append(max(0, int(side_peak * shape + rng.randint(-1, 1))))
+    return th, side
+
+
+def recorded_cycles(path: str) -> List[Tuple[List[int], List[int]]]:
+    cycles = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            pv = decode_pv(line)
+            waveforms = (pv or {}).get("waveforms") or []
+            if len(waveforms) == 2 and waveforms[0]:
+                cycles.append((list(waveforms[0]), list(waveforms[1])))
+    if not cycles:
+        raise SystemExit(f"No waveforms found in {path}")
+    return cycles
+
+
+def machine_stream(
+    rng: random.Random, interval: float, recorded: Optional[List[Tuple[List[int], List[int]]]]
+) -> Iterator[Tuple[int, int, int, int]]:
+    """Endless (th_l, th_r, side_l, side_r) samples with idle gaps between cycles."""
+    while True:
+        for _ in range(int(rng.uniform(1, 4) / interval)):
+            yield 0, 0, 0, 0
+        th, side = rng.choice(recorded) if recorded else synthetic_cycle(rng, interval)
+        # R position runs the same stroke slightly weaker
+        for t, s in zip(th, side):
+            yield t, max(0, t - 2), s, max(0, s - 2)
+
+
+# ----------------------------
+# REPORTING
+# ----------------------------
+def percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return (
+        f"n={len(ordered):>7}  p50={pick(50):8.3f}  p95={pick(95):8.3f}  "
+        f"p99={pick(99):8.3f}  max={ordered[-1]:8.3f} ms"
+    )
+
+
+# ----------------------------
+# BENCHMARK
+# ----------------------------
+async def run_benchmark(args) -> List[str]:
+    rng = random.Random(args.seed)
+    interval = dwp_poll.POLL_INTERVAL_SEC
+    recorded = recorded_cycles(args.replay) if args.replay else None
+
+    poller = DWPPoller()
+    poller.db = MemoryDatabaseManager()
+    virtual_now = [1_700_000_000.0]
+    poller.clock = lambda: virtual_now[0]
+    poller.monotonic = lambda: virtual_now[0] - 1_700_000_000.0
+
+    machines: List[Tuple[str, MachineConfig, Iterator]] = []
+    for i in range(args.machines):
+        dev_id = i // MACHINES_PER_DEVICE + 1
+        line = f"B{dev_id}"
+        base = 100 + (i % MACHINES_PER_DEVICE) * 4
+        machine = MachineConfig(f"mc{i % MACHINES_PER_DEVICE + 1}", base, base + 1, base + 2, base + 3)
+        dev = poller.devices.setdefault(dev_id, DeviceConfig(dev_id, f"Bench-{dev_id}", "sim", {}))
+        dev.lines.setdefault(line, []).append(machine)
+        machines.append((line, machine, machine_stream(rng, interval, recorded)))
+
+    # Stage timing by wrapping the pipeline entry points
+    sample_ms: List[float] = []
+    queue_wait_ms: List[float] = []
+    analysis_ms: List[float] = []
+    enqueued_at: deque = deque()
+
+    original_enqueue = poller.enqueue_cycle
+    original_save = poller.save_cycle_to_db
+
+    def timed_enqueue(*a, **kw):
+        ok = original_enqueue(*a, **kw)
+        if ok:
+            enqueued_at.append(time.perf_counter())
+        return ok
+
+    async def timed_save(*a, **kw):
+        started = time.perf_counter()
+        # workers take items FIFO, so the oldest enqueue time is this cycle's
+        if enqueued_at:
+            queue_wait_ms.append((started - enqueued_at.popleft()) * 1000)
+        try:
+            return await original_save(*a, **kw)
+        finally:
+            analysis_ms.append((time.perf_counter() - started) * 1000)
+
+    poller.enqueue_cycle = timed_enqueue
+    poller.save_cycle_to_db = timed_save
+
+    ticks = int(args.minutes * 60 / interval)
+    await poller.db.connect()
+    poller.start_cycle_workers()
+
+    if args.trace_alloc:
+        tracemalloc.start(10)
+    alloc_before = tracemalloc.take_snapshot() if args.trace_alloc else None
+
+    wall_start = time.perf_counter()
+    for _ in range(ticks):
+        virtual_now[0] += interval
+        for line, machine, stream in machines:
+            th_l, th_r, side_l, side_r = next(stream)
+            values = {
+                machine.addr_th_l: th_l,
+                machine.addr_th_r: th_r,
+                machine.addr_side_l: side_l,
+                machine.addr_side_r: side_r,
+            }
+            started = time.perf_counter()
+            await poller.process_machine(line, machine, values)
+            sample_ms.append((time.perf_counter() - started) * 1000)
+        # the daemon's timeout_sweep_loop, driven by the virtual clock
+        poller.sweep_timeouts(poller.monotonic())
+        # let the save workers and the flush task run between ticks
+        await asyncio.sleep(0)
+    await poller.stop_cycle_workers(timeout=60)
+    await poller.db.close()
+    wall = time.perf_counter() - wall_start
+
+    alloc_report = []
+    if args.trace_alloc:
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().compare_to(alloc_before, "lineno")
+        tracemalloc.stop()
+        alloc_report.append(f"traced memory: current={current / 1024:.0f} KiB peak={peak / 1024:.0f} KiB")
+        for stat in stats[:8]:
+            alloc_report.append(f"  {stat}")
+
+    simulated = ticks * interval
+    rows = len(poller.db.rows)
+    stats = poller.queue_stats
+    return [
+        "",
+        "=" * 78,
+        f"DWP pipeline benchmark — {args.machines} machines, {simulated / 60:.1f} simulated min",
+        "=" * 78,
+        f"wall time        : {wall:.2f}s  (x{simulated / wall:.0f} real time)",
+        f"samples          : {ticks * args.machines * 2}  ({ticks * args.machines * 2 / wall:,.0f}/s)",
+        f"cycles enqueued  : {stats['enqueued']}  dropped={stats['dropped']}  max queue depth={stats['max_depth']}",
+        f"rows written     : {rows}  ({rows / wall:,.1f} cycles/s)",
+        f"tick budget used : {sum(sample_ms) / ticks:.3f} ms per {interval * 1000:.0f} ms tick (sampling only)",
+        "latency per stage:",
+        f"  sample   {percentiles(sample_ms)}",
+        f"  queue    {percentiles(queue_wait_ms)}",
+        f"  analysis {percentiles(analysis_ms)}",
+        f"  db write {percentiles(poller.db.insert_ms)}",
+        *alloc_report,
+    ]
+
+
+async def run_live_benchmark(args) -> List[str]:
+    interval = dwp_poll.POLL_INTERVAL_SEC
+    poller = DWPPoller()
+    poller.db = MemoryDatabaseManager()
+    settings = {
+        "latency": args.latency_ms / 1000,
+        "jitter": args.jitter_ms / 1000,
+        "drop_rate": args.drop_rate,
+        "timeout_rate": args.timeout_rate,
+        "timeout": dwp_poll.MODBUS_TIMEOUT_SEC,
+    }
+    poller.source_factory = lambda dev: poller.simulated_source(dev, **settings)
+    for dev_id in range(1, args.devices + 1):
+        machines = []
+        for m in range(MACHINES_PER_DEVICE):
+            base = 100 + m * 4
+            machines.append(MachineConfig(f"mc{m + 1}", base, base + 1, base + 2, base + 3))
+        poller.devices[dev_id] = DeviceConfig(dev_id, f"Sim-{dev_id}", f"sim-{dev_id}", {f"S{dev_id}": machines})
+
+    # Stage timing by wrapping the poller's entry points
+    read_ms: List[float] = []
+    process_ms: List[float] = []
+    lag_ms: List[float] = []
+    connects = [0]
+    original_read = poller.read_registers
+    original_process = poller.process_machine
+    original_connect = poller.connect_device
+
+    async def timed_read(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return await original_read(*a, **kw)
+        finally:
+            read_ms.append((time.perf_counter() - started) * 1000)
+
+    async def timed_process(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return await original_process(*a, **kw)
+        finally:
+            process_ms.append((time.perf_counter() - started) * 1000)
+
+    async def counted_connect(*a, **kw):
+        connects[0] += 1
+        return await original_connect(*a, **kw)
+
+    async def measure_lag():
+        # how late a 10 ms timer fires = how long the loop was busy
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag_ms.append(max(0.0, (time.perf_counter() - started - 0.01) * 1000))
+
+    poller.read_registers = timed_read
+    poller.process_machine = timed_process
+    poller.connect_device = counted_connect
+
+    await poller.db.connect()
+    await poller.connect_clients()
+    poller.start_cycle_workers()
+    background = [
+        asyncio.create_task(poller.timeout_sweep_loop(), name="cycle-timeouts"),
+        asyncio.create_task(measure_lag(), name="loop-lag"),
+    ]
+    polls_before = dwp_poll.MACHINE_POLLS.get()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for dev in poller.devices.values():
+        poller.start_device(dev)
+    await asyncio.sleep(args.seconds)
+    poller.running = False
+    poller.shutdown_event.set()
+    tasks = [*poller.device_tasks.values(), *poller.supervisor_tasks.values(), *background]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    await poller.stop_cycle_workers(timeout=60)
+    await poller.db.close()
+
+    machines = args.devices * MACHINES_PER_DEVICE
+    ticks = wall / interval
+    polls = dwp_poll.MACHINE_POLLS.get() - polls_before
+    missed = sum(poller.missed_ticks.values())
+    online = sum(1 for st in poller.device_states.values() if st.get("status") == "online")
+    stats = poller.queue_stats
+    return [
+        "",
+        "=" * 78,
+        f"DWP poller benchmark — {args.devices} simulated devices, {machines} machines, {wall:.0f}s",
+        "=" * 78,
+        f"gateway          : latency {args.latency_ms:g}+U(0,{args.jitter_ms:g}) ms, "
+        f"drop rate {args.drop_rate:g}, timeout rate {args.timeout_rate:g}",
+        f"CPU              : {cpu:.2f}s  ({cpu / wall:.0%} of one core)",
+        f"modbus requests  : {len(read_ms)}  ({len(read_ms) / wall:,.0f}/s)",
+        f"machine samples  : {polls:.0f}  ({polls / (machines * ticks):.0%} of fixed {interval * 1000:.0f} ms polling)",
+        f"missed ticks     : {missed}  ({missed / (args.devices * ticks):.2%} of device ticks)",
+        f"reconnects       : {connects[0] - args.devices}  online at end={online}/{args.devices}",
+        f"cycles enqueued  : {stats['enqueued']}  dropped={stats['dropped']}  rows written={len(poller.db.rows)}",
+        f"tick budget used : {sum(process_ms) / ticks:.3f} ms per {interval * 1000:.0f} ms tick (sampling only)",
+        "latency:",
+        f"  read     {percentiles(read_ms)}",
+        f"  sample   {percentiles(process_ms)}",
+        f"  loop lag {percentiles(lag_ms)}",
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DWP pipeline replay benchmark")
+    parser.add_argument("--machines", "-n", type=int, default=16, help="Number of simulated machines")
+    parser.add_argument("--minutes", type=float, default=10, help="Simulated production time")
+    parser.add_argument("--replay", help="File with one recorded pv JSON per line")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace-alloc", action="store_true", help="Report allocations with tracemalloc")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Keep the poller's own output")
+    live = parser.add_argument_group("live poller against simulated gateways")
+    live.add_argument("--devices", type=int, help="Run the real poller with this many simulated devices")
+    live.add_argument("--seconds", type=float, default=60, help="Real time to run")
+    live.add_argument("--latency-ms", type=float, default=5, help="Base latency per Modbus request")
+    live.add_argument("--jitter-ms", type=float, default=5, help="Extra random latency per request")
+    live.add_argument("--drop-rate", type=float, default=0.0, help="Chance a request drops the connection")
+    live.add_argument("--timeout-rate", type=float, default=0.0, help="Chance a request times out")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("DWP").setLevel(logging.WARNING)
+    report = asyncio.run(run_live_benchmark(args) if args.devices else run_benchmark(args))
+    print("\n".join(report))
+
+
+if __name__ == "__main__":
+    main()
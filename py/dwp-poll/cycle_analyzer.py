@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from cycle_splitter import DEFAULT_END_THRESHOLD, DEFAULT_MIN_ZERO_GAP, CycleSegment
+from waveform_checks import WaveformStats
+
+# Streaming analysis of one position's cycle. CycleState feeds every sample
+# to a CycleAnalyzer as it is polled; when the cycle ends, summary() hands the
+# save worker everything it used to recompute over the whole buffer:
+#   - WaveformStats for the sanity checks and std_error flags (running
+#     min/max, counts above 5, first impossible jump, interval median)
+#   - the peaks scipy.signal.find_peaks(combined, height, distance) would
+#     report on max(TH, Side)
+#   - the find_cycle_segments() split boundaries for those peaks
+# Each push() is O(1) amortised and summary() is O(peaks), so ending a cycle
+# no longer rescans the buffer.
+#
+# Peaks follow scipy's rules: a peak is the middle of a strict local maximum
+# or flat plateau (never the first or last sample), at least `peak_height`
+# high; peaks closer than `peak_distance` are thinned by keeping the highest
+# (ties: the later one). Peaks only compete within a cluster of consecutive
+# peaks less than `peak_distance` apart, so each cluster is settled as soon as
+# the next peak is far enough away.
+
+DEFAULT_PEAK_HEIGHT = 1
+DEFAULT_PEAK_DISTANCE = 3
+
+
+class CycleSummary(NamedTuple):
+    stats: WaveformStats
+    peaks: List[int]
+    segments: List[CycleSegment]
+    first_ts_ms: Optional[int]
+    last_ts_ms: Optional[int]
+
+
+def _median_interval(counts: Dict[int, int]) -> Optional[int]:
+    """max(1, int(np.median(diffs))) of the positive intervals, from their histogram."""
+    total = sum(counts.values())
+    if not total:
+        return None
+    wanted = [(total - 1) // 2, total // 2]  # the one or two middle ranks
+    found = []
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        while wanted and wanted[0] < seen:
+            found.append(value)
+            wanted.pop(0)
+        if not wanted:
+            break
+    return max(1, int((found[0] + found[1]) / 2))
+
+
+class CycleAnalyzer:
+    __slots__ = (
+        "end_threshold",
+        "min_zero_gap",
+        "peak_height",
+        "peak_distance",
+        "n",
+        # running waveform statistics
+        "max_th",
+        "min_th",
+        "max_side",
+        "min_side",
+        "th_over_5",
+        "side_over_5",
+        "prev_th",
+        "prev_side",
+        "first_hard_jump",
+        "large_jumps",
+        "intervals",
+        "first_ts",
+        "last_ts",
+        # peak detection on the combined signal
+        "prev_c",
+        "plateau_start",
+        "plateau_value",
+        "cluster",
+        "peaks",
+        # above-threshold runs and split candidates (long low runs)
+        "high_start",
+        "high_ends",
+        "low_start",
+        "gaps",
+    )
+
+    def __init__(
+        self,
+        end_threshold: int = DEFAULT_END_THRESHOLD,
+        min_zero_gap: int = DEFAULT_MIN_ZERO_GAP,
+        peak_height: int = DEFAULT_PEAK_HEIGHT,
+        peak_distance: int = DEFAULT_PEAK_DISTANCE,
+    ):
+        self.end_threshold = end_threshold
+        self.min_zero_gap = min_zero_gap
+        self.peak_height = peak_height
+        self.peak_distance = peak_distance
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.max_th = self.min_th = self.max_side = self.min_side = 0
+        self.th_over_5 = self.side_over_5 = 0
+        self.prev_th = self.prev_side = 0
+        self.first_hard_jump: Optional[Tuple[int, int, int]] = None
+        self.large_jumps: List[Tuple[int, int, int]] = []
+        self.intervals: Dict[int, int] = {}
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.prev_c = 0
+        self.plateau_start = -1
+        self.plateau_value = 0
+        # unsettled peaks as (index, height, run_start)
+        self.cluster: List[Tuple[int, int, int]] = []
+        # settled peaks as (index, run_start)
+        self.peaks: List[Tuple[int, int]] = []
+        self.high_start = -1
+        self.high_ends: Dict[int, int] = {}  # run start -> run end (inclusive)
+        self.low_start = -1
+        self.gaps: List[Tuple[int, int]] = []  # low runs of at least min_zero_gap samples
+
+    def push(self, th: int, side: int, ts_ms: Optional[int] = None):
+        i = self.n
+        c = th if th > side else side
+
+        # --- waveform statistics
+        if i == 0:
+            self.max_th = self.min_th = th
+            self.max_side = self.min_side = side
+        else:
+            if th > self.max_th:
+                self.max_th = th
+            elif th < self.min_th:
+                self.min_th = th
+            if side > self.max_side:
+                self.max_side = side
+            elif side < self.min_side:
+                self.min_side = side
+            if self.first_hard_jump is None:
+                dth = abs(th - self.prev_th)
+                dside = abs(side - self.prev_side)
+                if dth > 40 or dside > 40:
+                    self.first_hard_jump = (i, dth, dside)
+                elif dth > 30 or dside > 30:
+                    self.large_jumps.append((i, dth, dside))
+        if th > 5:
+            self.th_over_5 += 1
+        if side > 5:
+            self.side_over_5 += 1
+        self.prev_th, self.prev_side = th, side
+
+        if ts_ms is not None:
+            if self.last_ts is not None:
+                gap = ts_ms - self.last_ts
+                if gap > 0:
+                    self.intervals[gap] = self.intervals.get(gap, 0) + 1
+            else:
+                self.first_ts = ts_ms
+            self.last_ts = ts_ms
+
+        # --- peaks (uses the run bookkeeping as of sample i - 1)
+        if i > 0:
+            if self.plateau_start >= 0:
+                if c < self.plateau_value:
+                    peak = (self.plateau_start + i - 1) // 2
+                    if self.plateau_value >= self.peak_height:
+                        above = self.plateau_value > self.end_threshold
+                        self.add_peak(peak, self.plateau_value, self.high_start if above else peak)
+                    self.plateau_start = -1
+                elif c > self.plateau_value:
+                    self.plateau_start, self.plateau_value = i, c
+            elif self.prev_c < c:
+                self.plateau_start, self.plateau_value = i, c
+        self.prev_c = c
+
+        # --- above/below end_threshold runs
+        if c > self.end_threshold:
+            if self.high_start < 0:
+                self.high_start = i
+            if self.low_start >= 0:
+                if i - self.low_start >= self.min_zero_gap:
+                    self.gaps.append((self.low_start, i - 1))
+                self.low_start = -1
+        else:
+            if self.low_start < 0:
+                self.low_start = i
+            if self.high_start >= 0:
+                self.high_ends[self.high_start] = i - 1
+                self.high_start = -1
+
+        self.n = i + 1
+
+    def add_peak(self, index: int, height: int, run_start: int):
+        if self.cluster and index - self.cluster[-1][0] >= self.peak_distance:
+            self.peaks.extend(self.settle(self.cluster))
+            self.cluster = []
+        self.cluster.append((index, height, run_start))
+
+    def settle(self, cluster: List[Tuple[int, int, int]]) -> List[Tuple[int, int]]:
+        """Thin a cluster of close peaks the way find_peaks(distance=...) does."""
+        if len(cluster) == 1:
+            return [(cluster[0][0], cluster[0][2])]
+        keep = [True] * len(cluster)
+        # highest first; stable sort, so equal heights go later index first
+        for j in reversed(sorted(range(len(cluster)), key=lambda k: cluster[k][1])):
+            if not keep[j]:
+                continue
+            k = j - 1
+            while k >= 0 and cluster[j][0] - cluster[k][0] < self.peak_distance:
+                keep[k] = False
+                k -= 1
+            k = j + 1
+            while k < len(cluster) and cluster[k][0] - cluster[j][0] < self.peak_distance:
+                keep[k] = False
+                k += 1
+        return [(p[0], p[2]) for p, kept in zip(cluster, keep) if kept]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def summary(self) -> CycleSummary:
+        """Results for the samples pushed so far (the analyzer keeps going)."""
+        peaks = self.peaks + (self.settle(self.cluster) if self.cluster else [])
+        gaps = self.gaps
+        if self.low_start >= 0 and self.n - self.low_start >= self.min_zero_gap:
+            gaps = gaps + [(self.low_start, self.n - 1)]
+
+        segments: List[CycleSegment] = []
+        prev_peak = None
+        g = 0
+        for number, (peak, run_start) in enumerate(peaks):
+            if prev_peak is not None:
+                # split only if min_zero_gap low samples lie strictly between the peaks
+                a, b = prev_peak + 1, peak - 1
+                while g < len(gaps) and gaps[g][1] < a:
+                    g += 1
+                has_gap = False
+                k = g
+                while k < len(gaps) and gaps[k][0] <= b:
+                    if min(gaps[k][1], b) - max(gaps[k][0], a) + 1 >= self.min_zero_gap:
+                        has_gap = True
+                        break
+                    k += 1
+                if not has_gap:
+                    prev_peak = peak
+                    continue
+            prev_peak = peak
+            if run_start == peak and not self.is_high_run(run_start):
+                end = peak
+            else:
+                end = self.high_ends.get(run_start, self.n - 1)
+            segments.append(CycleSegment(number, peak, run_start, end))
+
+        stats = WaveformStats(
+            length=self.n,
+            max_th=self.max_th,
+            min_th=self.min_th,
+            max_side=self.max_side,
+            min_side=self.min_side,
+            th_over_5=self.th_over_5,
+            side_over_5=self.side_over_5,
+            first_hard_jump=self.first_hard_jump,
+            large_jumps=tuple(self.large_jumps),
+            median_interval_ms=_median_interval(self.intervals),
+        )
+        return CycleSummary(stats, [p for p, _ in peaks], segments, self.first_ts, self.last_ts)
+
+    def is_high_run(self, start: int) -> bool:
+        return start in self.high_ends or start == self.high_start
+
+
+def analyze_buffer(
+    th_buf: Sequence[int],
+    side_buf: Sequence[int],
+    timestamps_ms: Optional[Sequence[int]] = None,
+    **kwargs,
+) -> CycleSummary:
+    """Run a whole buffer through a CycleAnalyzer (cycles without a live analyzer)."""
+    analyzer = CycleAnalyzer(**kwargs)
+    if timestamps_ms:
+        for th, side, ts in zip(th_buf, side_buf, timestamps_ms):
+            analyzer.push(th, side, ts)
+    else:
+        for th, side in zip(th_buf, side_buf):
+            analyzer.push(th, side)
+    return analyzer.summary()
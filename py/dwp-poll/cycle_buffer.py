@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import heapq
+from array import array
+from typing import Any, List, Optional, Tuple
+
+from cycle_analyzer import CycleAnalyzer
+
+# Compact per-position cycle state for the poller. Each position owns four
+# preallocated typed arrays (TH and side as unsigned 16-bit registers, wall and
+# monotonic sample timestamps as doubles) that are reused for every cycle, so
+# appending a sample only writes into existing slots instead of boxing new
+# Python objects. Durations are measured on the monotonic clock so NTP steps
+# of the wall clock cannot stretch or shrink a cycle.
+# Every stored sample is also fed to a CycleAnalyzer, so peaks, split points
+# and the waveform statistics are ready the moment the cycle ends.
+# The buffer never wraps: when it is full the poller force-saves the cycle as
+# OVERFLOW and starts over from index 0.
+#
+# Cycle timeouts are not checked per sample: every start() registers a
+# deadline in CycleDeadlines and a background sweep flushes the cycles that
+# are still open when it passes, even if their device stopped answering.
+
+
+class CycleState:
+    __slots__ = (
+        "state",
+        "start_time",
+        "start_mono",
+        "last_nonzero",
+        "length",
+        "capacity",
+        "th",
+        "side",
+        "t",
+        "m",
+        "analyzer",
+    )
+
+    def __init__(self, capacity: int, analyzer: Optional[CycleAnalyzer] = None):
+        self.state = "idle"
+        self.start_time = 0.0  # wall clock (epoch seconds)
+        self.start_mono = 0.0  # monotonic clock
+        self.last_nonzero = 0.0  # monotonic clock
+        self.length = 0
+        self.capacity = capacity
+        self.th = array("H", bytes(2 * capacity))
+        self.side = array("H", bytes(2 * capacity))
+        self.t = array("d", bytes(8 * capacity))  # per-sample epoch timestamps (seconds)
+        self.m = array("d", bytes(8 * capacity))  # per-sample monotonic timestamps (seconds)
+        self.analyzer = analyzer or CycleAnalyzer()
+
+    def start(self, th: int, side: int, now: float, mono: float):
+        """Begin a new cycle with its first sample."""
+        self.state = "active"
+        self.start_time = now
+        self.start_mono = mono
+        self.last_nonzero = mono
+        self.length = 0
+        self.analyzer.reset()
+        self.append(th, side, now, mono)
+
+    def append(self, th: int, side: int, now: float, mono: float) -> bool:
+        """Store one sample. Returns False (sample dropped) when the buffer is full."""
+        n = self.length
+        if n >= self.capacity:
+            return False
+        self.th[n] = th
+        self.side[n] = side
+        self.t[n] = now
+        self.m[n] = mono
+        self.length = n + 1
+        # same epoch-ms the save worker stores: first wall time + monotonic offset
+        self.analyzer.push(th, side, int((self.t[0] + (mono - self.m[0])) * 1000))
+        return True
+
+    def elapsed(self, mono: float) -> float:
+        """Seconds since the cycle started, on the monotonic clock."""
+        return mono - self.start_mono
+
+    def reset(self):
+        self.state = "idle"
+        self.length = 0
+        self.analyzer.reset()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def max_th(self) -> int:
+        return self.analyzer.max_th if self.length else 0
+
+    def max_side(self) -> int:
+        return self.analyzer.max_side if self.length else 0
+
+    def snapshot(self) -> dict:
+        """Copy the current samples out as plain lists for the save workers.
+
+        The arrays are reused by the next cycle, so the copy has to be taken
+        before the state goes back to idle.
+        """
+        n = self.length
+        return {
+            "th_buf": self.th[:n].tolist(),
+            "side_buf": self.side[:n].tolist(),
+            "t_buf": self.t[:n].tolist(),
+            "m_buf": self.m[:n].tolist(),
+            "analysis": self.analyzer.summary(),
+        }
+
+
+class CycleDeadlines:
+    """Min-heap of cycle timeout deadlines (monotonic seconds).
+
+    Entries are never removed when a cycle ends early; pop_due() hands out
+    every expired entry and the caller drops those whose cycle has since
+    finished or restarted (compare the state's start_mono with the one
+    recorded here). The heap therefore holds at most the cycles started
+    within the last timeout period.
+    """
+
+    __slots__ = ("heap", "seq")
+
+    def __init__(self):
+        self.heap: List[Tuple[float, int, float, Any]] = []
+        self.seq = 0  # tie-breaker, entries are never compared beyond it
+
+    def add(self, deadline: float, start_mono: float, item: Any):
+        self.seq += 1
+        heapq.heappush(self.heap, (deadline, self.seq, start_mono, item))
+
+    def next_deadline(self) -> Optional[float]:
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, mono: float) -> List[Tuple[float, Any]]:
+        """Remove and return (start_mono, item) for every deadline before `mono`."""
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] < mono:
+            _, _, start_mono, item = heapq.heappop(heap)
+            due.append((start_mono, item))
+        return due
+
+    def __len__(self) -> int:
+        return len(self.heap)
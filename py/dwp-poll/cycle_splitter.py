@@ -1,13 +1,98 @@
 #!/usr/bin/env python3
 import logging
-from typing import List
+from typing import List, NamedTuple, Optional, Sequence
 
-# This module contains the extracted split_and_save_cycles helper used by the
-# poller. It was moved out of the DWPPoller class so it can be reused and
-# unit-tested independently.
+import numpy as np
+
+import waveform_checks
+
+# This module contains the cycle segmentation engine and the
+# split_and_save_cycles implementation the poller delegates to. They live
+# outside the DWPPoller class so they can be reused and unit-tested
+# independently.
 
 logger = logging.getLogger("DWP")
 
+# Defaults mirror the poller's CYCLE_END_THRESHOLD / SPLIT_MIN_ZERO_GAP
+DEFAULT_END_THRESHOLD = 2
+DEFAULT_MIN_ZERO_GAP = 3
+
+
+class CycleSegment(NamedTuple):
+    number: int  # index of the peak that opened this sub-cycle
+    peak: int
+    start: int  # inclusive sample index
+    end: int  # inclusive sample index
+
+
+def combined_signal(th_buf: Sequence[int], side_buf: Sequence[int]) -> np.ndarray:
+    """Element-wise max of TH/Side, used to reason about physical gaps."""
+    if len(th_buf) and len(side_buf):
+        n = min(len(th_buf), len(side_buf))
+        return np.maximum(
+            np.asarray(th_buf[:n], dtype=np.int64), np.asarray(side_buf[:n], dtype=np.int64)
+        )
+    return np.asarray(th_buf if len(th_buf) else side_buf, dtype=np.int64)
+
+
+def find_cycle_segments(
+    th_buf: Sequence[int],
+    side_buf: Sequence[int],
+    peaks: Sequence[int],
+    end_threshold: int = DEFAULT_END_THRESHOLD,
+    min_zero_gap: int = DEFAULT_MIN_ZERO_GAP,
+    log: Optional[logging.Logger] = None,
+) -> List[CycleSegment]:
+    """Find the sub-cycle boundaries for every peak in one linear pass.
+
+    A sub-cycle is the run of combined samples above `end_threshold` around
+    a peak. A peak only opens a new sub-cycle if at least `min_zero_gap`
+    consecutive low samples separate it from the previous peak; otherwise it
+    is treated as part of the same cycle.
+    """
+    combined = combined_signal(th_buf, side_buf)
+    n = len(combined)
+    if n == 0 or len(peaks) == 0:
+        return []
+
+    idx = np.arange(n)
+    above = combined > end_threshold
+    low = ~above
+
+    # start of the above-threshold stretch reaching each index from the left
+    left_break = np.ones(n, dtype=bool)
+    left_break[1:] = low[:-1]
+    left_start = np.maximum.accumulate(np.where(left_break, idx, 0))
+
+    # end of the above-threshold stretch reaching each index from the right
+    right_break = np.ones(n, dtype=bool)
+    right_break[:-1] = low[1:]
+    right_end = np.minimum.accumulate(np.where(right_break, idx, n - 1)[::-1])[::-1]
+
+    # length of the run of low samples ending at each index
+    after_last_high = np.maximum.accumulate(np.where(low, 0, idx + 1))
+    low_run = np.where(low, idx + 1 - after_last_high, 0)
+
+    segments: List[CycleSegment] = []
+    prev_peak = None
+    for i, peak in enumerate(peaks):
+        peak = int(peak)
+        # If there was a previous peak, require a zero-gap between them to split.
+        # Peaks are increasing, so the gap windows never overlap: O(n) overall.
+        if prev_peak is not None:
+            a, b = prev_peak + 1, peak - 1
+            has_gap = b >= a and bool(
+                np.any(np.minimum(low_run[a : b + 1], idx[a : b + 1] - a + 1) >= min_zero_gap)
+            )
+            if not has_gap:
+                if log:
+                    log.info("⏭️ Peaks %d and %d too close (no zero-gap) — treating as same cycle", prev_peak, peak)
+                prev_peak = peak
+                continue
+        prev_peak = peak
+        segments.append(CycleSegment(i, peak, int(left_start[peak]), int(right_end[peak])))
+    return segments
+
 
 async def split_and_save_cycles(
     db,
@@ -22,11 +107,19 @@ async def split_and_save_cycles(
     peaks: List[int],
     total_duration_ms: int,
     t_buf: List[float],
-):
+    end_threshold: int = DEFAULT_END_THRESHOLD,
+    min_zero_gap: int = DEFAULT_MIN_ZERO_GAP,
+    *,
+    poll_interval_sec: float,
+    min_duration_s: float,
+    validate_fn=waveform_checks.validate_waveform_sanity,
+    segments: Optional[List[CycleSegment]] = None,
+) -> int:
     """Split a multi-peak buffer into individual cycles and save each
     sub-cycle using the provided `db` manager. The function accepts helper
     callables for `determine_quality` and `extract_machine_id` so it remains
-    decoupled from the poller class.
+    decoupled from the poller class; DWPPoller.split_and_save_cycles is a
+    thin wrapper around it. Returns the number of sub-cycles saved.
 
     Args:
         db: DatabaseManager-like object with async `save_cycle(dict)` method
@@ -35,28 +128,26 @@ async def split_and_save_cycles(
         extract_machine_id_fn: callable(machine_name) -> int
         line, machine_name, pos: identifiers
         th_buf, side_buf: full buffers
-        peaks: list of peak indices in th_buf
+        peaks: list of peak indices in the combined TH/Side signal
         total_duration_ms: total buffer duration estimate (ms)
         t_buf: per-sample epoch timestamps (seconds)
+        end_threshold, min_zero_gap: segmentation tuning (see find_cycle_segments)
+        poll_interval_sec: sample spacing for the duration when there are no timestamps
+        min_duration_s: sub-cycles shorter than this are skipped
+        validate_fn: sanity check, callable(th, side, sample_count, duration_ms,
+            position, timestamps_ms) -> (is_valid, reason); failing sub-cycles are skipped
+        segments: boundaries already found (e.g. by the cycle analyzer)
     """
     log = logger_param or logger
+    saved_count = 0
+    if segments is None:
+        segments = find_cycle_segments(th_buf, side_buf, peaks, end_threshold, min_zero_gap, log)
 
-    for i, peak_idx in enumerate(peaks):
-        # Find start (first non-zero before peak)
-        start_idx = peak_idx
-        while start_idx > 0 and th_buf[start_idx - 1] <= 2:
-            start_idx -= 1
-        start_idx = max(0, start_idx)
-
-        # Find end (first zero after peak)
-        end_idx = peak_idx
-        while end_idx < len(th_buf) - 1 and th_buf[end_idx + 1] > 2:
-            end_idx += 1
-        end_idx = min(len(th_buf) - 1, end_idx)
-
+    for i, _, start_idx, end_idx in segments:
         # Extract sub-cycle
         th_sub = th_buf[start_idx : end_idx + 1]
         side_sub = side_buf[start_idx : end_idx + 1]
+        # Extract timestamp slice (epoch-ms)
         sub_t_buf = t_buf[start_idx : end_idx + 1] if t_buf else []
         sub_timestamps_ms = [int(ts * 1000) for ts in sub_t_buf] if sub_t_buf else []
 
@@ -64,11 +155,28 @@ async def split_and_save_cycles(
         if sub_timestamps_ms and len(sub_timestamps_ms) > 1:
             sub_duration_ms = int(sub_timestamps_ms[-1] - sub_timestamps_ms[0])
         else:
-            # fallback to sample-count-based estimate assuming poll interval
-            sub_duration_ms = int((end_idx - start_idx + 1) * 0.1 * 1000)
+            sub_duration_ms = int((end_idx - start_idx + 1) * poll_interval_sec * 1000)
 
+        # store seconds for DB/visualization
         sub_duration_s = sub_duration_ms / 1000.0
 
+        # Skip very short sub-cycles
+        if sub_duration_s < min_duration_s:
+            log.info(
+                "⏭️ Skipping split sub-cycle %d/%d for %s-%s-%s: duration %.1fs < %ss",
+                i + 1, len(peaks), line, machine_name, pos, sub_duration_s, min_duration_s,
+            )
+            continue
+
+        # Validate sub-cycle waveform sanity; skip invalid ones
+        is_sane, reason = validate_fn(th_sub, side_sub, len(th_sub), sub_duration_ms, pos, sub_timestamps_ms)
+        if not is_sane:
+            log.info(
+                "⏭️ Skipping split sub-cycle %d/%d for %s-%s-%s: invalid waveform (%s)",
+                i + 1, len(peaks), line, machine_name, pos, reason,
+            )
+            continue
+
         # Save as individual cycle
         max_th = max(th_sub) if th_sub else 0
         max_side = max(side_sub) if side_sub else 0
@@ -77,7 +185,8 @@ async def split_and_save_cycles(
         # Validation: skip very short sub-cycles (insufficient samples)
         if len(th_sub) < 4:
             log.info(
-                f"⏭️ Skipping split sub-cycle {i+1}/{len(peaks)} for {line}-{machine_name}-{pos}: too few samples ({len(th_sub)})"
+                "⏭️ Skipping split sub-cycle %d/%d for %s-%s-%s: too few samples (%d)",
+                i + 1, len(peaks), line, machine_name, pos, len(th_sub),
             )
             continue
 
@@ -96,9 +205,7 @@ async def split_and_save_cycles(
             "cycle_type": "SPLIT",
         }
 
-        try:
-            success = await db.save_cycle(cycle_data)
-            if success:
-                log.info(f"✅ SPLIT Cycle {i+1}/{len(peaks)} saved for {line}-{machine_name}-{pos}")
-        except Exception as e:
-            log.error(f"❌ Failed saving split cycle {line}-{machine_name}-{pos}: {e}")
+        if await db.save_cycle(cycle_data):
+            log.info("✅ SPLIT Cycle %d/%d saved for %s-%s-%s", i + 1, len(peaks), line, machine_name, pos)
+            saved_count += 1
+    return saved_count
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+
+# Durable local spool for cycles that could not be written to MySQL. It is an
+# append-only SQLite journal: the DatabaseManager appends cycles when the pool
+# is down or backed up and a background replayer drains it in bulk once MySQL
+# accepts writes again. All methods are blocking; call them from a thread
+# (asyncio.to_thread) when running inside the event loop.
+
+
+class CycleSpool:
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # WAL + NORMAL sync: appends survive a process crash without an fsync
+        # per cycle; at worst the last transaction is lost on power failure.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spooled_cycles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                spooled_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            )
+            """
+        )
+
+    def append(self, cycles: List[dict]) -> int:
+        """Append cycles in one transaction. Returns the number appended."""
+        now = time.time()
+        rows = [(now, json.dumps(c, separators=(",", ":"))) for c in cycles]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO spooled_cycles (spooled_at, payload) VALUES (?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def peek(self, limit: int) -> List[Tuple[int, dict]]:
+        """Oldest `limit` spooled cycles as (spool_id, cycle_data).
+
+        Cycles spooled without an `ended_at` (older spool files) get their
+        spool time instead, which is close to, but after, the cycle's end.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, spooled_at, payload FROM spooled_cycles ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        cycles = []
+        for row_id, spooled_at, payload in rows:
+            cycle_data = json.loads(payload)
+            cycle_data.setdefault("ended_at", spooled_at)
+            cycles.append((row_id, cycle_data))
+        return cycles
+
+    def delete_upto(self, max_id: int):
+        """Drop every spooled cycle with id <= max_id (after a successful replay)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM spooled_cycles WHERE id <= ?", (max_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spooled_cycles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+# Logging setup for the DWP poller.
+#
+#   DWP_LOG_LEVEL   DEBUG / INFO (default) / WARNING / ERROR
+#   DWP_LOG_QUEUE   1 = hand records to a QueueHandler; a background thread
+#                   formats and writes them, so the event loop never blocks
+#                   on a slow console or disk
+#   DWP_LOG_SAMPLE_SEC  minimum seconds between two repeats of the same
+#                   sampled warning (see LogSampler), default 30
+#
+# Hot-path call sites use %-style arguments so nothing is formatted unless
+# the record is actually emitted, and BufferPreview for waveform excerpts.
+
+LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+LOG_LEVEL = os.getenv("DWP_LOG_LEVEL", "INFO").upper()
+LOG_QUEUE = os.getenv("DWP_LOG_QUEUE", "0").lower() in ("1", "true", "yes")
+LOG_SAMPLE_SEC = float(os.getenv("DWP_LOG_SAMPLE_SEC", "30"))
+
+
+def configure_logging(prefix: str = "", use_queue: bool = LOG_QUEUE) -> Optional[logging.handlers.QueueListener]:
+    """(Re)configure the root logger. Returns the queue listener to stop on
+    shutdown when `use_queue` is set."""
+    fmt = LOG_FORMAT.replace("%(message)s", f"{prefix}%(message)s") if prefix else LOG_FORMAT
+    logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO), format=fmt, datefmt=LOG_DATEFMT, force=True)
+    root = logging.getLogger()
+    if not use_queue:
+        return None
+
+    handlers = list(root.handlers)
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class BufferPreview:
+    """Lazy "[first n values]..." rendering of a waveform for log messages."""
+
+    __slots__ = ("values", "limit")
+
+    def __init__(self, values: Sequence[int], limit: int = 20):
+        self.values = values
+        self.limit = limit
+
+    def __str__(self) -> str:
+        head = list(self.values[: self.limit])
+        return f"{head}{'...' if len(self.values) > self.limit else ''}"
+
+
+class LogSampler:
+    """Let a repetitive message through at most once per `interval` per key.
+
+    The suppressed repeats are counted and reported with the next message that
+    gets through, e.g. "Modbus read failed ... (+57 similar suppressed)".
+    """
+
+    def __init__(self, interval: float = LOG_SAMPLE_SEC, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.last: Dict[Hashable, Tuple[float, int]] = {}
+
+    def log(self, log: logging.Logger, level: int, key: Hashable, msg: str, *args):
+        if not log.isEnabledFor(level):
+            return
+        now = self.clock()
+        last = self.last.get(key)
+        if last is not None and now - last[0] < self.interval:
+            self.last[key] = (last[0], last[1] + 1)
+            return
+        suppressed = last[1] if last else 0
+        self.last[key] = (now, 0)
+        if suppressed:
+            log.log(level, msg + " (+%d similar suppressed)", *args, suppressed)
+        else:
+            log.log(level, msg, *args)
+
+    def forget(self, key: Hashable):
+        self.last.pop(key, None)
@@ -1,15 +1,15 @@
 #!/usr/bin/env python3
 import asyncio
 import json
-import statistics
 import logging
 import signal
 import time
 import argparse
 import os
+import random
 from dataclasses import asdict, dataclass
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -20,23 +20,46 @@ load_dotenv(dotenv_path=dotenv_path)
 
 # Async MySQL & Modbus
 import aiomysql
-from pymodbus.client import AsyncModbusTcpClient
-from pymodbus.exceptions import ModbusException
-from scipy.signal import find_peaks
-
-# Configure logging
+from pymysql.constants.ER import NO_SUCH_TABLE as ER_NO_SUCH_TABLE
+
+import waveform_checks
+from cycle_analyzer import analyze_buffer, CycleAnalyzer
+from cycle_buffer import CycleDeadlines, CycleState
+from cycle_splitter import CycleSegment, split_and_save_cycles
+from cycle_spool import CycleSpool
+from dwp_logging import (
+    LOG_DATEFMT, LOG_FORMAT, LOG_LEVEL, LOG_QUEUE, BufferPreview, LogSampler, configure_logging,
+)
+from live_feed import LiveFeed
+from metrics import Counter, Gauge, Histogram, serve_metrics
+from quality_grading import QualityTable, QualityThresholds
+from read_planner import ReadPlan
+from register_sources import ModbusRegisterSource, RegisterSource, SimulatedRegisterSource
+from shard_supervisor import ShardSupervisor, parse_shard_map, shard_for_device, watch_supervisor_pipe
+from waveform_codec import encode_pv
+
+# Configure logging (DWP_LOG_LEVEL / DWP_LOG_QUEUE, see dwp_logging)
 logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)-8s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
+    level=getattr(logging, LOG_LEVEL, logging.INFO),
+    format=LOG_FORMAT,
+    datefmt=LOG_DATEFMT,
 )
 logger = logging.getLogger("DWP")
+# Rate limit for messages that repeat every tick while a device misbehaves
+log_sampler = LogSampler()
 
 # ----------------------------
 # CONFIGURATION (Update These!)
 # ----------------------------
 # Polling
 POLL_INTERVAL_SEC = 0.1  # 10 Hz → recommended for press cycles
+# Adaptive rate: a machine with both positions idle is only read every
+# IDLE_POLL_INTERVAL_SEC; from the tick a cycle starts until IDLE_GRACE_SEC
+# after it ends it is read at POLL_INTERVAL_SEC. Set the idle interval to
+# POLL_INTERVAL_SEC to sample everything at full rate.
+IDLE_POLL_INTERVAL_SEC = float(os.getenv("DWP_IDLE_POLL_INTERVAL", "0.5"))
+IDLE_GRACE_SEC = 3.0  # presses often cycle back to back
+READ_PLAN_CACHE_MAX = 256  # subset read plans kept per device
 MODBUS_TIMEOUT_SEC = 1.0
 MODBUS_PORT = 503
 MODBUS_UNIT_ID = 1
@@ -45,6 +68,22 @@ MODBUS_UNIT_ID = 1
 OFFLINE_THRESHOLD_SEC = 60  # If no successful read for 60 seconds, mark as offline
 HEARTBEAT_CHECK_INTERVAL_SEC = 10  # Check heartbeat every 10 seconds
 
+# Device status logging (log_dwp_uptime)
+STATUS_FAILURE_HYSTERESIS = 3  # consecutive failed reads before an online device is marked down
+STATUS_LOG_FLUSH_INTERVAL_SEC = 2.0  # status rows are written in batches this often
+STATUS_LOG_MIN_INTERVAL_SEC = 10.0  # at most one row per device per interval, latest status wins
+DEVICE_EXISTS_RECHECK_SEC = 300  # re-check unknown device ids after this long
+
+# Reconnect supervisor (one per device, see supervise_device)
+RECONNECT_BASE_DELAY_SEC = 1.0  # first retry delay, doubled after every failed attempt
+RECONNECT_MAX_DELAY_SEC = 60.0
+RECONNECT_JITTER = 0.2  # +/- 20% so gateways behind one switch don't retry in lockstep
+HALF_OPEN_FAILURE_THRESHOLD = 5  # consecutive failed reads on a "connected" socket → reconnect
+SUPERVISOR_CHECK_INTERVAL_SEC = 5.0
+
+# Device config hot reload (also on SIGHUP, see reload_devices)
+DEVICE_RELOAD_INTERVAL_SEC = int(os.getenv("DWP_DEVICE_RELOAD_INTERVAL", "60"))
+
 # MySQL
 DB_CONFIG = {
     "host": os.getenv("DB_HOST", "127.0.0.1"),
@@ -56,6 +95,38 @@ DB_CONFIG = {
     "autocommit": True,  # Critical for performance!
     "maxsize": 10,  # Connection pool size
 }
+# created_at/updated_at are the cycle's end time, not the insert time: batched
+# and spooled cycles can reach MySQL seconds to hours after the press stopped
+INSERT_COUNTS_SQL = """
+    INSERT INTO `ins_dwp_counts` (
+        `line`, `mechine`, `count`, `incremental`, `position`,
+        `pv`, `duration`, `std_error`, `created_at`, `updated_at`
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Write-behind batching of ins_dwp_counts inserts
+DB_WRITE_BATCH_SIZE = 50  # flush as soon as this many cycles are queued
+DB_WRITE_FLUSH_INTERVAL_SEC = 1.0  # ... or at least this often
+DB_WRITE_QUEUE_MAX = 2000  # beyond this MySQL is too slow, spool locally instead
+
+# pv column encoding: "json" (legacy, default) or "compact" (see waveform_codec)
+PV_ENCODING = os.getenv("DWP_PV_ENCODING", "json").lower()
+
+# Local spool for cycles MySQL could not take (maintenance, outages)
+SPOOL_PATH = os.getenv("DWP_SPOOL_PATH", str(Path(__file__).resolve().parent / "dwp_spool.sqlite3"))
+SPOOL_REPLAY_INTERVAL_SEC = 15
+SPOOL_REPLAY_BATCH_SIZE = 500
+
+# Metrics endpoint (Prometheus text format); port 0 disables it. Shard i
+# listens on DWP_METRICS_PORT + i.
+METRICS_HOST = os.getenv("DWP_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("DWP_METRICS_PORT", "9464"))
+
+# Live waveform feed for dashboards (SSE on GET /live, see live_feed); off
+# unless DWP_LIVE_PORT is set. Shard i listens on DWP_LIVE_PORT + i.
+LIVE_HOST = os.getenv("DWP_LIVE_HOST", "127.0.0.1")
+LIVE_PORT = int(os.getenv("DWP_LIVE_PORT", "0"))
+LIVE_RATE_HZ = float(os.getenv("DWP_LIVE_RATE_HZ", "5"))
 
 # Cycle detection
 CYCLE_START_THRESHOLD = 1
@@ -63,6 +134,7 @@ CYCLE_END_THRESHOLD = 2
 MIN_CYCLE_DURATION_MS = 200
 MAX_BUFFER_LENGTH = 500
 CYCLE_TIMEOUT_SEC = 30
+TIMEOUT_SWEEP_SLACK_SEC = 0.05  # sleep a little past a deadline so it is strictly due
 
 # Minimum accepted cycle duration (seconds). Cycles shorter than this are ignored.
 MIN_DURATION_S = 5
@@ -72,12 +144,54 @@ SPLIT_MIN_SAMPLES = 5
 SPLIT_MIN_ZERO_GAP = 3
 SPLIT_PEAK_DISTANCE = 3
 
+# Streaming cycle analysis (see cycle_analyzer), same thresholds as above
+ANALYZER_SETTINGS = {
+    "end_threshold": CYCLE_END_THRESHOLD,
+    "min_zero_gap": SPLIT_MIN_ZERO_GAP,
+    "peak_height": CYCLE_START_THRESHOLD,
+    "peak_distance": SPLIT_PEAK_DISTANCE,
+}
+
+# Cycle save pipeline (sampling → queue → save workers)
+CYCLE_QUEUE_MAXSIZE = 1000
+CYCLE_QUEUE_WARN_DEPTH = 100
+CYCLE_WORKERS = 2
+
 # Quality thresholds
 GOOD_MIN, GOOD_MAX = 30, 45
 EXTENDED_MIN, EXTENDED_MAX = 25, 55
 MARGINAL_MIN, MARGINAL_MAX = 15, 70
 SENSOR_LOW = 10
 PRESSURE_HIGH = 80
+# Compiled once at startup, see quality_grading
+QUALITY_TABLE = QualityTable(QualityThresholds(
+    GOOD_MIN, GOOD_MAX, EXTENDED_MIN, EXTENDED_MAX, MARGINAL_MIN, MARGINAL_MAX, SENSOR_LOW, PRESSURE_HIGH,
+))
+
+
+# ----------------------------
+# METRICS
+# ----------------------------
+MODBUS_READ_SECONDS = Histogram(
+    "dwp_modbus_read_seconds", "Latency of a full device read plan", ["device"],
+    buckets=(0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0),
+)
+MODBUS_READ_ERRORS = Counter("dwp_modbus_read_errors_total", "Failed device reads", ["device"])
+MACHINE_POLLS = Counter("dwp_machine_polls_total", "Machine samples taken (adaptive rate)")
+MISSED_TICKS = Counter("dwp_poll_missed_ticks_total", "Poll slots skipped because a tick overran", ["device"])
+DEVICE_UP = Gauge("dwp_device_up", "1 if the device is online", ["device"])
+ACTIVE_CYCLES = Gauge("dwp_active_cycles", "1 while a cycle is being sampled", ["line", "machine", "position"])
+CYCLE_QUEUE_DEPTH = Gauge("dwp_cycle_queue_depth", "Finished cycles waiting for the save workers")
+CYCLE_ANALYSIS_SECONDS = Histogram("dwp_cycle_analysis_seconds", "Save worker time per queued cycle")
+CYCLES = Counter(
+    "dwp_cycles_total",
+    "Cycles by outcome (COMPLETE, SPLIT, INVALID_WAVEFORM, TIMEOUT, OVERFLOW, SHORT, DROPPED)",
+    ["line", "machine", "type"],
+)
+DB_WRITE_SECONDS = Histogram("dwp_db_write_seconds", "Latency of one multi-row ins_dwp_counts INSERT")
+DB_ROWS_WRITTEN = Counter("dwp_db_rows_written_total", "Rows written to ins_dwp_counts")
+DB_PENDING_CYCLES = Gauge("dwp_db_pending_cycles", "Cycles queued for the next batched INSERT")
+CYCLES_SPOOLED = Counter("dwp_cycles_spooled_total", "Cycles written to the local spool")
 
 
 # ----------------------------
@@ -103,43 +217,8 @@ class DeviceConfig:
 # ----------------------------
 # HELPER FUNCTIONS
 # ----------------------------
-def is_good(value: int) -> bool:
-    return GOOD_MIN <= value <= GOOD_MAX
-
-
-def is_in_range(value: int, low: int, high: int) -> bool:
-    return low <= value <= high
-
-
 def determine_quality(max_th: int, max_side: int, cycle_type: str = "COMPLETE") -> str:
-    if cycle_type in ("SHORT_CYCLE", "OVERFLOW", "TIMEOUT"):
-        return cycle_type
-
-    # EXCELLENT: both in perfect range
-    if is_good(max_th) and is_good(max_side):
-        return "EXCELLENT"
-
-    # GOOD: both in extended range
-    if is_in_range(max_th, EXTENDED_MIN, EXTENDED_MAX) and is_in_range(
-        max_side, EXTENDED_MIN, EXTENDED_MAX
-    ):
-        return "GOOD"
-
-    # MARGINAL: one good, one marginal
-    th_good = is_good(max_th)
-    side_good = is_good(max_side)
-    th_marginal = is_in_range(max_th, MARGINAL_MIN, MARGINAL_MAX)
-    side_marginal = is_in_range(max_side, MARGINAL_MIN, MARGINAL_MAX)
-    if (th_good and side_marginal) or (side_good and th_marginal):
-        return "MARGINAL"
-
-    # Sensor/pressure issues
-    if max_th < SENSOR_LOW and max_side < SENSOR_LOW:
-        return "SENSOR_LOW"
-    if max_th > PRESSURE_HIGH or max_side > PRESSURE_HIGH:
-        return "PRESSURE_HIGH"
-
-    return "DEFECTIVE"
+    return QUALITY_TABLE.grade(max_th, max_side, cycle_type)
 
 
 def extract_machine_id(name: str) -> int:
@@ -148,35 +227,68 @@ def extract_machine_id(name: str) -> int:
     return int(digits) if digits else 0
 
 
-async def maybe_await(obj):
-    """Await obj if it's awaitable (coroutine or Future). Otherwise return immediately."""
-    try:
-        if asyncio.iscoroutine(obj) or asyncio.isfuture(obj):
-            await obj
-    except Exception:
-        # best-effort: if awaiting fails, ignore to avoid blocking shutdown
-        pass
-
-
 # ----------------------------
 # MYSQL DATABASE MANAGER
 # ----------------------------
 class DatabaseManager:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, spool_path: str = SPOOL_PATH):
         self.config = config
+        self.spool_path = spool_path
         self.pool: Optional[aiomysql.Pool] = None
+        # Write-behind queue: save_cycle() only appends here, _flush_loop()
+        # writes the cycles to MySQL in multi-row batches.
+        self.pending_cycles: List[dict] = []
+        self.flush_event = asyncio.Event()
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_lock = asyncio.Lock()
+        # Last `count` per line, seeded once. With ins_dwp_line_counters
+        # (use_counter_table) counts are reserved there atomically and this is
+        # only a cache; without it, this process is the only source of counts.
+        self.line_counts: Dict[str, int] = {}
+        self.line_counts_seeded = False
+        self.use_counter_table = False
+        # Local journal for cycles MySQL could not take (see cycle_spool)
+        self.spool: Optional[CycleSpool] = None
+        self.replay_task: Optional[asyncio.Task] = None
+        # Debounced status log: latest unwritten transition per device, the
+        # last written (status, monotonic time) and cached device existence
+        self.pending_status: Dict[int, tuple] = {}
+        self.last_status: Dict[int, Tuple[str, float, float]] = {}
+        self.device_exists: Dict[int, Tuple[bool, float]] = {}
+        self.status_task: Optional[asyncio.Task] = None
+        DB_PENDING_CYCLES.set_function(lambda: {(): len(self.pending_cycles)})
 
     async def connect(self):
+        self.spool = CycleSpool(self.spool_path)
+        pending = await asyncio.to_thread(self.spool.count)
+        if pending:
+            logger.warning(f"📼 {pending} spooled cycle(s) waiting for replay in {self.spool_path}")
         self.pool = await aiomysql.create_pool(**self.config)
         logger.info("✅ MySQL pool created")
+        await self.seed_line_counts()
+        self.flush_task = asyncio.create_task(self._flush_loop(), name="db-flush")
+        self.replay_task = asyncio.create_task(self._replay_loop(), name="db-spool-replay")
+        self.status_task = asyncio.create_task(self._status_loop(), name="db-status-log")
 
     async def close(self):
+        for task in (self.flush_task, self.replay_task, self.status_task):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self.flush_task = self.replay_task = self.status_task = None
+        # Drain whatever is still queued before the pool goes away
+        # (anything MySQL refuses now ends up in the spool)
+        await self.flush()
+        await self.flush_status(force=True)
         if self.pool:
             self.pool.close()
             await self.pool.wait_closed()
             logger.info("👋 MySQL pool closed")
+        if self.spool:
+            self.spool.close()
+            self.spool = None
 
-    async def log_device_status(
+    def log_device_status(
         self,
         device_id: int,
         status: str,
@@ -184,126 +296,515 @@ class DatabaseManager:
         duration_seconds: int = None
     ) -> bool:
         """
-        Log device connection status changes
+        Queue a device connection status change for log_dwp_uptime
         status: 'online', 'offline', 'timeout'
+
+        Never touches MySQL: _status_loop writes the queued rows in batches.
+        Only the latest transition per device is kept, so a flapping gateway
+        produces at most one row per STATUS_LOG_MIN_INTERVAL_SEC.
         """
-        if not self.pool:
-            logger.error("❌ DB pool not initialized")
-            return False
+        self.pending_status[device_id] = (status, message, duration_seconds, time.time(), time.monotonic())
+        return True
+
+    async def _status_loop(self):
+        while True:
+            await asyncio.sleep(STATUS_LOG_FLUSH_INTERVAL_SEC)
+            try:
+                await self.flush_status()
+            except Exception as e:
+                logger.error(f"❌ Status log flush error: {e}")
+
+    async def known_devices(self, cur, device_ids: List[int]) -> set:
+        """Device ids that exist in ins_dwp_devices, cached per id."""
+        now = time.monotonic()
+        unknown = [
+            dev_id for dev_id in device_ids
+            if dev_id not in self.device_exists
+            or (not self.device_exists[dev_id][0] and now - self.device_exists[dev_id][1] > DEVICE_EXISTS_RECHECK_SEC)
+        ]
+        if unknown:
+            placeholders = ", ".join(["%s"] * len(unknown))
+            await cur.execute(f"SELECT id FROM ins_dwp_devices WHERE id IN ({placeholders})", unknown)
+            found = {row[0] for row in await cur.fetchall()}
+            for dev_id in unknown:
+                self.device_exists[dev_id] = (dev_id in found, now)
+                if dev_id not in found:
+                    logger.error(
+                        f"❌ Cannot log status: Device ID {dev_id} does not exist in ins_dwp_devices table. "
+                        f"Please add the device first or run: php artisan db:seed --class=InsDwpDeviceSeeder"
+                    )
+        return {dev_id for dev_id in device_ids if self.device_exists[dev_id][0]}
+
+    async def flush_status(self, force: bool = False) -> int:
+        """Write due status transitions to log_dwp_uptime in one INSERT.
+
+        A transition that arrives within STATUS_LOG_MIN_INTERVAL_SEC of the
+        device's previous row waits (unless `force`); if the device is back in
+        the already logged status by then, nothing is written at all.
+        """
+        if not self.pending_status or not self.pool:
+            return 0
+        now = time.monotonic()
+        rows = []
+        for dev_id, (status, message, duration, logged_at, mono) in list(self.pending_status.items()):
+            last = self.last_status.get(dev_id)
+            if last and not force and now - last[2] < STATUS_LOG_MIN_INTERVAL_SEC:
+                continue
+            del self.pending_status[dev_id]
+            if last and last[0] == status:
+                continue  # flapped back before it was written
+            if last:
+                # time spent in the previously *logged* status
+                duration = int(logged_at - last[1])
+            rows.append((dev_id, status, datetime.fromtimestamp(logged_at), message, duration, logged_at, mono))
+        if not rows:
+            return 0
 
         try:
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cur:
-                    # First check if device exists
-                    await cur.execute(
-                        "SELECT id FROM ins_dwp_devices WHERE id = %s",
-                        (device_id,)
-                    )
-                    device_exists = await cur.fetchone()
-                    
-                    if not device_exists:
-                        logger.error(
-                            f"❌ Cannot log status: Device ID {device_id} does not exist in ins_dwp_devices table. "
-                            f"Please add the device first or run: php artisan db:seed --class=InsDwpDeviceSeeder"
-                        )
-                        return False
-                    
-                    # Device exists, insert log
-                    await cur.execute(
+                    known = await self.known_devices(cur, sorted({row[0] for row in rows}))
+                    rows = [row for row in rows if row[0] in known]
+                    if not rows:
+                        return 0
+                    await cur.executemany(
                         """
                         INSERT INTO `log_dwp_uptime` (
                             `ins_dwp_device_id`, `status`, `logged_at`, 
                             `message`, `duration_seconds`, `created_at`, `updated_at`
-                        ) VALUES (%s, %s, NOW(), %s, %s, NOW(), NOW())
+                        ) VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
                         """,
-                        (device_id, status, message, duration_seconds),
+                        [row[:5] for row in rows],
                     )
-                    logger.info(f"📝 Device {device_id} status logged: {status}")
-                    return True
         except Exception as e:
             logger.error(f"❌ Failed to log device status: {e}")
-            return False
+            return 0
 
-    async def save_cycle(self, cycle_data: dict) -> bool:
+        for dev_id, status, _, _, _, logged_at, mono in rows:
+            self.last_status[dev_id] = (status, logged_at, mono)
+            logger.info(f"📝 Device {dev_id} status logged: {status}")
+        return len(rows)
+
+    async def seed_line_counts(self) -> bool:
+        """Load the last `count` of every line once, so inserts never have to
+        look it up again.
+
+        Lines missing from ins_dwp_line_counters (first start after the
+        migration, new lines) are created there from ins_dwp_counts; lines
+        already in it keep their counter, which other pollers may have moved
+        on. Without the table, counts are kept in this process only.
+        """
         if not self.pool:
-            logger.error("❌ DB pool not initialized")
             return False
 
+        last_counts = """
+            SELECT c.`line`, c.`count` FROM `ins_dwp_counts` c
+            JOIN (
+                SELECT `line`, MAX(`id`) AS `id` FROM `ins_dwp_counts` GROUP BY `line`
+            ) last ON last.`id` = c.`id`
+        """
         try:
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cur:
-                    # Get last count for line
-                    await cur.execute(
-                        "SELECT `count` FROM `ins_dwp_counts` WHERE `line` = %s ORDER BY `id` DESC LIMIT 1",
-                        (cycle_data["line"],),
-                    )
-                    result = await cur.fetchone()
-                    new_count = (result[0] if result else 0) + 1
-
-                    # Build JSON fields
-                    pv_data = {
-                        "waveforms": [
-                            cycle_data["th_waveform"],
-                            cycle_data["side_waveform"],
-                        ],
-                        # optional per-sample timestamps (epoch ms)
-                        **({"timestamps": cycle_data.get("timestamps")} if cycle_data.get("timestamps") is not None else {}),
-                        "quality": {
-                            "grade": cycle_data["quality_grade"],
-                            "peaks": {
-                                "th": cycle_data["max_th"],
-                                "side": cycle_data["max_side"],
-                            },
-                            "cycle_type": cycle_data["cycle_type"],
-                            "sample_count": cycle_data["sample_count"],
-                        },
-                    }
-                    std_error = [
-                        [1 if GOOD_MIN <= cycle_data["max_th"] <= GOOD_MAX else 0],
-                        [1 if GOOD_MIN <= cycle_data["max_side"] <= GOOD_MAX else 0],
-                    ]
-
-                    # ✅ INSERT WITHOUT created_at/updated_at — let MySQL auto-fill!
-                    await cur.execute(
-                        """
-                        INSERT INTO `ins_dwp_counts` (
-                            `line`, `mechine`, `count`, `incremental`, `position`,
-                            `pv`, `duration`, `std_error`
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                        (
-                            cycle_data["line"],
-                            cycle_data["machine"],
-                            new_count,
-                            1,  # incremental
-                            cycle_data["position"],
-                            json.dumps(pv_data, separators=(",", ":")),
-                            cycle_data.get("duration_s", None),  # stored in seconds
-                            json.dumps(std_error, separators=(",", ":")),
-                        ),
-                    )
-                    return True
+                    try:
+                        await cur.execute(
+                            f"""
+                            INSERT IGNORE INTO `ins_dwp_line_counters` (`line`, `count`, `created_at`, `updated_at`)
+                            SELECT l.`line`, COALESCE(l.`count`, 0), NOW(), NOW() FROM ({last_counts}) l
+                            """
+                        )
+                        await cur.execute("SELECT `line`, `count` FROM `ins_dwp_line_counters`")
+                        self.use_counter_table = True
+                    except aiomysql.ProgrammingError as e:
+                        if e.args[0] != ER_NO_SUCH_TABLE:
+                            raise
+                        logger.warning(
+                            "⚠️ ins_dwp_line_counters missing (run the migration) - counting per process, "
+                            "counts are only unique while a single poller writes each line"
+                        )
+                        self.use_counter_table = False
+                        await cur.execute(last_counts)
+                    rows = await cur.fetchall()
+            for line, count in rows:
+                # Keep any counts already handed out since start-up
+                self.line_counts[line] = max(self.line_counts.get(line, 0), count or 0)
+            self.line_counts_seeded = True
+            logger.info(f"✅ Seeded counters for {len(rows)} line(s)")
+            return True
         except Exception as e:
-            logger.error(f"❌ DB save failed: {e}")
+            logger.error(f"❌ Failed to seed line counters: {e}")
             return False
 
+    async def save_cycle(self, cycle_data: dict) -> bool:
+        """Queue a cycle for the next batched INSERT. Never waits on MySQL;
+        if the pool is missing or the queue is backed up the cycle goes to
+        the local spool instead."""
+        CYCLES.inc(line=cycle_data["line"], machine=cycle_data["machine"], type=cycle_data["cycle_type"])
+        if "ended_at" not in cycle_data:
+            # epoch seconds of the last sample; travels with the cycle through the spool
+            timestamps = cycle_data.get("timestamps")
+            cycle_data["ended_at"] = timestamps[-1] / 1000 if timestamps else time.time()
+        if not self.pool or len(self.pending_cycles) >= DB_WRITE_QUEUE_MAX:
+            reason = "DB pool not initialized" if not self.pool else "DB write queue full"
+            return await self.spool_cycles([cycle_data], reason)
+
+        self.pending_cycles.append(cycle_data)
+        if len(self.pending_cycles) >= DB_WRITE_BATCH_SIZE:
+            self.flush_event.set()
+        return True
+
+    async def spool_cycles(self, cycles: List[dict], reason: str) -> bool:
+        """Persist cycles to the local spool. Only logs DATA LOST if that fails too."""
+        if self.spool:
+            try:
+                await asyncio.to_thread(self.spool.append, cycles)
+                CYCLES_SPOOLED.inc(len(cycles))
+                logger.warning("📼 Spooled %d cycle(s) locally (%s)", len(cycles), reason)
+                return True
+            except Exception as e:
+                reason = f"{reason}; spool failed: {e}"
+        logger.error(
+            "❌ DB save failed - DATA LOST | %d cycle(s) | lines=%s | %s",
+            len(cycles), sorted({c["line"] for c in cycles}), reason,
+        )
+        return False
+
+    def build_count_row(self, cycle_data: dict, count: int) -> tuple:
+        # Build JSON fields
+        pv_data = {
+            "waveforms": [
+                cycle_data["th_waveform"],
+                cycle_data["side_waveform"],
+            ],
+            # optional per-sample timestamps (epoch ms)
+            **({"timestamps": cycle_data.get("timestamps")} if cycle_data.get("timestamps") is not None else {}),
+            "quality": {
+                "grade": cycle_data["quality_grade"],
+                "peaks": {
+                    "th": cycle_data["max_th"],
+                    "side": cycle_data["max_side"],
+                },
+                "cycle_type": cycle_data["cycle_type"],
+                "sample_count": cycle_data["sample_count"],
+            },
+        }
+        if PV_ENCODING == "compact":
+            pv_data = encode_pv(pv_data)
+        std_error = QUALITY_TABLE.std_error(cycle_data["max_th"], cycle_data["max_side"])
+        created_at = datetime.fromtimestamp(cycle_data.get("ended_at") or time.time())
+        return (
+            cycle_data["line"],
+            cycle_data["machine"],
+            count,
+            1,  # incremental
+            cycle_data["position"],
+            json.dumps(pv_data, separators=(",", ":")),
+            cycle_data.get("duration_s", None),  # stored in seconds
+            json.dumps(std_error, separators=(",", ":")),
+            created_at,
+            created_at,
+        )
+
+    async def _flush_loop(self):
+        """Flush queued cycles when a batch fills up or the interval elapses."""
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), DB_WRITE_FLUSH_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ DB flush loop error: {e}")
+
+    async def insert_cycles(self, cycles: List[dict]):
+        """Assign per-line counts and INSERT the cycles in one multi-row batch.
+
+        Raises on failure, after handing the counts back so no gaps are left.
+        """
+        if self.use_counter_table:
+            await self.insert_cycles_reserved(cycles)
+            return
+
+        counts_before = {c["line"]: self.line_counts.get(c["line"], 0) for c in cycles}
+        rows = []
+        for cycle_data in cycles:
+            line = cycle_data["line"]
+            self.line_counts[line] = self.line_counts.get(line, 0) + 1
+            rows.append(self.build_count_row(cycle_data, self.line_counts[line]))
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.executemany(INSERT_COUNTS_SQL, rows)
+        except Exception:
+            # Nothing was inserted: hand the counts out again next time
+            self.line_counts.update(counts_before)
+            raise
+
+    async def insert_cycles_reserved(self, cycles: List[dict]):
+        """insert_cycles() with counts reserved in ins_dwp_line_counters.
+
+        The counter UPDATEs and the INSERT share one transaction: the counter
+        rows stay locked until commit, so concurrent pollers on the same line
+        queue up instead of reading the same count, and a failed insert rolls
+        the reservation back.
+        """
+        per_line: Dict[str, int] = {}
+        for cycle_data in cycles:
+            per_line[cycle_data["line"]] = per_line.get(cycle_data["line"], 0) + 1
+
+        async with self.pool.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cur:
+                    next_count: Dict[str, int] = {}
+                    # fixed lock order, so two pollers can't deadlock on two lines
+                    for line in sorted(per_line):
+                        last = await self.reserve_counts(cur, line, per_line[line])
+                        next_count[line] = last - per_line[line]
+                    rows = []
+                    for cycle_data in cycles:
+                        line = cycle_data["line"]
+                        next_count[line] += 1
+                        rows.append(self.build_count_row(cycle_data, next_count[line]))
+                    await cur.executemany(INSERT_COUNTS_SQL, rows)
+                await conn.commit()
+            except BaseException:
+                try:
+                    await conn.rollback()
+                except Exception:
+                    pass  # connection is gone; MySQL drops the transaction with it
+                raise
+        self.line_counts.update(next_count)
+
+    async def reserve_counts(self, cur, line: str, n: int) -> int:
+        """Atomically move a line's counter on by `n`; returns the new last count."""
+        update = (
+            "UPDATE `ins_dwp_line_counters` SET `count` = LAST_INSERT_ID(`count` + %s), "
+            "`updated_at` = NOW() WHERE `line` = %s"
+        )
+        await cur.execute(update, (n, line))
+        if cur.rowcount == 0:
+            # First cycle of a new line: start after its last stored count
+            await cur.execute(
+                """
+                INSERT INTO `ins_dwp_line_counters` (`line`, `count`, `created_at`, `updated_at`)
+                SELECT %s, COALESCE(MAX(`count`), 0), NOW(), NOW() FROM (
+                    SELECT `count` FROM `ins_dwp_counts` WHERE `line` = %s ORDER BY `id` DESC LIMIT 1
+                ) last
+                ON DUPLICATE KEY UPDATE `line` = `line`
+                """,
+                (line, line),
+            )
+            await cur.execute(update, (n, line))
+        await cur.execute("SELECT LAST_INSERT_ID()")
+        (last,) = await cur.fetchone()
+        return int(last)
+
+    async def flush(self) -> int:
+        """Write all queued cycles in multi-row batches. Returns rows written."""
+        async with self.flush_lock:
+            if not self.pending_cycles:
+                return 0
+
+            batch, self.pending_cycles = self.pending_cycles, []
+            if not self.pool:
+                await self.spool_cycles(batch, "DB pool not initialized")
+                return 0
+            if not self.line_counts_seeded and not await self.seed_line_counts():
+                # Counters unknown, MySQL is most likely unreachable
+                await self.spool_cycles(batch, "line counters not seeded")
+                return 0
+
+            written = 0
+            for i in range(0, len(batch), DB_WRITE_BATCH_SIZE):
+                chunk = batch[i : i + DB_WRITE_BATCH_SIZE]
+                try:
+                    started = time.perf_counter()
+                    await self.insert_cycles(chunk)
+                    DB_WRITE_SECONDS.observe(time.perf_counter() - started)
+                    DB_ROWS_WRITTEN.inc(len(chunk))
+                    written += len(chunk)
+                except Exception as e:
+                    await self.spool_cycles(chunk, f"batch insert failed: {e}")
+            if written:
+                logger.debug("💾 Flushed %d cycle(s) to ins_dwp_counts", written)
+            return written
+
+    async def _replay_loop(self):
+        """Drain the local spool into MySQL in bulk whenever it accepts writes."""
+        while True:
+            await asyncio.sleep(SPOOL_REPLAY_INTERVAL_SEC)
+            try:
+                await self.replay_spool()
+            except Exception as e:
+                logger.warning(f"📼 Spool replay deferred: {e}")
+
+    async def replay_spool(self) -> int:
+        """Replay spooled cycles oldest-first. Stops at the first failed batch."""
+        if not self.spool or not self.pool:
+            return 0
+        replayed = 0
+        while True:
+            entries = await asyncio.to_thread(self.spool.peek, SPOOL_REPLAY_BATCH_SIZE)
+            if not entries:
+                break
+            async with self.flush_lock:
+                if not self.line_counts_seeded and not await self.seed_line_counts():
+                    raise RuntimeError("line counters not seeded")
+                cycles = [cycle_data for _, cycle_data in entries]
+                for i in range(0, len(cycles), DB_WRITE_BATCH_SIZE):
+                    await self.insert_cycles(cycles[i : i + DB_WRITE_BATCH_SIZE])
+                    # Drop each replayed chunk right away so a later failure
+                    # can never insert it twice
+                    await asyncio.to_thread(
+                        self.spool.delete_upto, entries[min(i + DB_WRITE_BATCH_SIZE, len(entries)) - 1][0]
+                    )
+                    replayed += len(cycles[i : i + DB_WRITE_BATCH_SIZE])
+        if replayed:
+            logger.info(f"📼 Replayed {replayed} spooled cycle(s) into ins_dwp_counts")
+        return replayed
+
 
 # ----------------------------
 # MAIN POLLER CLASS
 # ----------------------------
 class DWPPoller:
-    def __init__(self, poll_only_machine: Optional[str] = None):
-        """poll_only_machine: if set (e.g. 'mc1'), only poll that machine across all lines/devices."""
+    def __init__(
+        self,
+        poll_only_machine: Optional[str] = None,
+        shard_index: Optional[int] = None,
+        shards: int = 1,
+        shard_map: Optional[Dict[int, int]] = None,
+        simulate_db: Optional[str] = None,
+        supervised: bool = False,
+    ):
+        """poll_only_machine: if set (e.g. 'mc1'), only poll that machine across all lines/devices.
+        shard_index/shards/shard_map: when run as a shard (see shard_supervisor), only
+        poll the devices assigned to this shard.
+        simulate_db: read simulated presses instead of the Modbus gateways, and use
+            this database (devices, counts, uptime) instead of DB_DATABASE.
+        supervised: started by ShardSupervisor; stop when it closes our stdin."""
         self.devices: Dict[int, DeviceConfig] = {}
-        self.clients: Dict[int, AsyncModbusTcpClient] = {}
-        self.cycle_states: Dict[str, dict] = {}
-        self.db = DatabaseManager(DB_CONFIG)
+        self.clients: Dict[int, RegisterSource] = {}
+        # Creates the register source of a device (see register_sources)
+        self.simulated_gateways: Dict[int, SimulatedRegisterSource] = {}
+        self.source_factory: Callable[[DeviceConfig], RegisterSource] = (
+            self.simulated_source if simulate_db else self.modbus_source
+        )
+        self.cycle_states: Dict[str, CycleState] = {}
+        # Timeout deadlines of open cycles, serviced by timeout_sweep_loop
+        self.cycle_deadlines = CycleDeadlines()
+        self.deadline_event = asyncio.Event()
+        self.shard_index = shard_index
+        self.shards = shards
+        self.shard_map = shard_map or {}
+        self.supervised = supervised
+        # Each shard replays its own spool so two processes never replay the same rows
+        spool_path = SPOOL_PATH if shard_index is None else f"{SPOOL_PATH}.shard{shard_index}"
+        db_config = DB_CONFIG
+        if simulate_db:
+            # made-up cycles must never reach the production tables, not even via the spool
+            if simulate_db == DB_CONFIG["db"]:
+                raise ValueError(f"Simulation database must not be DB_DATABASE ({DB_CONFIG['db']})")
+            db_config = {**DB_CONFIG, "db": simulate_db}
+            spool_path = f"{spool_path}.simulate"
+        self.db = DatabaseManager(db_config, spool_path)
         self.running = True
         self.shutdown_event = asyncio.Event()
+        self.reload_event = asyncio.Event()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         # optional: only poll a single machine name (e.g., 'mc1')
         self.poll_only_machine: Optional[str] = poll_only_machine
         # Track device connection states
         self.device_states: Dict[int, dict] = {}  # {device_id: {'status': str, 'last_change': float, 'last_successful_read': float}}
+        # Sample clocks (wall for stored timestamps, monotonic for durations
+        # and scheduling); replaced by a virtual clock in bench_pipeline.py
+        self.clock = time.time
+        self.monotonic = time.monotonic
+        # Per-device count of poll slots skipped because a tick overran
+        self.missed_ticks: Dict[int, int] = {}
+        # One polling task per device (see poll_loop)
+        self.device_tasks: Dict[int, asyncio.Task] = {}
+        # Finished cycles waiting for the save workers (see enqueue_cycle)
+        self.cycle_queue: asyncio.Queue = asyncio.Queue(maxsize=CYCLE_QUEUE_MAXSIZE)
+        self.cycle_workers: List[asyncio.Task] = []
+        self.queue_stats = {"enqueued": 0, "processed": 0, "dropped": 0, "max_depth": 0, "last_save_ms": 0.0}
+        self.metrics_server: Optional[asyncio.AbstractServer] = None
+        self.live_feed: Optional[LiveFeed] = None
+        CYCLE_QUEUE_DEPTH.set_function(lambda: {(): self.cycle_queue.qsize()})
+        ACTIVE_CYCLES.set_function(self.active_cycle_metrics)
+        DEVICE_UP.set_function(
+            lambda: {(str(dev_id),): int(st.get('status') == 'online') for dev_id, st in self.device_states.items()}
+        )
+        # Coalesced register read plan and polled (line, machine) pairs per device;
+        # replaced in place by reload_devices
+        self.read_plans: Dict[int, ReadPlan] = {}
+        self.device_machines: Dict[int, List[Tuple[str, MachineConfig]]] = {}
+        # Adaptive rate: plans for subsets of a device's machines (keyed by
+        # machine indexes) and the time until which a machine stays at full rate
+        self.subset_plans: Dict[int, Dict[Tuple[int, ...], ReadPlan]] = {}
+        self.machine_hot_until: Dict[Tuple[str, str], float] = {}
+        # Reconnect supervision: consecutive failed reads and a wake-up event per device
+        self.read_failures: Dict[int, int] = {}
+        self.reconnect_events: Dict[int, asyncio.Event] = {}
+        self.supervisor_tasks: Dict[int, asyncio.Task] = {}
+
+    async def fetch_devices(self) -> Dict[int, DeviceConfig]:
+        """Read and parse the active devices from ins_dwp_devices.
+
+        Raises when the query itself fails; devices with a broken config are
+        logged and skipped.
+        """
+        devices: Dict[int, DeviceConfig] = {}
+        async with self.db.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(
+                    "SELECT id, name, ip_address, config FROM ins_dwp_devices WHERE is_active = 1"
+                )
+                rows = await cur.fetchall()
+
+        for row in rows:
+            try:
+                config = json.loads(row['config']) if isinstance(row['config'], str) else row['config']
+
+                # Parse config to extract lines and machines
+                lines = {}
+                for line_config in config:
+                    line_name = line_config.get('line', '').upper()
+                    machines = []
+
+                    # Handle different config formats
+                    machine_list = line_config.get('list_mechine', line_config.get('machines', []))
+
+                    for machine in machine_list:
+                        machines.append(MachineConfig(
+                            name=machine.get('name', ''),
+                            addr_th_l=int(machine.get('addr_th_l', 0)),
+                            addr_th_r=int(machine.get('addr_th_r', 0)),
+                            addr_side_l=int(machine.get('addr_side_l', 0)),
+                            addr_side_r=int(machine.get('addr_side_r', 0)),
+                        ))
+
+                    if machines:
+                        lines[line_name] = machines
+
+                if lines:
+                    devices[row['id']] = DeviceConfig(
+                        id=row['id'],
+                        name=row['name'],
+                        ip=row['ip_address'],
+                        lines=lines
+                    )
+                else:
+                    logger.warning(f"⚠️ Device {row['name']} has no valid machine configuration")
+
+            except Exception as e:
+                logger.error(f"❌ Failed to parse device {row.get('name', 'unknown')}: {e}")
+                continue
+
+        return devices
 
     async def load_devices(self):
         """Load active devices from database"""
@@ -312,60 +813,15 @@ class DWPPoller:
             return
 
         try:
-            async with self.db.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cur:
-                    await cur.execute(
-                        "SELECT id, name, ip_address, config FROM ins_dwp_devices WHERE is_active = 1"
-                    )
-                    rows = await cur.fetchall()
-                    
-                    if not rows:
-                        logger.warning("⚠️ No active devices found in database!")
-                        logger.info("💡 To add a device, run: php artisan db:seed --class=InsDwpDeviceSeeder")
-                        return
-                    
-                    for row in rows:
-                        try:
-                            config = json.loads(row['config']) if isinstance(row['config'], str) else row['config']
-                            
-                            # Parse config to extract lines and machines
-                            lines = {}
-                            for line_config in config:
-                                line_name = line_config.get('line', '').upper()
-                                machines = []
-                                
-                                # Handle different config formats
-                                machine_list = line_config.get('list_mechine', line_config.get('machines', []))
-                                
-                                for machine in machine_list:
-                                    machines.append(MachineConfig(
-                                        name=machine.get('name', ''),
-                                        addr_th_l=int(machine.get('addr_th_l', 0)),
-                                        addr_th_r=int(machine.get('addr_th_r', 0)),
-                                        addr_side_l=int(machine.get('addr_side_l', 0)),
-                                        addr_side_r=int(machine.get('addr_side_r', 0)),
-                                    ))
-                                
-                                if machines:
-                                    lines[line_name] = machines
-                            
-                            if lines:
-                                self.devices[row['id']] = DeviceConfig(
-                                    id=row['id'],
-                                    name=row['name'],
-                                    ip=row['ip_address'],
-                                    lines=lines
-                                )
-                                logger.info(f"✅ Loaded device: {row['name']} (ID: {row['id']}) at {row['ip_address']}")
-                            else:
-                                logger.warning(f"⚠️ Device {row['name']} has no valid machine configuration")
-                        
-                        except Exception as e:
-                            logger.error(f"❌ Failed to parse device {row.get('name', 'unknown')}: {e}")
-                            continue
-                    
-                    logger.info(f"✅ Loaded {len(self.devices)} active device(s)")
-        
+            self.devices = await self.fetch_devices()
+            if not self.devices:
+                logger.warning("⚠️ No active devices found in database!")
+                logger.info("💡 To add a device, run: php artisan db:seed --class=InsDwpDeviceSeeder")
+                return
+            for dev in self.devices.values():
+                logger.info(f"✅ Loaded device: {dev.name} (ID: {dev.id}) at {dev.ip}")
+            logger.info(f"✅ Loaded {len(self.devices)} active device(s)")
+
         except Exception as e:
             logger.error(f"❌ Failed to load devices from database: {e}")
             # Fallback to example config if database fails
@@ -386,17 +842,134 @@ class DWPPoller:
                 )
             }
             logger.info(f"✅ Loaded {len(self.devices)} device(s) from fallback")
+        self.devices = self.shard_devices(self.devices)
+
+    def shard_devices(self, devices: Dict[int, DeviceConfig], log: bool = True) -> Dict[int, DeviceConfig]:
+        """Keep only the devices owned by this shard (all of them when not sharded)."""
+        if self.shard_index is None:
+            return devices
+        owner = {
+            dev_id: shard_for_device(dev_id, self.shards, self.shard_map) for dev_id in devices
+        }
+        # Counts are numbered per line, so a line should live on a single shard
+        line_shards: Dict[str, set] = {}
+        for dev_id, dev in devices.items():
+            for line in dev.lines:
+                line_shards.setdefault(line, set()).add(owner[dev_id])
+        for line, shard_set in line_shards.items():
+            if log and len(shard_set) > 1:
+                logger.warning(
+                    f"⚠️ Line {line} is split across shards {sorted(shard_set)}; "
+                    f"assign its devices to one shard with --shard-map"
+                )
+        owned = {dev_id: dev for dev_id, dev in devices.items() if owner[dev_id] == self.shard_index}
+        if log:
+            logger.info(
+                f"🧩 Shard {self.shard_index}/{self.shards} owns {len(owned)} device(s): {sorted(owned)}"
+            )
+        return owned
+
+    @staticmethod
+    def machine_configs(devices: Dict[int, DeviceConfig]) -> Dict[Tuple[str, str], MachineConfig]:
+        return {
+            (line, machine.name): machine
+            for dev in devices.values()
+            for line, machines in dev.lines.items()
+            for machine in machines
+        }
+
+    def drop_cycle_states(self, line: str, machine_name: str):
+        """Forget the cycle buffers (and idle-rate state) of a machine that was removed or rewired."""
+        self.machine_hot_until.pop((line, machine_name), None)
+        for pos in ("L", "R"):
+            key = f"{line}-{machine_name}-{pos}"
+            state = self.cycle_states.pop(key, None)
+            if state is not None and state.state == "active":
+                logger.warning(
+                    f"⚠️ Config changed during active cycle | {key} | dropping {len(state)} samples"
+                )
+
+    async def reload_devices(self) -> bool:
+        """Re-read ins_dwp_devices and apply the differences in place.
+
+        Added devices get their poll and supervisor tasks, removed ones are
+        stopped, and changed ones get a new read plan (and a reconnect if the
+        IP moved). Cycle buffers survive for every machine whose registers did
+        not change, so active cycles elsewhere are not lost.
+        Returns True when anything changed.
+        """
+        if not self.db.pool:
+            return False
+        try:
+            fetched = await self.fetch_devices()
+        except Exception as e:
+            logger.error(f"❌ Device reload failed, keeping current configuration: {e}")
+            return False
 
-    async def update_device_state(self, dev_id: int, new_status: str, message: str = None):
+        new = self.shard_devices(fetched, log=False)
+        old = self.devices
+        added = [dev for dev_id, dev in new.items() if dev_id not in old]
+        removed = [dev_id for dev_id in old if dev_id not in new]
+        changed = [dev for dev_id, dev in new.items() if dev_id in old and dev != old[dev_id]]
+        if not (added or removed or changed):
+            return False
+
+        new_machines = self.machine_configs(new)
+        for key, machine in self.machine_configs(old).items():
+            if new_machines.get(key) != machine:
+                self.drop_cycle_states(*key)
+
+        self.devices = new
+        for dev_id in removed:
+            await self.stop_device(dev_id)
+            logger.info(f"➖ Device {old[dev_id].name} (ID: {dev_id}) removed")
+        for dev in changed:
+            prev = old[dev.id]
+            if dev.lines != prev.lines:
+                self.build_read_plan(dev)
+            if dev.ip != prev.ip:
+                client = self.clients.pop(dev.id, None)
+                if client is not None:
+                    await self.close_client(client)
+                self.read_failures[dev.id] = 0
+                self.request_reconnect(dev.id)
+            logger.info(f"✏️ Device {dev.name} (ID: {dev.id}) updated")
+        for dev in added:
+            self.start_device(dev)
+            logger.info(f"➕ Device {dev.name} (ID: {dev.id}) added at {dev.ip}")
+
+        logger.info(
+            f"🔁 Device config reloaded: +{len(added)} -{len(removed)} ~{len(changed)} "
+            f"({len(self.devices)} device(s))"
+        )
+        return True
+
+    async def config_reload_loop(self):
+        """Reload the device config every DEVICE_RELOAD_INTERVAL_SEC or on SIGHUP."""
+        while self.running:
+            try:
+                await asyncio.wait_for(self.reload_event.wait(), DEVICE_RELOAD_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self.reload_event.clear()
+            if not self.running:
+                break
+            try:
+                await self.reload_devices()
+            except Exception as e:
+                logger.error(f"❌ Device reload error: {e}")
+
+    def update_device_state(self, dev_id: int, new_status: str, message: str = None):
         """
-        Update device connection state and log to database when status changes
+        Update device connection state and queue a status log when it changes
+        (written asynchronously by DatabaseManager.flush_status)
         """
         if dev_id not in self.device_states:
             self.device_states[dev_id] = {
                 'status': new_status,
                 'last_change': time.time()
             }
-            await self.db.log_device_status(dev_id, new_status, message)
+            self.db.log_device_status(dev_id, new_status, message)
             return
 
         current_state = self.device_states[dev_id]
@@ -408,7 +981,7 @@ class DWPPoller:
             duration_seconds = int(now - current_state['last_change'])
             
             # Log the new status with duration in previous state
-            await self.db.log_device_status(
+            self.db.log_device_status(
                 dev_id, 
                 new_status, 
                 message, 
@@ -427,211 +1000,446 @@ class DWPPoller:
                 f"(was {old_status} for {duration_seconds}s)"
             )
 
-    async def connect_clients(self):
-        for dev_id, dev in self.devices.items():
-            client = AsyncModbusTcpClient(
-                dev.ip, port=MODBUS_PORT, timeout=MODBUS_TIMEOUT_SEC
-            )
+    @staticmethod
+    def modbus_source(dev: DeviceConfig) -> RegisterSource:
+        return ModbusRegisterSource(dev.ip, MODBUS_PORT, MODBUS_TIMEOUT_SEC, MODBUS_UNIT_ID)
+
+    def simulated_source(self, dev: DeviceConfig, **settings) -> RegisterSource:
+        """In-process press simulator wired to the device's register map.
+
+        Like a real gateway it outlives its connections: a reconnect resumes
+        the same presses. It is only replaced when the register map changes.
+        """
+        registers = {}
+        for line, machines in dev.lines.items():
+            for machine in machines:
+                registers[machine.addr_th_l] = ((line, machine.name, "L"), 0)
+                registers[machine.addr_side_l] = ((line, machine.name, "L"), 1)
+                registers[machine.addr_th_r] = ((line, machine.name, "R"), 0)
+                registers[machine.addr_side_r] = ((line, machine.name, "R"), 1)
+        source = self.simulated_gateways.get(dev.id)
+        if source is None or source.registers != registers:
+            source = self.simulated_gateways[dev.id] = SimulatedRegisterSource(registers, seed=dev.id, **settings)
+        return source
+
+    async def close_client(self, client: RegisterSource):
+        """Best-effort close of a register source."""
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+    async def connect_device(self, dev: DeviceConfig) -> bool:
+        """(Re)create the register source of a device and try to connect once."""
+        old_client = self.clients.pop(dev.id, None)
+        if old_client is not None:
+            await self.close_client(old_client)
+
+        client = self.source_factory(dev)
+        try:
             await client.connect()
-            if client.connected:
-                self.clients[dev_id] = client
-                # Initialize device state and log ONLINE
-                self.device_states[dev_id] = {
-                    'status': 'online',
-                    'last_change': time.time(),
-                    'last_successful_read': time.time()
-                }
-                await self.db.log_device_status(
-                    dev_id, 
-                    'online', 
-                    f"Successfully connected to {dev.name} at {dev.ip}"
-                )
-                logger.info(f"🔌 Connected to {dev.name} ({dev.ip})")
-            else:
-                # Initialize as offline and log
-                self.device_states[dev_id] = {
-                    'status': 'offline',
-                    'last_change': time.time(),
-                    'last_successful_read': None
-                }
-                await self.db.log_device_status(
-                    dev_id, 
-                    'offline', 
-                    f"Failed to connect to {dev.name} at {dev.ip}"
+        except Exception as e:
+            logger.debug(f"Connect to {dev.name} ({dev.ip}) raised: {e}")
+
+        if client.connected:
+            self.clients[dev.id] = client
+            self.read_failures[dev.id] = 0
+            self.update_device_state(
+                dev.id, 'online', f"Successfully connected to {dev.name} at {dev.ip}"
+            )
+            self.device_states[dev.id]['last_successful_read'] = time.time()
+            logger.info(f"🔌 Connected to {dev.name} ({dev.ip})")
+            return True
+
+        await self.close_client(client)
+        self.update_device_state(
+            dev.id, 'offline', f"Failed to connect to {dev.name} at {dev.ip}"
+        )
+        self.device_states[dev.id].setdefault('last_successful_read', None)
+        logger.error(f"❌ Failed to connect to {dev.name} ({dev.ip})")
+        return False
+
+    async def connect_clients(self):
+        """Initial connection attempt; supervise_device keeps retrying the rest."""
+        for dev in self.devices.values():
+            await self.connect_device(dev)
+
+    def request_reconnect(self, dev_id: int):
+        """Wake the device supervisor so it checks the connection right away."""
+        event = self.reconnect_events.get(dev_id)
+        if event is not None:
+            event.set()
+
+    def needs_reconnect(self, dev_id: int) -> bool:
+        client = self.clients.get(dev_id)
+        if client is None or not client.connected:
+            return True
+        # Half-open: the socket still looks connected but every read fails
+        # (gateway rebooted, cable pulled behind a switch, ...)
+        return self.read_failures.get(dev_id, 0) >= HALF_OPEN_FAILURE_THRESHOLD
+
+    async def supervise_device(self, dev: DeviceConfig):
+        """Keep one device connected for the lifetime of the poller.
+
+        Reconnects with exponential backoff and jitter when the client is
+        missing, disconnected or half-open. poll_device picks the new client
+        up on its next tick, so polling resumes without a restart and the
+        cycle state of every other press is untouched.
+        """
+        event = self.reconnect_events.setdefault(dev.id, asyncio.Event())
+        delay = RECONNECT_BASE_DELAY_SEC
+        while self.running:
+            # reload_devices may have replaced the config (e.g. a new IP or name)
+            dev = self.devices.get(dev.id, dev)
+            if not self.needs_reconnect(dev.id):
+                delay = RECONNECT_BASE_DELAY_SEC
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), SUPERVISOR_CHECK_INTERVAL_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            client = self.clients.get(dev.id)
+            if client is not None and client.connected:
+                logger.warning(
+                    f"🔌 {dev.name} half-open: {self.read_failures.get(dev.id, 0)} consecutive "
+                    f"failed reads, forcing reconnect"
                 )
-                logger.error(f"❌ Failed to connect to {dev.name} ({dev.ip})")
+            if await self.connect_device(dev):
+                delay = RECONNECT_BASE_DELAY_SEC
+                continue
+
+            wait = delay * random.uniform(1 - RECONNECT_JITTER, 1 + RECONNECT_JITTER)
+            logger.info(f"⏳ {dev.name}: next reconnect attempt in {wait:.1f}s")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY_SEC)
+
+    def polled_machines(self, dev: DeviceConfig) -> List[Tuple[str, MachineConfig]]:
+        """(line, machine) pairs of a device, honouring --machine filtering."""
+        return [
+            (line, machine)
+            for line, machines in dev.lines.items()
+            for machine in machines
+            # If configured to poll only one machine, skip others
+            if not self.poll_only_machine or machine.name == self.poll_only_machine
+        ]
+
+    @staticmethod
+    def machine_addresses(machines: List[Tuple[str, MachineConfig]]) -> List[int]:
+        addrs = []
+        for _, machine in machines:
+            addrs.extend(
+                [machine.addr_th_l, machine.addr_th_r, machine.addr_side_l, machine.addr_side_r]
+            )
+        return addrs
+
+    def build_read_plan(self, dev: DeviceConfig) -> ReadPlan:
+        """Merge the register addresses of all polled machines of a device."""
+        machines = self.polled_machines(dev)
+        plan = ReadPlan(self.machine_addresses(machines))
+        self.read_plans[dev.id] = plan
+        self.device_machines[dev.id] = machines
+        self.subset_plans[dev.id] = {}
+        logger.info(
+            f"🧭 Read plan for {dev.name}: {len(plan.addresses)} registers in {len(plan)} request(s) "
+            f"{[(b.start, b.count) for b in plan.blocks]}"
+        )
+        return plan
+
+    def read_plan_for(self, dev_id: int, due: Tuple[int, ...]) -> ReadPlan:
+        """Read plan for the machines at indexes `due` of device_machines[dev_id]."""
+        machines = self.device_machines[dev_id]
+        if len(due) == len(machines):
+            return self.read_plans[dev_id]
+        cache = self.subset_plans.setdefault(dev_id, {})
+        plan = cache.get(due)
+        if plan is None:
+            if len(cache) >= READ_PLAN_CACHE_MAX:
+                cache.clear()
+            plan = cache[due] = ReadPlan(self.machine_addresses([machines[i] for i in due]))
+        return plan
+
+    def due_machines(self, dev_id: int, idle_due: bool) -> Tuple[int, ...]:
+        """Indexes of the machines to read this tick: every machine with a
+        cycle in progress (or just finished), and all of them on the ticks
+        where the idle interval is due. Idle machines share those ticks, so
+        their registers still go out in one coalesced read."""
+        machines = self.device_machines[dev_id]
+        if idle_due:
+            return tuple(range(len(machines)))
+        mono = self.monotonic()
+        hot_until = self.machine_hot_until
+        return tuple(
+            i for i, (line, machine) in enumerate(machines) if hot_until.get((line, machine.name), 0.0) > mono
+        )
+
+    async def read_block(self, client: RegisterSource, start_addr: int, count: int) -> List[int]:
+        return await client.read_input_registers(start_addr, count)
 
     async def read_registers(
-        self, client: AsyncModbusTcpClient, addresses: List[int], dev_id: int = None
-    ) -> List[int]:
+        self, client: RegisterSource, plan: ReadPlan, dev_id: int = None
+    ) -> Dict[int, int]:
+        """Execute a device read plan and return {address: value}."""
         try:
-            start_addr = min(addresses)
-            count = max(addresses) - start_addr + 1
-            # Try with 'unit' parameter (newer pymodbus 3.x)
-            # If that fails, try without it (some versions don't need it)
-            try:
-                response = await client.read_input_registers(
-                    address=start_addr, count=count, unit=MODBUS_UNIT_ID
-                )
-            except TypeError:
-                # Fallback: try without unit parameter
-                response = await client.read_input_registers(
-                    address=start_addr, count=count
-                )
-            
-            if response.isError():
-                raise ModbusException(f"Modbus error: {response}")
-
-            # Map back to requested addresses
-            values = []
-            for addr in addresses:
-                idx = addr - start_addr
-                values.append(
-                    response.registers[idx] if idx < len(response.registers) else 0
-                )
-            
+            started = time.perf_counter()
+            block_values = []
+            for block in plan.blocks:
+                block_values.append(await self.read_block(client, block.start, block.count))
+            values = plan.demux(block_values)
+            if dev_id is not None:
+                MODBUS_READ_SECONDS.observe(time.perf_counter() - started, device=dev_id)
+                self.read_failures[dev_id] = 0
+
             # Success - update device state to online ONLY if it was NOT online before
             if dev_id and dev_id in self.device_states:
                 # Track last successful read timestamp
                 self.device_states[dev_id]['last_successful_read'] = time.time()
                 current_status = self.device_states[dev_id].get('status')
                 if current_status != 'online':
-                    await self.update_device_state(dev_id, 'online', 'Connection restored')
-            
+                    self.update_device_state(dev_id, 'online', 'Connection restored')
+
             return values
         except Exception as e:
-            # Log timeout or error
-            if dev_id and dev_id in self.device_states:
+            if dev_id is not None:
+                MODBUS_READ_ERRORS.inc(device=dev_id)
+                failures = self.read_failures.get(dev_id, 0) + 1
+                self.read_failures[dev_id] = failures
+                if failures >= HALF_OPEN_FAILURE_THRESHOLD:
+                    self.request_reconnect(dev_id)
+            # Log timeout or error (hysteresis: a single dropped read
+            # does not take the device down)
+            failures = self.read_failures.get(dev_id, 0)
+            if dev_id and dev_id in self.device_states and failures >= STATUS_FAILURE_HYSTERESIS:
                 if 'timeout' in str(e).lower():
-                    await self.update_device_state(dev_id, 'timeout', f"Modbus read timeout: {e}")
+                    self.update_device_state(dev_id, 'timeout', f"Modbus read timeout: {e}")
                 else:
-                    await self.update_device_state(dev_id, 'offline', f"Modbus read failed: {e}")
-            logger.error(f"Modbus read failed: {e}")
+                    self.update_device_state(dev_id, 'offline', f"Modbus read failed: {e}")
+            log_sampler.log(logger, logging.ERROR, ("read", dev_id), "Modbus read failed on device %s: %s", dev_id, e)
             raise
 
-    async def poll_machine(
-        self,
-        dev: DeviceConfig,
-        client: AsyncModbusTcpClient,
-        line: str,
-        machine: MachineConfig,
-    ):
+    def warn_read_failure(self, line: str, machine: MachineConfig, error: Exception):
+        """Log potential data loss when a read fails during active cycles"""
+        for pos in ("L", "R"):
+            key = f"{line}-{machine.name}-{pos}"
+            state = self.cycle_states.get(key)
+            if state is not None and state.state == "active":
+                log_sampler.log(
+                    logger, logging.WARNING, ("read-active", key),
+                    "⚠️ READ FAILED DURING ACTIVE CYCLE | %s | Current samples: %d | Error: %s",
+                    key, len(state), error,
+                )
+
+    async def process_machine(self, line: str, machine: MachineConfig, values: Dict[int, int]):
         key_l = f"{line}-{machine.name}-L"
         key_r = f"{line}-{machine.name}-R"
 
-        addrs = [
-            machine.addr_th_l,
-            machine.addr_th_r,
-            machine.addr_side_l,
-            machine.addr_side_r,
-        ]
-        try:
-            vals = await self.read_registers(client, addrs, dev.id)
-            th_l, th_r, side_l, side_r = vals
-        except Exception as e:
-            # Log potential data loss when read fails during active cycles
-            if key_l in self.cycle_states and self.cycle_states[key_l].get("state") == "active":
-                logger.warning(
-                    f"⚠️ READ FAILED DURING ACTIVE CYCLE | {key_l} | "
-                    f"Current samples: {len(self.cycle_states[key_l].get('th_buf', []))} | "
-                    f"Error: {e}"
-                )
-            if key_r in self.cycle_states and self.cycle_states[key_r].get("state") == "active":
-                logger.warning(
-                    f"⚠️ READ FAILED DURING ACTIVE CYCLE | {key_r} | "
-                    f"Current samples: {len(self.cycle_states[key_r].get('th_buf', []))} | "
-                    f"Error: {e}"
-                )
-            return
+        th_l = values[machine.addr_th_l]
+        th_r = values[machine.addr_th_r]
+        side_l = values[machine.addr_side_l]
+        side_r = values[machine.addr_side_r]
 
         await self.process_position(line, machine.name, "L", th_l, side_l, key_l)
         await self.process_position(line, machine.name, "R", th_r, side_r, key_r)
 
+        # Keep sampling at full rate while either position is in a cycle
+        if self.cycle_states[key_l].state == "active" or self.cycle_states[key_r].state == "active":
+            self.machine_hot_until[(line, machine.name)] = self.monotonic() + IDLE_GRACE_SEC
+
     async def process_position(
         self, line: str, machine_name: str, pos: str, th: int, side: int, key: str
     ):
-        now = time.time()
-        state = self.cycle_states.setdefault(key, {"state": "idle"})
-
-        # Timeout reset — if a cycle runs too long, save as TIMEOUT (best-effort)
-        if (
-            state["state"] != "idle"
-            and (now - state.get("start_time", 0)) > CYCLE_TIMEOUT_SEC
-        ):
-            elapsed_ms = int((now - state.get("start_time", now)) * 1000)
-            sample_count = len(state.get("th_buf", []))
-            max_th = max(state.get("th_buf", [0])) if state.get("th_buf") else 0
-            max_side = max(state.get("side_buf", [0])) if state.get("side_buf") else 0
-            
-            logger.warning(
-                f"⏱️  TIMEOUT DATA LOSS RISK | {key} | "
-                f"Duration: {elapsed_ms}ms (>{CYCLE_TIMEOUT_SEC}s) | "
-                f"Samples: {sample_count} | TH_max: {max_th} | Side_max: {max_side} | "
-                f"Attempting to save as TIMEOUT cycle..."
+        now = self.clock()
+        mono = self.monotonic()
+        state = self.cycle_states.get(key)
+        if state is None:
+            # room for MAX_BUFFER_LENGTH samples plus the one that triggers OVERFLOW
+            state = self.cycle_states[key] = CycleState(
+                MAX_BUFFER_LENGTH + 1, CycleAnalyzer(**ANALYZER_SETTINGS)
             )
-            
-            # try to save whatever we have as a TIMEOUT cycle
-            try:
-                await self.save_cycle_to_db(line, machine_name, pos, state, elapsed_ms, "TIMEOUT")
-                logger.info(f"✅ TIMEOUT cycle saved successfully for {key}")
-            except Exception as e:
-                logger.error(
-                    f"❌ DATA LOST - Failed to save TIMEOUT cycle {key}: {e} | "
-                    f"Lost data: samples={sample_count}, duration={elapsed_ms}ms, "
-                    f"TH_max={max_th}, Side_max={max_side}"
-                )
-            state["state"] = "idle"
 
-        # State machine
-        if state["state"] == "idle":
+        # State machine (timeouts are handled by timeout_sweep_loop)
+        if state.state == "idle":
             if th >= CYCLE_START_THRESHOLD or side >= CYCLE_START_THRESHOLD:
-                state.update(
-                    {
-                        "state": "active",
-                        "start_time": now,
-                        "last_nonzero": now,
-                        "th_buf": [th],
-                        "side_buf": [side],
-                        "t_buf": [now],  # per-sample epoch timestamps (seconds)
-                    }
-                )
-                logger.debug(f"🟢 START {key}: TH={th}, Side={side}")
+                state.start(th, side, now, mono)
+                self.add_cycle_deadline(line, machine_name, pos, key, state)
+                logger.debug("🟢 START %s: TH=%d, Side=%d", key, th, side)
 
-        elif state["state"] == "active":
-            state["th_buf"].append(th)
-            state["side_buf"].append(side)
-            # record timestamp for each sample
-            state.setdefault("t_buf", []).append(now)
+        elif state.state == "active":
+            state.append(th, side, now, mono)
 
             # Update last nonzero time if above threshold
             if th > CYCLE_END_THRESHOLD or side > CYCLE_END_THRESHOLD:
-                state["last_nonzero"] = now
+                state.last_nonzero = mono
 
-            elapsed_ms = (now - state["start_time"]) * 1000
+            elapsed_ms = state.elapsed(mono) * 1000
 
             # End condition: 500ms of zeros + min duration
             if (
-                now - state["last_nonzero"]
+                mono - state.last_nonzero
             ) >= 0.5 and elapsed_ms >= MIN_CYCLE_DURATION_MS:
-                await self.save_cycle_to_db(
-                    line, machine_name, pos, state, int(elapsed_ms)
-                )
-                state["state"] = "idle"
+                self.enqueue_cycle(line, machine_name, pos, state, int(elapsed_ms))
+                state.reset()
 
             # Buffer overflow
-            if len(state["th_buf"]) > MAX_BUFFER_LENGTH:
-                max_th_current = max(state["th_buf"]) if state["th_buf"] else 0
-                max_side_current = max(state["side_buf"]) if state["side_buf"] else 0
+            elif len(state) > MAX_BUFFER_LENGTH:
+                max_th_current = state.max_th()
+                max_side_current = state.max_side()
                 logger.warning(
-                    f"⚠️ BUFFER OVERFLOW - FORCING SAVE | {key} | "
-                    f"Buffer size: {len(state['th_buf'])} > MAX_BUFFER_LENGTH ({MAX_BUFFER_LENGTH}) | "
-                    f"Duration so far: {int(elapsed_ms)}ms | "
-                    f"TH_max: {max_th_current} | Side_max: {max_side_current}"
+                    "⚠️ BUFFER OVERFLOW - FORCING SAVE | %s | Buffer size: %d > MAX_BUFFER_LENGTH (%d) | "
+                    "Duration so far: %dms | TH_max: %d | Side_max: %d",
+                    key, len(state), MAX_BUFFER_LENGTH, int(elapsed_ms), max_th_current, max_side_current,
                 )
-                await self.save_cycle_to_db(
-                    line, machine_name, pos, state, int(elapsed_ms), "OVERFLOW"
+                self.enqueue_cycle(line, machine_name, pos, state, int(elapsed_ms), "OVERFLOW")
+                state.reset()
+
+    # ----------------------------
+    # CYCLE TIMEOUTS
+    # ----------------------------
+    def add_cycle_deadline(self, line: str, machine_name: str, pos: str, key: str, state: CycleState):
+        was_empty = not self.cycle_deadlines
+        self.cycle_deadlines.add(
+            state.start_mono + CYCLE_TIMEOUT_SEC, state.start_mono, (line, machine_name, pos, key, state)
+        )
+        if was_empty:
+            self.deadline_event.set()
+
+    def sweep_timeouts(self, mono: float) -> int:
+        """Save every cycle that has been open longer than CYCLE_TIMEOUT_SEC
+        as TIMEOUT. Returns the number of cycles flushed."""
+        flushed = 0
+        for start_mono, (line, machine_name, pos, key, state) in self.cycle_deadlines.pop_due(mono):
+            # Skip deadlines of cycles that ended, restarted or were dropped by a reload
+            if (
+                state.state != "active"
+                or state.start_mono != start_mono
+                or self.cycle_states.get(key) is not state
+            ):
+                continue
+            self.timeout_cycle(line, machine_name, pos, key, state, mono)
+            flushed += 1
+        return flushed
+
+    def timeout_cycle(self, line: str, machine_name: str, pos: str, key: str, state: CycleState, mono: float):
+        """Save an over-long cycle as TIMEOUT (best-effort) and reset it."""
+        elapsed_ms = int(state.elapsed(mono) * 1000)
+        sample_count = len(state)
+        max_th = state.max_th()
+        max_side = state.max_side()
+
+        logger.warning(
+            "⏱️  TIMEOUT DATA LOSS RISK | %s | Duration: %dms (>%ss) | "
+            "Samples: %d | TH_max: %d | Side_max: %d | Attempting to save as TIMEOUT cycle...",
+            key, elapsed_ms, CYCLE_TIMEOUT_SEC, sample_count, max_th, max_side,
+        )
+
+        # hand whatever we have to the save workers as a TIMEOUT cycle
+        if self.enqueue_cycle(line, machine_name, pos, state, elapsed_ms, "TIMEOUT"):
+            logger.info("✅ TIMEOUT cycle queued for saving: %s", key)
+        else:
+            logger.error(
+                "❌ DATA LOST - Failed to queue TIMEOUT cycle %s | "
+                "Lost data: samples=%d, duration=%dms, TH_max=%d, Side_max=%d",
+                key, sample_count, elapsed_ms, max_th, max_side,
+            )
+        state.reset()
+
+    async def timeout_sweep_loop(self):
+        """Flush timed-out cycles on schedule, also for devices that stopped
+        answering and therefore never deliver the sample that used to trigger
+        the check."""
+        while self.running:
+            deadline = self.cycle_deadlines.next_deadline()
+            if deadline is None:
+                self.deadline_event.clear()
+                await self.deadline_event.wait()
+                continue
+            # new deadlines are always later than the queued ones (start + a
+            # constant), so sleeping until the earliest one is enough
+            delay = deadline - self.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay + TIMEOUT_SWEEP_SLACK_SEC)
+            try:
+                self.sweep_timeouts(self.monotonic())
+            except Exception as e:
+                logger.error("❌ Timeout sweep failed: %s", e)
+
+    # ----------------------------
+    # CYCLE SAVE PIPELINE
+    # ----------------------------
+    def enqueue_cycle(
+        self,
+        line: str,
+        machine_name: str,
+        pos: str,
+        state: CycleState,
+        duration_ms: int,
+        cycle_type: str = "COMPLETE",
+    ) -> bool:
+        """Hand a finished cycle buffer to the save workers without blocking.
+
+        The samples are copied out of `state` (its arrays are reused by the
+        next cycle), so the workers can analyse them while sampling continues.
+        """
+        snapshot = state.snapshot()
+        try:
+            self.cycle_queue.put_nowait((line, machine_name, pos, snapshot, duration_ms, cycle_type))
+        except asyncio.QueueFull:
+            self.queue_stats["dropped"] += 1
+            CYCLES.inc(line=line, machine=extract_machine_id(machine_name), type="DROPPED")
+            logger.error(
+                "❌ CYCLE QUEUE FULL - DATA LOST | %s-%s-%s | Cycle_type: %s | Samples: %d | Queue size: %d",
+                line, machine_name, pos, cycle_type, len(snapshot["th_buf"]), CYCLE_QUEUE_MAXSIZE,
+            )
+            return False
+
+        self.queue_stats["enqueued"] += 1
+        depth = self.cycle_queue.qsize()
+        if depth > self.queue_stats["max_depth"]:
+            self.queue_stats["max_depth"] = depth
+        if depth == CYCLE_QUEUE_WARN_DEPTH:
+            logger.warning("⚠️ Cycle save queue backing up: %d pending (max %d)", depth, CYCLE_QUEUE_MAXSIZE)
+        return True
+
+    async def cycle_worker(self, worker_id: int):
+        """Consume finished cycles: analysis, validation and DB hand-off."""
+        while True:
+            line, machine_name, pos, snapshot, duration_ms, cycle_type = await self.cycle_queue.get()
+            started = time.perf_counter()
+            try:
+                await self.save_cycle_to_db(line, machine_name, pos, snapshot, duration_ms, cycle_type)
+            except Exception as e:
+                logger.error(
+                    "❌ DATA LOST - Save worker %d failed on %s-%s-%s (%s): %s",
+                    worker_id, line, machine_name, pos, cycle_type, e,
                 )
-                state["state"] = "idle"
+            finally:
+                elapsed = time.perf_counter() - started
+                self.queue_stats["processed"] += 1
+                self.queue_stats["last_save_ms"] = elapsed * 1000
+                CYCLE_ANALYSIS_SECONDS.observe(elapsed)
+                self.cycle_queue.task_done()
+
+    def start_cycle_workers(self):
+        self.cycle_workers = [
+            asyncio.create_task(self.cycle_worker(i), name=f"cycle-worker-{i}")
+            for i in range(CYCLE_WORKERS)
+        ]
+
+    async def stop_cycle_workers(self, timeout: float = 10.0):
+        """Let the workers drain the queue (bounded by `timeout`), then stop them."""
+        if not self.cycle_workers:
+            return
+        try:
+            await asyncio.wait_for(self.cycle_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                f"❌ DATA LOST - {self.cycle_queue.qsize()} cycle(s) still queued at shutdown"
+            )
+        for task in self.cycle_workers:
+            task.cancel()
+        await asyncio.gather(*self.cycle_workers, return_exceptions=True)
+        self.cycle_workers = []
 
     # ----------------------------
     # NEW: WAVEFORM VALIDATION
@@ -647,96 +1455,11 @@ class DWPPoller:
     ) -> Tuple[bool, str]:
         """
         Returns (is_valid, reason_if_invalid)
-        Flags physically implausible waveforms.
+        Flags physically implausible waveforms (see waveform_checks).
         """
-        if not th_waveform or not side_waveform:
-            return False, "Empty waveform"
-
-        if len(th_waveform) != len(side_waveform):
-            return False, "TH/Side length mismatch"
-
-        max_th = max(th_waveform)
-        max_side = max(side_waveform)
-        min_th = min(th_waveform)
-        min_side = min(side_waveform)
-
-        # -------------------------
-        # 1. Side pressure near-zero while TH is high → sensor fault
-        #    In split cycles, allow *brief* side drop, but not entire flat zero
-        # -------------------------
-        if max_th >= 30 and max_side <= 3:
-            nonzero_side = sum(1 for v in side_waveform if v > 5)
-            zero_side_ratio = (len(side_waveform) - nonzero_side) / len(side_waveform)
-            if zero_side_ratio > 0.8:  # >80% zeros → likely sensor disconnected
-                return (
-                    False,
-                    f"Side sensor likely disconnected: TH={max_th}, Side max={max_side}, {zero_side_ratio:.0%} zeros",
-                )
-
-        # -------------------------
-        # 2. Extreme Δ/dt (jumps > 30 in one 100ms sample)
-        # -------------------------
-        for i in range(1, len(th_waveform)):
-            dth = abs(th_waveform[i] - th_waveform[i - 1])
-            dside = abs(side_waveform[i] - side_waveform[i - 1])
-            if dth > 30 or dside > 30:
-                if dth > 40 or dside > 40:
-                    return (
-                        False,
-                        f"Impossible pressure jump: ΔTH={dth}, ΔSide={dside} at sample {i}",
-                    )
-                # else: log warning but allow (e.g., noise spike)
-                logger.debug(
-                    f"⚠️ Large pressure jump ΔTH={dth}, ΔSide={dside} at sample {i}"
-                )
-
-        # -------------------------
-        # 3. Flatline detection
-        # -------------------------
-        if max_th - min_th <= 1 and max_side - min_side <= 1 and sample_count > 3:
-            if max_th == 0 and max_side == 0:
-                return False, "Zero flatline — no cycle detected"
-            return False, "Flatline waveform — no pressure change"
-
-        # -------------------------
-        # 4. Duration vs sample sanity
-        # Expected sample interval: prefer measured median interval if
-        # per-sample timestamps are available. Otherwise fall back to 100ms.
-        # This avoids false "Too few samples" when actual poll interval is
-        # slower than the nominal 100ms due to network/IO latency.
-        # -------------------------
-        median_interval_ms = 100
-        if timestamps_ms and len(timestamps_ms) > 1:
-            try:
-                diffs = [
-                    timestamps_ms[i] - timestamps_ms[i - 1]
-                    for i in range(1, len(timestamps_ms))
-                ]
-                # ignore zero diffs if any (defensive)
-                diffs = [d for d in diffs if d > 0]
-                if diffs:
-                    median_interval_ms = max(1, int(statistics.median(diffs)))
-            except Exception:
-                median_interval_ms = 100
-
-        expected_samples = max(1, round(duration_ms / median_interval_ms))
-        if sample_count < 1 or expected_samples == 0:
-            return False, "Invalid duration or sample count"
-        # Allow sparser buffers now: treat <15% of expected as missed samples
-        if sample_count < expected_samples * 0.15:  # <15% expected → missed samples
-            return (
-                False,
-                f"Too few samples: {sample_count} for {duration_ms}ms (expected ~{expected_samples}, median_interval={median_interval_ms}ms)",
-            )
-
-        # -------------------------
-        # 5. Negative values (shouldn't happen, but guard)
-        # -------------------------
-        if min_th < 0 or min_side < 0:
-            return False, "Negative pressure reading"
-
-        # All passed
-        return True, "OK"
+        return waveform_checks.validate_waveform_sanity(
+            th_waveform, side_waveform, sample_count, duration_ms, position, timestamps_ms
+        )
 
     def compute_std_error_flags(
         self,
@@ -749,28 +1472,9 @@ class DWPPoller:
         Returns [[th_flag], [side_flag]] where 1 = OK, 0 = suspect
         Enhances original logic with waveform-aware checks
         """
-        th_flag = 1 if (GOOD_MIN <= max_th <= GOOD_MAX) else 0
-        side_flag = 1 if (GOOD_MIN <= max_side <= GOOD_MAX) else 0
-
-        # Side sensor likely failed if TH active but Side flat near zero
-        if max_th >= 30 and max_side <= 3:
-            nonzero_side = sum(1 for v in side_waveform if v > 5)
-            if nonzero_side <= 1:
-                side_flag = 0
-
-        # TH sensor likely failed if Side active but TH flat near zero
-        if max_side >= 30 and max_th <= 3:
-            nonzero_th = sum(1 for v in th_waveform if v > 5)
-            if nonzero_th <= 1:
-                th_flag = 0
-
-        # Flatline sensors
-        if len(set(th_waveform)) == 1 and len(th_waveform) > 2:
-            th_flag = 0
-        if len(set(side_waveform)) == 1 and len(side_waveform) > 2:
-            side_flag = 0
-
-        return [[th_flag], [side_flag]]
+        return waveform_checks.compute_std_error_flags(
+            th_waveform, side_waveform, max_th, max_side, GOOD_MIN, GOOD_MAX
+        )
 
     async def save_cycle_to_db(
         self,
@@ -781,42 +1485,53 @@ class DWPPoller:
         duration_ms: int,
         cycle_type: str = "COMPLETE",
     ):
-        print("array", state["th_buf"])
-        print("array", state["side_buf"])
         th_buf = state["th_buf"]
         side_buf = state["side_buf"]
         t_buf = state.get("t_buf", [])
-        # Convert per-sample timestamps to epoch-ms for duration / sanity checks
+        m_buf = state.get("m_buf")
+        if m_buf and t_buf:
+            # Anchor the monotonic sample times at the wall time of the first
+            # sample: intervals and durations stay exact across clock steps
+            t_buf = [t_buf[0] + (m - m_buf[0]) for m in m_buf]
+        # Convert per-sample timestamps to epoch-ms for storage / sanity checks
         timestamps_ms = [int(ts * 1000) for ts in t_buf] if t_buf else []
 
+        # Peaks, split points and waveform stats were computed while the cycle
+        # was sampled (see cycle_analyzer); only replay the buffer if not
+        analysis = state.get("analysis") or analyze_buffer(
+            th_buf, side_buf, timestamps_ms, **ANALYZER_SETTINGS
+        )
+        stats = analysis.stats
+        max_th = stats.max_th if th_buf else 0
+        max_side = stats.max_side if side_buf else 0
+        sample_count = len(th_buf)
+
         # Prefer duration computed from timestamps (more accurate); fall back to provided duration_ms
         if len(timestamps_ms) > 1:
             duration_ms_field = int(timestamps_ms[-1] - timestamps_ms[0])
         else:
+            # duration_ms param is already in milliseconds from the caller
             duration_ms_field = int(duration_ms)
 
+        # Convert to seconds for storage/visualization (float seconds)
         duration_s = duration_ms_field / 1000.0
 
         # If the entire buffer is shorter than MIN_DURATION_S, skip saving/splitting
         if duration_s < MIN_DURATION_S:
-            max_th = max(th_buf) if th_buf else 0
-            max_side = max(side_buf) if side_buf else 0
             logger.info(
-                f"⏭️ SHORT CYCLE SKIPPED - NOT SAVED | {line}-{machine_name}-{pos} | "
-                f"Duration: {duration_s:.1f}s < MIN_DURATION_S ({MIN_DURATION_S}s) | "
-                f"Samples: {len(th_buf)} | TH_max: {max_th} | Side_max: {max_side}"
+                "⏭️ SHORT CYCLE SKIPPED - NOT SAVED | %s-%s-%s | Duration: %.1fs < MIN_DURATION_S (%ss) | "
+                "Samples: %d | TH_max: %d | Side_max: %d",
+                line, machine_name, pos, duration_s, MIN_DURATION_S, len(th_buf), max_th, max_side,
             )
+            CYCLES.inc(line=line, machine=extract_machine_id(machine_name), type="SHORT")
             return
 
-        # Build combined signal (element-wise max) to detect physical cycle peaks
-        combined = [max(a, b) for a, b in zip(th_buf, side_buf)] if th_buf and side_buf else th_buf or side_buf
-
-        # Detect peaks on combined signal so we catch cycles where TH and Side
-        # peak at different times or where only one channel is active.
-        peaks, _ = find_peaks(combined, height=CYCLE_START_THRESHOLD, distance=SPLIT_PEAK_DISTANCE)
+        # Peaks on the combined (element-wise max) signal catch cycles where TH
+        # and Side peak at different times or where only one channel is active.
+        peaks = analysis.peaks
         if len(peaks) > 1:
             logger.info(
-                f"ℹ️ Multiple peaks ({len(peaks)}) in {line}-{machine_name}-{pos} — attempting split"
+                "ℹ️ Multiple peaks (%d) in %s-%s-%s — attempting split", len(peaks), line, machine_name, pos
             )
             try:
                 saved_count = await self.split_and_save_cycles(
@@ -828,44 +1543,29 @@ class DWPPoller:
                     list(peaks),
                     duration_ms,
                     t_buf,
+                    analysis.segments,
                 )
             except Exception as e:
-                logger.error(f"❌ Error splitting cycles: {e}")
+                logger.error("❌ Error splitting cycles: %s", e)
                 saved_count = 0
             if saved_count and saved_count > 0:
-                logger.info(f"✅ Saved {saved_count} split sub-cycles for {line}-{machine_name}-{pos}")
+                logger.info("✅ Saved %d split sub-cycles for %s-%s-%s", saved_count, line, machine_name, pos)
                 return
 
-        max_th = max(th_buf) if th_buf else 0
-        max_side = max(side_buf) if side_buf else 0
-        sample_count = len(th_buf)
         # Precompute std_error so it's always available for logging
-        std_error = self.compute_std_error_flags(th_buf, side_buf, max_th, max_side)
-
-        # Convert per-sample timestamps to epoch-ms for storage/visualization
-        timestamps_ms = [int(ts * 1000) for ts in t_buf] if t_buf else []
-
-        # Prefer duration computed from timestamps (more accurate); fall back to provided duration_ms
-        if len(timestamps_ms) > 1:
-            duration_ms_field = int(timestamps_ms[-1] - timestamps_ms[0])
-        else:
-            # duration_ms param is already in milliseconds from the caller
-            duration_ms_field = int(duration_ms)
-
-        # Convert to seconds for storage/visualization (float seconds)
-        duration_s = duration_ms_field / 1000.0
+        std_error = waveform_checks.std_error_flags_from_stats(stats, GOOD_MIN, GOOD_MAX)
 
         # 🆕 WAVEFORM SANITY CHECK
-        is_sane, reason = self.validate_waveform_sanity(
-            th_buf, side_buf, sample_count, duration_ms_field, pos, timestamps_ms
-        )
+        if not sample_count:
+            is_sane, reason = False, "Empty waveform"
+        else:
+            is_sane, reason = waveform_checks.check_waveform_stats(stats, sample_count, duration_ms_field)
         if not is_sane:
             logger.warning(
-                f"⚠️ INVALID WAVEFORM DETECTED - SAVING AS DEFECTIVE | {line}-{machine_name}-{pos} | "
-                f"Reason: {reason} | Duration: {duration_s:.1f}s | Samples: {sample_count} | "
-                f"TH_max: {max_th} | Side_max: {max_side} | "
-                f"TH_data: {th_buf[:10]}{'...' if len(th_buf) > 10 else ''} | "
-                f"Side_data: {side_buf[:10]}{'...' if len(side_buf) > 10 else ''}"
+                "⚠️ INVALID WAVEFORM DETECTED - SAVING AS DEFECTIVE | %s-%s-%s | Reason: %s | "
+                "Duration: %.1fs | Samples: %d | TH_max: %d | Side_max: %d | TH_data: %s | Side_data: %s",
+                line, machine_name, pos, reason, duration_s, sample_count, max_th, max_side,
+                BufferPreview(th_buf, 10), BufferPreview(side_buf, 10),
             )
             # Force grade to DEFECTIVE and override cycle_type
             grade = "DEFECTIVE"
@@ -891,36 +1591,143 @@ class DWPPoller:
         success = await self.db.save_cycle(cycle_data)
         if success:
             logger.info(
-                f"✅ {grade} | {line}-{machine_name}-{pos} | "
-                    f"samples={sample_count} | {duration_s:.3f}s | "
-                    f"TH={max_th}, Side={max_side} | std={std_error}"
+                "✅ %s | %s-%s-%s | samples=%d | %.3fs | TH=%d, Side=%d | std=%s",
+                grade, line, machine_name, pos, sample_count, duration_s, max_th, max_side, std_error,
             )
         else:
             logger.error(
-                f"❌ DATABASE SAVE FAILED - DATA LOST | {line}-{machine_name}-{pos} | "
-                f"Grade: {grade} | Cycle_type: {cycle_type} | "
-                f"Duration: {duration_s:.3f}s | Samples: {sample_count} | "
-                f"TH_max: {max_th} | Side_max: {max_side} | "
-                f"TH_waveform: {th_buf[:20]}{'...' if len(th_buf) > 20 else ''} | "
-                f"Side_waveform: {side_buf[:20]}{'...' if len(side_buf) > 20 else ''}"
+                "❌ DATABASE SAVE FAILED - DATA LOST | %s-%s-%s | Grade: %s | Cycle_type: %s | "
+                "Duration: %.3fs | Samples: %d | TH_max: %d | Side_max: %d | TH_waveform: %s | Side_waveform: %s",
+                line, machine_name, pos, grade, cycle_type, duration_s, sample_count, max_th, max_side,
+                BufferPreview(th_buf), BufferPreview(side_buf),
             )
 
-    async def poll_loop(self):
+    async def poll_device(self, dev: DeviceConfig):
+        """Poll every machine of a single device on its own tick schedule.
+
+        Each device runs in its own task so a slow or unreachable gateway only
+        delays its own machines, never the rest of the floor. All registers of
+        the device are fetched per tick with one coalesced read plan, limited
+        to the machines that are due at the adaptive rate (see due_machines).
+        """
+        if dev.id not in self.read_plans:
+            self.build_read_plan(dev)
+        # Ticks fire at absolute monotonic deadlines (start + k * interval), so
+        # lateness of one tick never shifts the ones after it
+        next_tick = next_idle = self.monotonic()
         while self.running:
-            start = time.perf_counter()
-            for dev in self.devices.values():
-                client = self.clients.get(dev.id)
-                if not client or not client.connected:
-                    continue
-                for line, machines in dev.lines.items():
-                    for machine in machines:
-                        # If configured to poll only one machine, skip others
-                        if self.poll_only_machine and machine.name != self.poll_only_machine:
-                            continue
-                        await self.poll_machine(dev, client, line, machine)
-            # Maintain polling frequency
-            elapsed = time.perf_counter() - start
-            await asyncio.sleep(max(0, POLL_INTERVAL_SEC - elapsed))
+            # Looked up every tick so a config reload takes effect immediately
+            dev = self.devices.get(dev.id, dev)
+            machines = self.device_machines[dev.id]
+            client = self.clients.get(dev.id)
+            # Half a tick of slack: both schedules accumulate float steps, and an
+            # idle deadline a hair past its fast tick must not slip a whole tick
+            idle_due = self.monotonic() >= next_idle - POLL_INTERVAL_SEC / 2
+            due = self.due_machines(dev.id, idle_due) if machines else ()
+            if not client or not client.connected:
+                # Dropped connection: let the supervisor reconnect, keep ticking
+                self.request_reconnect(dev.id)
+            elif due:
+                if idle_due:
+                    next_idle += IDLE_POLL_INTERVAL_SEC
+                    if next_idle <= self.monotonic():
+                        next_idle = self.monotonic() + IDLE_POLL_INTERVAL_SEC
+                polled = [machines[i] for i in due]
+                try:
+                    values = await self.read_registers(client, self.read_plan_for(dev.id, due), dev.id)
+                except Exception as e:
+                    for line, machine in polled:
+                        self.warn_read_failure(line, machine, e)
+                else:
+                    MACHINE_POLLS.inc(len(polled))
+                    for line, machine in polled:
+                        try:
+                            await self.process_machine(line, machine, values)
+                        except Exception as e:
+                            log_sampler.log(
+                                logger, logging.ERROR, ("poll", dev.id, line, machine.name),
+                                "❌ Poll error on %s %s-%s: %s", dev.name, line, machine.name, e,
+                            )
+
+            next_tick += POLL_INTERVAL_SEC
+            now = self.monotonic()
+            if now >= next_tick:
+                # Overran: skip the slots we missed instead of bursting to catch up
+                missed = int((now - next_tick) // POLL_INTERVAL_SEC) + 1
+                next_tick += missed * POLL_INTERVAL_SEC
+                self.missed_ticks[dev.id] = self.missed_ticks.get(dev.id, 0) + missed
+                MISSED_TICKS.inc(missed, device=dev.id)
+                logger.debug("⏰ %s: tick overran, skipped %d slot(s)", dev.name, missed)
+            await asyncio.sleep(next_tick - now)
+
+    def active_cycle_metrics(self) -> Dict[Tuple[str, ...], int]:
+        out = {}
+        for key, state in self.cycle_states.items():
+            line, machine_name, pos = key.rsplit("-", 2)
+            # machine id (mc3 -> 3), the same label dwp_cycles_total uses
+            out[(line, str(extract_machine_id(machine_name)), pos)] = int(state.state == "active")
+        return out
+
+    async def start_metrics_server(self):
+        if METRICS_PORT <= 0:
+            return
+        port = METRICS_PORT + (self.shard_index or 0)
+        try:
+            self.metrics_server = await serve_metrics(METRICS_HOST, port)
+        except OSError as e:
+            logger.error(f"❌ Metrics endpoint not started on {METRICS_HOST}:{port}: {e}")
+
+    async def start_live_feed(self):
+        if LIVE_PORT <= 0:
+            return
+        port = LIVE_PORT + (self.shard_index or 0)
+        feed = LiveFeed(lambda: self.cycle_states, LIVE_RATE_HZ)
+        try:
+            await feed.start(LIVE_HOST, port)
+        except OSError as e:
+            logger.error(f"❌ Live waveform feed not started on {LIVE_HOST}:{port}: {e}")
+            return
+        self.live_feed = feed
+
+    def start_device(self, dev: DeviceConfig):
+        """Start the polling task and reconnect supervisor of a device."""
+        self.build_read_plan(dev)
+        self.device_tasks[dev.id] = asyncio.create_task(self.poll_device(dev), name=f"poll-{dev.id}")
+        self.supervisor_tasks[dev.id] = asyncio.create_task(
+            self.supervise_device(dev), name=f"supervise-{dev.id}"
+        )
+
+    async def stop_device(self, dev_id: int):
+        """Stop a device's tasks, close its client and forget its per-device state."""
+        tasks = [
+            task
+            for task in (self.device_tasks.pop(dev_id, None), self.supervisor_tasks.pop(dev_id, None))
+            if task is not None
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        client = self.clients.pop(dev_id, None)
+        if client is not None:
+            await self.close_client(client)
+        for per_device in (
+            self.read_plans, self.device_machines, self.subset_plans, self.read_failures,
+            self.reconnect_events, self.missed_ticks, self.device_states,
+        ):
+            per_device.pop(dev_id, None)
+
+    async def poll_loop(self):
+        """Run one polling task and one reconnect supervisor per device until
+        shutdown. reload_devices adds and removes devices while this runs."""
+        for dev in self.devices.values():
+            self.start_device(dev)
+        if not self.device_tasks:
+            logger.warning("⚠️ No devices to poll (waiting for a config reload)")
+        try:
+            await self.shutdown_event.wait()
+        finally:
+            for dev_id in list(self.device_tasks):
+                await self.stop_device(dev_id)
 
     async def monitor_heartbeats(self):
         """Background task to monitor device heartbeats and mark offline after threshold"""
@@ -944,7 +1751,20 @@ class DWPPoller:
                     if current_status == 'online' and elapsed > OFFLINE_THRESHOLD_SEC:
                         device_name = next((dev.name for dev in self.devices.values() if dev.id == dev_id), f"Device-{dev_id}")
                         logger.warning(f"💔 {device_name} (ID:{dev_id}) heartbeat lost ({elapsed:.1f}s since last read)")
-                        await self.update_device_state(dev_id, 'offline', f'No response for {elapsed:.1f}s')
+                        self.update_device_state(dev_id, 'offline', f'No response for {elapsed:.1f}s')
+
+                # Skipped poll slots per device since start
+                if self.missed_ticks:
+                    logger.info(f"⏰ Missed poll ticks per device: {self.missed_ticks}")
+
+                # Save pipeline backpressure
+                stats = self.queue_stats
+                if stats["enqueued"]:
+                    logger.info(
+                        f"📦 Cycle queue: depth={self.cycle_queue.qsize()} max_depth={stats['max_depth']} "
+                        f"enqueued={stats['enqueued']} processed={stats['processed']} "
+                        f"dropped={stats['dropped']} last_save={stats['last_save_ms']:.1f}ms"
+                    )
                 
                 # Sleep for check interval
                 await asyncio.sleep(HEARTBEAT_CHECK_INTERVAL_SEC)
@@ -956,38 +1776,56 @@ class DWPPoller:
     def signal_handler(self, signum, frame):
         logger.info("🛑 Shutdown signal received...")
         self.running = False
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.shutdown_event.set)
+
+    def reload_signal_handler(self, signum, frame):
+        logger.info("🔁 SIGHUP received, reloading device config...")
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.reload_event.set)
 
     async def run(self):
+        self.loop = asyncio.get_running_loop()
         # Setup signals
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
+        if hasattr(signal, "SIGHUP"):  # not available on Windows
+            signal.signal(signal.SIGHUP, self.reload_signal_handler)
+        if self.supervised:
+            watch_supervisor_pipe(lambda: self.signal_handler(None, None))
 
         try:
             await self.db.connect()
             await self.load_devices()
             await self.connect_clients()
+            self.start_cycle_workers()
+            await self.start_metrics_server()
+            await self.start_live_feed()
             logger.info(f"🚀 DWP Poller started (interval={POLL_INTERVAL_SEC}s)")
             
-            # Run poll_loop and heartbeat monitor concurrently
-            await asyncio.gather(
-                self.poll_loop(),
-                self.monitor_heartbeats()
-            )
+            # Heartbeat monitor and config reload run alongside poll_loop,
+            # which returns on shutdown
+            background = [
+                asyncio.create_task(self.monitor_heartbeats(), name="heartbeats"),
+                asyncio.create_task(self.config_reload_loop(), name="config-reload"),
+                asyncio.create_task(self.timeout_sweep_loop(), name="cycle-timeouts"),
+            ]
+            try:
+                await self.poll_loop()
+            finally:
+                for task in background:
+                    task.cancel()
+                await asyncio.gather(*background, return_exceptions=True)
         finally:
             # Cleanup (best-effort)
-            for client in self.clients.values():
-                # Some AsyncModbusTcpClient.close() implementations return a coroutine,
-                # others are synchronous. Await only when close() is a coroutine.
-                if hasattr(client, "close"):
-                    try:
-                        close_result = client.close()
-                        await maybe_await(close_result)
-                    except Exception:
-                        # Best-effort fallback: try calling close() again and ignore errors
-                        try:
-                            client.close()
-                        except Exception:
-                            pass
+            for client in list(self.clients.values()):
+                await self.close_client(client)
+            if self.metrics_server:
+                self.metrics_server.close()
+            if self.live_feed:
+                await self.live_feed.close()
+            # Finish analysing queued cycles before the DB queue is drained
+            await self.stop_cycle_workers()
             await self.db.close()
             logger.info("👋 DWP Poller stopped.")
 
@@ -1001,118 +1839,19 @@ class DWPPoller:
         peaks: List[int],
         total_duration_ms: int,
         t_buf: List[float],
+        segments: Optional[List[CycleSegment]] = None,
     ):
-        """Split multi-peak buffer into individual cycles"""
-        # element-wise max of TH/Side to reason about physical gaps
-        combined = [max(a, b) for a, b in zip(th_buf, side_buf)] if th_buf and side_buf else th_buf or side_buf
-
-        # helper: check for a run of N consecutive "low" samples in combined between i..j
-        def has_min_zero_gap(start_idx: int, end_idx: int, min_gap: int) -> bool:
-            if end_idx < start_idx:
-                return False
-            run = 0
-            for k in range(start_idx, end_idx + 1):
-                if combined[k] <= CYCLE_END_THRESHOLD:
-                    run += 1
-                    if run >= min_gap:
-                        return True
-                else:
-                    run = 0
-            return False
-
-        saved_count = 0
-        prev_peak = None
-        for i, peak_idx in enumerate(peaks):
-            # If there was a previous peak, require a zero-gap between them to split
-            if prev_peak is not None:
-                if not has_min_zero_gap(prev_peak + 1, peak_idx - 1, SPLIT_MIN_ZERO_GAP):
-                    logger.info(
-                        f"⏭️ Peaks {prev_peak} and {peak_idx} too close (no zero-gap) — treating as same cycle"
-                    )
-                    prev_peak = peak_idx
-                    continue
-            prev_peak = peak_idx
-
-            # Find start (first above-threshold before peak)
-            start_idx = peak_idx
-            while start_idx > 0 and combined[start_idx - 1] > CYCLE_END_THRESHOLD:
-                start_idx -= 1
-            start_idx = max(0, start_idx)
-
-            # Find end (first below-threshold after peak)
-            end_idx = peak_idx
-            while end_idx < len(combined) - 1 and combined[end_idx + 1] > CYCLE_END_THRESHOLD:
-                end_idx += 1
-            end_idx = min(len(combined) - 1, end_idx)
-
-            # Extract sub-cycle
-            th_sub = th_buf[start_idx : end_idx + 1]
-            side_sub = side_buf[start_idx : end_idx + 1]
-            # Extract timestamp slice (epoch-ms)
-            sub_t_buf = t_buf[start_idx : end_idx + 1] if t_buf else []
-            sub_timestamps_ms = [int(ts * 1000) for ts in sub_t_buf] if sub_t_buf else []
-
-            # Calculate duration (prefer timestamps if present)
-            # sub_timestamps_ms contains epoch-ms for each sample in the sub-cycle
-            if sub_timestamps_ms and len(sub_timestamps_ms) > 1:
-                sub_duration_ms = int(sub_timestamps_ms[-1] - sub_timestamps_ms[0])
-            else:
-                sub_duration_ms = int((end_idx - start_idx + 1) * POLL_INTERVAL_SEC * 1000)
-
-            # store seconds for DB/visualization
-            sub_duration_s = sub_duration_ms / 1000.0
-
-            # Skip very short sub-cycles
-            if sub_duration_s < MIN_DURATION_S:
-                logger.info(
-                    f"⏭️ Skipping split sub-cycle {i+1}/{len(peaks)} for {line}-{machine_name}-{pos}: duration {sub_duration_s:.1f}s < {MIN_DURATION_S}s"
-                )
-                continue
-
-            # Validate sub-cycle waveform sanity; skip invalid ones
-            is_sane, reason = self.validate_waveform_sanity(
-                th_sub, side_sub, len(th_sub), sub_duration_ms, pos, sub_timestamps_ms
-            )
-            if not is_sane:
-                logger.info(
-                    f"⏭️ Skipping split sub-cycle {i+1}/{len(peaks)} for {line}-{machine_name}-{pos}: invalid waveform ({reason})"
-                )
-                continue
-
-            # Save as individual cycle
-            max_th = max(th_sub) if th_sub else 0
-            max_side = max(side_sub) if side_sub else 0
-            grade = determine_quality(max_th, max_side, "SPLIT")
-
-            # Validation: skip very short sub-cycles (insufficient samples)
-            if len(th_sub) < 4:
-                logger.info(
-                    f"⏭️ Skipping split sub-cycle {i+1}/{len(peaks)} for {line}-{machine_name}-{pos}: too few samples ({len(th_sub)})"
-                )
-                continue
-
-            cycle_data = {
-                "line": line,
-                "machine": extract_machine_id(machine_name),
-                "position": pos,
-                "th_waveform": th_sub,
-                "side_waveform": side_sub,
-                "timestamps": sub_timestamps_ms,
-                "duration_s": sub_duration_s,
-                "quality_grade": grade,
-                "max_th": max_th,
-                "max_side": max_side,
-                "sample_count": len(th_sub),
-                "cycle_type": "SPLIT",
-            }
-
-            success = await self.db.save_cycle(cycle_data)
-            if success:
-                logger.info(
-                    f"✅ SPLIT Cycle {i + 1}/{len(peaks)} saved for {line}-{machine_name}-{pos}"
-                )
-                saved_count += 1
-        return saved_count
+        """Split multi-peak buffer into individual cycles. `segments` are the
+        boundaries already found by the cycle analyzer, if available."""
+        return await split_and_save_cycles(
+            self.db, logger, determine_quality, extract_machine_id,
+            line, machine_name, pos, th_buf, side_buf, peaks, total_duration_ms, t_buf,
+            CYCLE_END_THRESHOLD, SPLIT_MIN_ZERO_GAP,
+            poll_interval_sec=POLL_INTERVAL_SEC,
+            min_duration_s=MIN_DURATION_S,
+            validate_fn=self.validate_waveform_sanity,
+            segments=segments,
+        )
 
 # ----------------------------
 # ENTRY POINT
@@ -1120,7 +1859,48 @@ class DWPPoller:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="DWP Poller")
     parser.add_argument("--machine", "-m", help="Poll only this machine name (e.g., mc1)")
+    parser.add_argument(
+        "--shards", type=int, default=int(os.getenv("DWP_SHARDS", "1")),
+        help="Split devices across this many poller processes",
+    )
+    parser.add_argument("--shard-index", type=int, help="Run as this shard (set by the supervisor)")
+    parser.add_argument("--supervised", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--shard-map", default=os.getenv("DWP_SHARD_MAP", ""),
+        help="Explicit device assignment, e.g. '7:0,8:0,12:1' (device_id:shard)",
+    )
+    parser.add_argument(
+        "--simulate-db", default=os.getenv("DWP_SIMULATE_DB") or None, metavar="DATABASE",
+        help="Read simulated presses instead of the Modbus gateways (load testing); devices are "
+        "read from and cycles written to this database, which must not be DB_DATABASE",
+    )
     args = parser.parse_args()
-
-    poller = DWPPoller(poll_only_machine=args.machine)
-    asyncio.run(poller.run())
+    shard_map = parse_shard_map(args.shard_map)
+    if args.simulate_db and args.simulate_db == DB_CONFIG["db"]:
+        parser.error(f"--simulate-db must name a separate database, not DB_DATABASE ({DB_CONFIG['db']})")
+
+    if args.shards > 1 and args.shard_index is None:
+        worker_args = ["--shard-map", args.shard_map] if args.shard_map else []
+        if args.machine:
+            worker_args += ["--machine", args.machine]
+        if args.simulate_db:
+            worker_args += ["--simulate-db", args.simulate_db]
+        asyncio.run(ShardSupervisor(args.shards, worker_args).run())
+    else:
+        listener = configure_logging(
+            prefix=f"[shard {args.shard_index}] " if args.shard_index is not None else "",
+            use_queue=LOG_QUEUE,
+        )
+        poller = DWPPoller(
+            poll_only_machine=args.machine,
+            shard_index=args.shard_index,
+            shards=max(1, args.shards),
+            shard_map=shard_map,
+            simulate_db=args.simulate_db,
+            supervised=args.supervised,
+        )
+        try:
+            asyncio.run(poller.run())
+        finally:
+            if listener is not None:
+                listener.stop()
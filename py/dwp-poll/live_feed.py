@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from cycle_buffer import CycleState
+from metrics import read_request
+
+# Live waveform feed for dashboards. The in-progress TH/Side buffers of every
+# position are streamed as Server-Sent Events on GET /live (plain HTTP, so a
+# browser EventSource or `curl -N` can read it), without touching MySQL.
+#
+# One broadcaster task samples the cycle states `rate_hz` times per second
+# and builds a single delta frame that all clients share:
+#
+#   {"ts": 1718000000.1, "positions": {
+#       "L1-mc3-L": {"cycle": 1717999998.7, "offset": 14, "th": [..], "side": [..]},
+#       "L1-mc4-R": null}}
+#
+# `offset` is the index of the first sample in the frame within the cycle
+# (0 = a new cycle started, drop what you have), `cycle` is the cycle's start
+# time and null means the cycle ended. A client gets one full frame (all open
+# cycles from offset 0) when it connects, then deltas. Positions without news
+# are left out, and ticks without any news send nothing but a periodic
+# keep-alive comment. A client that cannot keep up is disconnected; EventSource
+# reconnects and starts again from a full frame.
+
+logger = logging.getLogger("DWP")
+
+LIVE_CLIENT_QUEUE_FRAMES = 50  # frames buffered per client before it is dropped
+LIVE_KEEPALIVE_SEC = 15.0
+
+SentState = Tuple[float, int]  # (cycle start_mono, samples sent)
+
+
+class LiveFeed:
+    def __init__(self, positions: Callable[[], Dict[str, CycleState]], rate_hz: float = 5.0):
+        """positions: returns the poller's {key: CycleState} map (read, never modified)."""
+        self.positions = positions
+        self.interval = 1.0 / rate_hz
+        self.sent: Dict[str, SentState] = {}
+        self.clients: Set[asyncio.Queue] = set()
+        self.pending: Set[asyncio.Queue] = set()  # waiting for their first (full) frame
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.task: Optional[asyncio.Task] = None
+
+    # ----------------------------
+    # Frames
+    # ----------------------------
+    @staticmethod
+    def position_entry(state: CycleState, offset: int, end: int) -> dict:
+        return {
+            "cycle": state.start_time,
+            "offset": offset,
+            "th": state.th[offset:end].tolist(),
+            "side": state.side[offset:end].tolist(),
+        }
+
+    def delta_frame(self) -> Dict[str, Optional[dict]]:
+        """Changes since the previous call; advances `sent`."""
+        changes: Dict[str, Optional[dict]] = {}
+        positions = self.positions()
+        for key, state in positions.items():
+            if state.state != "active":
+                continue
+            n = len(state)
+            sent = self.sent.get(key)
+            if sent is None or sent[0] != state.start_mono:
+                changes[key] = self.position_entry(state, 0, n)
+            elif n > sent[1]:
+                changes[key] = self.position_entry(state, sent[1], n)
+            else:
+                continue
+            self.sent[key] = (state.start_mono, n)
+        for key in list(self.sent):
+            state = positions.get(key)
+            if state is None or state.state != "active":
+                changes[key] = None
+                del self.sent[key]
+        return changes
+
+    def full_frame(self) -> Dict[str, dict]:
+        """Every open cycle from offset 0 up to what the last delta_frame() sent,
+        so a new client continues seamlessly with the next delta."""
+        positions = self.positions()
+        return {key: self.position_entry(positions[key], 0, n) for key, (_, n) in self.sent.items()}
+
+    @staticmethod
+    def encode(positions: Dict[str, Optional[dict]]) -> bytes:
+        frame = {"ts": round(time.time(), 3), "positions": positions}
+        return b"data: " + json.dumps(frame, separators=(",", ":")).encode("utf-8") + b"\n\n"
+
+    # ----------------------------
+    # Broadcast
+    # ----------------------------
+    def publish(self, queue: asyncio.Queue, data: bytes):
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            logger.warning("⚠️ Live feed client too slow, disconnecting it")
+            self.disconnect(queue)
+
+    def disconnect(self, queue: asyncio.Queue):
+        """Make a client's handler close its connection."""
+        self.clients.discard(queue)
+        self.pending.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def broadcast_loop(self):
+        next_tick = time.monotonic()
+        last_sent = next_tick
+        while True:
+            next_tick += self.interval
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            if not (self.clients or self.pending):
+                # nobody listening: don't track anything, start fresh on connect
+                self.sent.clear()
+                continue
+            changes = self.delta_frame()
+            if changes:
+                data = self.encode(changes)
+                for queue in list(self.clients):
+                    self.publish(queue, data)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= LIVE_KEEPALIVE_SEC:
+                for queue in list(self.clients):
+                    self.publish(queue, b": keep-alive\n\n")
+                last_sent = time.monotonic()
+            if self.pending:
+                data = self.encode(self.full_frame())
+                for queue in list(self.pending):
+                    self.pending.discard(queue)
+                    self.clients.add(queue)
+                    self.publish(queue, data)
+
+    # ----------------------------
+    # HTTP
+    # ----------------------------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_CLIENT_QUEUE_FRAMES)
+        try:
+            method, path = await read_request(reader)
+            if method != "GET" or path != "/live":
+                writer.write(
+                    b"HTTP/1.1 404 Not Found\r\nContent-Type: text/plain\r\n"
+                    b"Content-Length: 10\r\nConnection: close\r\n\r\nnot found\n"
+                )
+                await writer.drain()
+                return
+
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\nAccess-Control-Allow-Origin: *\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            await writer.drain()
+            self.pending.add(queue)
+            while True:
+                data = await queue.get()
+                if data is None:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            logger.debug("Live feed client failed: %s", e)
+        finally:
+            self.clients.discard(queue)
+            self.pending.discard(queue)
+            writer.close()
+
+    async def start(self, host: str, port: int):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self.task = asyncio.create_task(self.broadcast_loop(), name="live-feed")
+        logger.info(f"📡 Live waveform feed on http://{host}:{port}/live")
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.server:
+            self.server.close()
+        for queue in list(self.clients | self.pending):
+            self.disconnect(queue)
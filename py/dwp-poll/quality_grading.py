@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# Quality grading of a cycle from its peak TH and Side pressure.
+#
+# The grade only depends on five per-axis predicates (good, extended,
+# marginal, below SENSOR_LOW, above PRESSURE_HIGH), so the thresholds are
+# compiled once into
+#   - a band table per 16-bit register value (65536 entries, uint8)
+#   - a small band x band table of grade codes
+# and grading is two array lookups, for one cycle or for a whole batch.
+# (A direct 65536 x 65536 table would need 4 GB for the same answers.)
+# reference_grade() keeps the original comparison chain; the tables are
+# filled from it, so both always agree.
+
+REGISTER_MAX = 0xFFFF
+
+GRADES = ("EXCELLENT", "GOOD", "MARGINAL", "SENSOR_LOW", "PRESSURE_HIGH", "DEFECTIVE")
+# Cycle types that are stored as their own grade
+PASS_THROUGH_TYPES = ("SHORT_CYCLE", "OVERFLOW", "TIMEOUT")
+GRADE_NAMES = GRADES + PASS_THROUGH_TYPES
+GRADE_CODES = {name: code for code, name in enumerate(GRADE_NAMES)}
+
+
+class QualityThresholds(NamedTuple):
+    good_min: int
+    good_max: int
+    extended_min: int
+    extended_max: int
+    marginal_min: int
+    marginal_max: int
+    sensor_low: int
+    pressure_high: int
+
+
+def reference_grade(max_th: int, max_side: int, t: QualityThresholds) -> str:
+    """The grading rules as plain comparisons (cycle type COMPLETE/SPLIT)."""
+    th_good = t.good_min <= max_th <= t.good_max
+    side_good = t.good_min <= max_side <= t.good_max
+
+    # EXCELLENT: both in perfect range
+    if th_good and side_good:
+        return "EXCELLENT"
+
+    # GOOD: both in extended range
+    if t.extended_min <= max_th <= t.extended_max and t.extended_min <= max_side <= t.extended_max:
+        return "GOOD"
+
+    # MARGINAL: one good, one marginal
+    th_marginal = t.marginal_min <= max_th <= t.marginal_max
+    side_marginal = t.marginal_min <= max_side <= t.marginal_max
+    if (th_good and side_marginal) or (side_good and th_marginal):
+        return "MARGINAL"
+
+    # Sensor/pressure issues
+    if max_th < t.sensor_low and max_side < t.sensor_low:
+        return "SENSOR_LOW"
+    if max_th > t.pressure_high or max_side > t.pressure_high:
+        return "PRESSURE_HIGH"
+
+    return "DEFECTIVE"
+
+
+class QualityTable:
+    """Compiled grading tables for one set of thresholds.
+
+    Values are clamped to the register range 0..65535, which does not change
+    any grade as long as the thresholds lie inside it.
+    """
+
+    def __init__(self, thresholds: QualityThresholds):
+        self.thresholds = thresholds
+        t = thresholds
+        v = np.arange(REGISTER_MAX + 1, dtype=np.int64)
+        features = (
+            ((t.good_min <= v) & (v <= t.good_max)).astype(np.uint8)
+            | ((t.extended_min <= v) & (v <= t.extended_max)).astype(np.uint8) << 1
+            | ((t.marginal_min <= v) & (v <= t.marginal_max)).astype(np.uint8) << 2
+            | (v < t.sensor_low).astype(np.uint8) << 3
+            | (v > t.pressure_high).astype(np.uint8) << 4
+        )
+        # one band per distinct feature combination (at most a dozen)
+        _, representatives, bands = np.unique(features, return_index=True, return_inverse=True)
+        self.bands = bands.astype(np.uint8).reshape(-1)
+        self.grades = np.array(
+            [
+                [GRADE_CODES[reference_grade(int(th), int(side), t)] for side in representatives]
+                for th in representatives
+            ],
+            dtype=np.uint8,
+        )
+        self.names = np.array(GRADE_NAMES, dtype=object)
+        # plain lists for grade(): indexing them is cheaper than numpy scalars
+        self.band_list: List[int] = self.bands.tolist()
+        self.grade_rows: List[List[str]] = [[GRADE_NAMES[c] for c in row] for row in self.grades.tolist()]
+
+    def grade(self, max_th: int, max_side: int, cycle_type: str = "COMPLETE") -> str:
+        if cycle_type in PASS_THROUGH_TYPES:
+            return cycle_type
+        th = REGISTER_MAX if max_th > REGISTER_MAX else (max_th if max_th > 0 else 0)
+        side = REGISTER_MAX if max_side > REGISTER_MAX else (max_side if max_side > 0 else 0)
+        return self.grade_rows[self.band_list[th]][self.band_list[side]]
+
+    def std_error(self, max_th: int, max_side: int) -> List[List[int]]:
+        """The `std_error` column: [[TH in good range], [Side in good range]]."""
+        t = self.thresholds
+        return [
+            [1 if t.good_min <= max_th <= t.good_max else 0],
+            [1 if t.good_min <= max_side <= t.good_max else 0],
+        ]
+
+    def grade_codes(
+        self,
+        max_th: Sequence[int],
+        max_side: Sequence[int],
+        cycle_types: Optional[Sequence[str]] = None,
+    ) -> np.ndarray:
+        """Grade codes (indexes into GRADE_NAMES) for a batch of cycles."""
+        th = np.clip(np.asarray(max_th, dtype=np.int64), 0, REGISTER_MAX)
+        side = np.clip(np.asarray(max_side, dtype=np.int64), 0, REGISTER_MAX)
+        codes = self.grades[self.bands[th], self.bands[side]]
+        if cycle_types is not None:
+            types = np.asarray(cycle_types, dtype=object)
+            for name in PASS_THROUGH_TYPES:
+                codes[types == name] = GRADE_CODES[name]
+        return codes
+
+    def grade_batch(
+        self,
+        max_th: Sequence[int],
+        max_side: Sequence[int],
+        cycle_types: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """Grade names for a batch of cycles, same results as grade() per cycle."""
+        return self.names[self.grade_codes(max_th, max_side, cycle_types)].tolist()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import asyncio
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.exceptions import ModbusException
+
+# Where the poller gets its input registers from. DWPPoller only talks to a
+# RegisterSource per device: connect(), `connected`, read_input_registers()
+# and close(). ModbusRegisterSource is the production implementation on top
+# of pymodbus; SimulatedRegisterSource generates press waveforms in process,
+# with configurable latency, connection drops and timeouts, so the poller can
+# be run and load-tested (bench_pipeline.py --devices) without gateways.
+
+
+class RegisterSource(ABC):
+    @property
+    @abstractmethod
+    def connected(self) -> bool:
+        ...
+
+    @abstractmethod
+    async def connect(self) -> bool:
+        """Try to connect once; returns `connected`."""
+
+    @abstractmethod
+    async def read_input_registers(self, address: int, count: int) -> List[int]:
+        """Read `count` input registers starting at `address`. Raises on failure."""
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+
+class ModbusRegisterSource(RegisterSource):
+    def __init__(self, host: str, port: int, timeout: float, unit_id: int = 1):
+        self.unit_id = unit_id
+        # reconnect_delay=0 turns off pymodbus' own background reconnect;
+        # the poller's supervise_device owns retries so there is only one loop per socket
+        self.client = AsyncModbusTcpClient(host, port=port, timeout=timeout, reconnect_delay=0)
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.client.connected)
+
+    async def connect(self) -> bool:
+        await self.client.connect()
+        return self.connected
+
+    async def read_input_registers(self, address: int, count: int) -> List[int]:
+        # Try with 'unit' parameter (newer pymodbus 3.x)
+        # If that fails, try without it (some versions don't need it)
+        try:
+            response = await self.client.read_input_registers(address=address, count=count, unit=self.unit_id)
+        except TypeError:
+            # Fallback: try without unit parameter
+            response = await self.client.read_input_registers(address=address, count=count)
+
+        if response.isError():
+            raise ModbusException(f"Modbus error: {response}")
+        return response.registers
+
+    async def close(self):
+        # Some AsyncModbusTcpClient.close() implementations return a coroutine,
+        # others are synchronous. Await only when close() is a coroutine.
+        result = self.client.close()
+        if asyncio.iscoroutine(result) or asyncio.isfuture(result):
+            await result
+
+
+class PressSimulator:
+    """TH/Side pressure of one press position over time: idle gaps, then a
+    ramp up, noisy hold and release, like a real stroke. Values depend on
+    the time of the read, not on how often it is read."""
+
+    def __init__(
+        self,
+        rng: random.Random,
+        now: float,
+        cycle_seconds: Tuple[float, float] = (6.0, 15.0),
+        idle_seconds: Tuple[float, float] = (2.0, 20.0),
+        peak: Tuple[int, int] = (28, 50),
+    ):
+        self.rng = rng
+        self.cycle_seconds = cycle_seconds
+        self.idle_seconds = idle_seconds
+        self.peak = peak
+        # start somewhere in an idle gap so presses are not in lockstep
+        self.schedule(now - rng.uniform(0, idle_seconds[1]))
+
+    def schedule(self, after: float):
+        rng = self.rng
+        self.start = after + rng.uniform(*self.idle_seconds)
+        self.end = self.start + rng.uniform(*self.cycle_seconds)
+        self.th_peak = rng.randint(*self.peak)
+        self.side_peak = rng.randint(*self.peak)
+
+    def sample(self, now: float) -> Tuple[int, int]:
+        while now >= self.end:
+            self.schedule(self.end)
+        if now < self.start:
+            return 0, 0
+        frac = (now - self.start) / (self.end - self.start)
+        shape = min(1.0, frac / 0.17, (1.0 - frac) / 0.17)
+        noise = self.rng.randint
+        return (
+            max(0, int(self.th_peak * shape + noise(-1, 1))),
+            max(0, int(self.side_peak * shape + noise(-1, 1))),
+        )
+
+
+class SimulatedRegisterSource(RegisterSource):
+    """In-process stand-in for a Modbus gateway.
+
+    registers: {address: (position key, 0 for TH / 1 for Side)}; addresses not
+        in the map read as 0.
+    latency / jitter: seconds added to every request (latency + U(0, jitter)).
+    drop_rate: probability that a request breaks the connection (the poller
+        has to reconnect).
+    timeout_rate: probability that a request hangs for `timeout` seconds and
+        then fails with a timeout.
+    """
+
+    def __init__(
+        self,
+        registers: Dict[int, Tuple[Hashable, int]],
+        seed: Optional[int] = None,
+        latency: float = 0.005,
+        jitter: float = 0.005,
+        drop_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.registers = registers
+        self.rng = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.clock = clock
+        now = clock()
+        self.presses: Dict[Hashable, PressSimulator] = {
+            key: PressSimulator(random.Random(self.rng.random()), now)
+            for key in sorted({key for key, _ in registers.values()}, key=str)
+        }
+        self._connected = False
+        self.requests = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    async def connect(self) -> bool:
+        await asyncio.sleep(self.latency)
+        self._connected = True
+        return True
+
+    async def read_input_registers(self, address: int, count: int) -> List[int]:
+        if not self._connected:
+            raise ConnectionError("Not connected (simulated)")
+        self.requests += 1
+        roll = self.rng.random()
+        if roll < self.timeout_rate:
+            await asyncio.sleep(self.timeout)
+            raise TimeoutError("Modbus read timeout (simulated)")
+        await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if roll < self.timeout_rate + self.drop_rate:
+            self._connected = False
+            raise ConnectionError("Connection dropped (simulated)")
+
+        now = self.clock()
+        samples: Dict[Hashable, Tuple[int, int]] = {}
+        values = []
+        for addr in range(address, address + count):
+            channel = self.registers.get(addr)
+            if channel is None:
+                values.append(0)
+                continue
+            key, index = channel
+            sample = samples.get(key)
+            if sample is None:
+                sample = samples[key] = self.presses[key].sample(now)
+            values.append(sample[index])
+        return values
+
+    async def close(self):
+        self._connected = False
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Re-grade historical ins_dwp_counts rows.
+
+When the quality bands (GOOD_MIN .. PRESSURE_HIGH) or the waveform sanity
+rules change, rows that are already stored keep their old grade. This job
+streams the table in id order and re-runs the poller's validation and
+grading on every stored waveform:
+
+  - pages are read with keyset pagination (`id > last_id ORDER BY id LIMIT
+    page`) through a server-side cursor, so neither MySQL nor this process
+    ever holds more than one page of `pv` JSON
+  - chunks are graded in a process pool: decoding and numpy stats per row,
+    then one QualityTable.grade_codes() lookup for the whole chunk
+  - changed rows are written back with one multi-row transaction per chunk,
+    in id order, followed by a checkpoint (last committed id) so an
+    interrupted run continues with --resume. Re-processing a chunk after a
+    crash between commit and checkpoint is harmless: grading is idempotent.
+
+Only `pv.quality` (grade, peaks, cycle_type, sample_count) and `std_error`
+are rewritten; the samples are left byte for byte as stored, in either pv
+encoding. Every row goes through the sanity check, SPLIT sub-cycles
+included. The poller drops sub-cycles that fail it, but a stored row can
+only be marked DEFECTIVE / INVALID_WAVEFORM; its type is kept in
+`quality.original_cycle_type` so a later run can restore it. Rows the
+poller stored as INVALID_WAVEFORM that pass the current rules are graded
+as COMPLETE cycles (the poller does not keep their original type).
+
+Usage:
+    python regrade_counts.py --dry-run
+    python regrade_counts.py --since 2025-09-01 --line G1 --workers 8
+    python regrade_counts.py --resume
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import aiomysql
+
+import waveform_checks
+from dwp_poll import DB_CONFIG, QUALITY_TABLE
+from quality_grading import GRADE_NAMES, QualityTable
+from waveform_codec import decode_pv
+
+logger = logging.getLogger("DWP")
+
+DEFAULT_CHECKPOINT = str(Path(__file__).resolve().parent / "regrade_checkpoint.json")
+DEFAULT_PAGE_SIZE = 20000  # rows per keyset query
+DEFAULT_CHUNK_SIZE = 500  # rows per worker task and per UPDATE transaction
+PROGRESS_INTERVAL_SEC = 10.0
+
+# (id, pv, duration, std_error) as selected below
+Row = Tuple[int, str, Optional[int], Optional[str]]
+# (id, new pv, new std_error, old grade, new grade)
+Update = Tuple[int, str, str, Optional[str], str]
+
+
+class StoredCycle(NamedTuple):
+    """A decoded row with its waveform re-validated, ready to be graded."""
+
+    row_id: int
+    raw: dict  # the stored pv, still in its stored encoding
+    quality: dict
+    std_error: object
+    max_th: int
+    max_side: int
+    sample_count: int
+    cycle_type: str
+    is_sane: bool
+
+
+def inspect_row(row: Row) -> StoredCycle:
+    """Decode one stored cycle and re-run the sanity check on it."""
+    row_id, pv, duration, std_error = row
+    raw = json.loads(pv) if isinstance(pv, (str, bytes)) else dict(pv)
+    decoded = decode_pv(raw)
+    quality = raw.get("quality") or {}
+    th, side = (decoded.get("waveforms") or [[], []])[:2]
+    timestamps = decoded.get("timestamps") or []
+    sample_count = len(th)
+
+    cycle_type = quality.get("cycle_type") or "COMPLETE"
+    if cycle_type == "INVALID_WAVEFORM":
+        cycle_type = quality.get("original_cycle_type") or "COMPLETE"
+
+    if not sample_count or len(side) != sample_count:
+        stats, max_th, max_side = None, max(th, default=0), max(side, default=0)
+    else:
+        stats = waveform_checks.waveform_stats(th, side, timestamps or None)
+        max_th, max_side = stats.max_th, stats.max_side
+
+    if stats is None:
+        is_sane = False
+    else:
+        # same duration the poller validated: timestamps when present, else the stored seconds
+        if len(timestamps) > 1:
+            duration_ms = int(timestamps[-1] - timestamps[0])
+        else:
+            duration_ms = int((duration or 0) * 1000)
+        is_sane, _ = waveform_checks.check_waveform_stats(stats, sample_count, duration_ms)
+
+    old_std_error = json.loads(std_error) if isinstance(std_error, (str, bytes)) else std_error
+    return StoredCycle(row_id, raw, quality, old_std_error, max_th, max_side, sample_count, cycle_type, is_sane)
+
+
+def grade_cycles(cycles: Sequence[StoredCycle], table: QualityTable = QUALITY_TABLE) -> List[Optional[Update]]:
+    """Grade a batch of cycles in one table lookup; None for rows that do not change."""
+    codes = table.grade_codes(
+        [c.max_th for c in cycles], [c.max_side for c in cycles], [c.cycle_type for c in cycles]
+    ).tolist()
+    updates: List[Optional[Update]] = []
+    for cycle, code in zip(cycles, codes):
+        quality = cycle.quality
+        if cycle.is_sane:
+            grade, cycle_type = GRADE_NAMES[code], cycle.cycle_type
+            new_quality = {k: v for k, v in quality.items() if k != "original_cycle_type"}
+        else:
+            # the poller drops invalid split sub-cycles; a stored row can only be marked
+            grade, cycle_type = "DEFECTIVE", "INVALID_WAVEFORM"
+            new_quality = dict(quality)
+            if cycle.cycle_type != "COMPLETE":
+                # so a later run with relaxed rules can restore it
+                new_quality["original_cycle_type"] = cycle.cycle_type
+        new_quality.update(
+            grade=grade,
+            peaks={"th": cycle.max_th, "side": cycle.max_side},
+            cycle_type=cycle_type,
+            sample_count=cycle.sample_count,
+        )
+        new_std_error = table.std_error(cycle.max_th, cycle.max_side)
+        if new_quality == quality and new_std_error == cycle.std_error:
+            updates.append(None)
+            continue
+
+        raw = dict(cycle.raw, quality=new_quality)
+        updates.append((
+            cycle.row_id,
+            json.dumps(raw, separators=(",", ":")),
+            json.dumps(new_std_error, separators=(",", ":")),
+            quality.get("grade"),
+            grade,
+        ))
+    return updates
+
+
+def regrade_row(row: Row, table: QualityTable = QUALITY_TABLE) -> Optional[Update]:
+    """Re-validate and re-grade one stored cycle. Returns None when nothing changes."""
+    return grade_cycles([inspect_row(row)], table)[0]
+
+
+def regrade_chunk(rows: Sequence[Row], table: QualityTable = QUALITY_TABLE) -> Tuple[List[Update], int]:
+    """Worker entry point: the changed rows of a chunk and the number of unreadable rows."""
+    cycles: List[StoredCycle] = []
+    failed = 0
+    for row in rows:
+        try:
+            cycles.append(inspect_row(row))
+        except Exception as e:
+            failed += 1
+            logger.warning("⚠️ Row %s could not be re-graded: %s", row[0], e)
+    updates = [update for update in grade_cycles(cycles, table) if update is not None]
+    return updates, failed
+
+
+class Checkpoint:
+    """Progress of one backfill run, stored as JSON after every committed chunk."""
+
+    def __init__(self, path: str, filters: Dict[str, Optional[str]]):
+        self.path = path
+        self.filters = filters
+        self.last_id = 0
+        self.max_id: Optional[int] = None
+        self.scanned = 0
+        self.updated = 0
+        self.failed = 0
+        self.transitions: Counter = Counter()
+
+    def load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("filters") != self.filters:
+            raise SystemExit(
+                f"Checkpoint {self.path} was written with filters {data.get('filters')}, "
+                f"not {self.filters}; use the same options or start over without --resume"
+            )
+        self.last_id = data["last_id"]
+        self.max_id = data["max_id"]
+        self.scanned = data["scanned"]
+        self.updated = data["updated"]
+        self.failed = data.get("failed", 0)
+        self.transitions = Counter(data.get("transitions", {}))
+
+    def save(self):
+        data = {
+            "filters": self.filters,
+            "last_id": self.last_id,
+            "max_id": self.max_id,
+            "scanned": self.scanned,
+            "updated": self.updated,
+            "failed": self.failed,
+            "transitions": dict(self.transitions),
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def page_query(args) -> Tuple[str, list]:
+    """The keyset page query; the caller appends last_id, max_id and the page size."""
+    where, params = [], []
+    if args.line:
+        where.append("line = %s")
+        params.append(args.line.upper())
+    if args.since:
+        where.append("created_at >= %s")
+        params.append(args.since)
+    if args.until:
+        where.append("created_at < %s")
+        params.append(args.until)
+    sql = (
+        "SELECT id, pv, duration, std_error FROM ins_dwp_counts "
+        "WHERE id > %s AND id <= %s"
+        + "".join(f" AND {clause}" for clause in where)
+        + " ORDER BY id LIMIT %s"
+    )
+    return sql, params
+
+
+async def run(args):
+    filters = {"line": args.line, "since": args.since, "until": args.until}
+    checkpoint = Checkpoint(args.checkpoint, filters)
+    if args.resume:
+        checkpoint.load()
+        logger.info(f"▶️ Resuming after id {checkpoint.last_id} ({checkpoint.scanned} rows already scanned)")
+
+    conn_config = {k: v for k, v in DB_CONFIG.items() if k not in ("maxsize", "autocommit")}
+    reader = await aiomysql.connect(**conn_config, autocommit=True)
+    writer = await aiomysql.connect(**conn_config, autocommit=False)
+    pool = ProcessPoolExecutor(max_workers=args.workers)
+    loop = asyncio.get_running_loop()
+    pending: Deque[Tuple[int, int, asyncio.Future]] = deque()
+    started = last_progress = time.monotonic()
+
+    async def write_oldest():
+        nonlocal last_progress
+        chunk_last_id, count, future = pending.popleft()
+        updates, failed = await future
+        if updates and not args.dry_run:
+            async with writer.cursor() as cur:
+                await cur.executemany(
+                    "UPDATE ins_dwp_counts SET pv = %s, std_error = %s WHERE id = %s",
+                    [(pv, std_error, row_id) for row_id, pv, std_error, _, _ in updates],
+                )
+            await writer.commit()
+        checkpoint.last_id = chunk_last_id
+        checkpoint.scanned += count
+        checkpoint.updated += len(updates)
+        checkpoint.failed += failed
+        for _, _, _, old, new in updates:
+            checkpoint.transitions[f"{old}->{new}"] += 1
+        if not args.dry_run:
+            checkpoint.save()
+
+        now = time.monotonic()
+        if now - last_progress >= PROGRESS_INTERVAL_SEC:
+            last_progress = now
+            rate = checkpoint.scanned / max(now - started, 1e-9)
+            logger.info(
+                "🔁 id %d/%d | scanned=%d updated=%d failed=%d | %.0f rows/s",
+                checkpoint.last_id, checkpoint.max_id, checkpoint.scanned,
+                checkpoint.updated, checkpoint.failed, rate,
+            )
+
+    try:
+        if checkpoint.max_id is None:
+            # rows inserted after the start are graded by the running poller already
+            async with reader.cursor() as cur:
+                await cur.execute("SELECT COALESCE(MAX(id), 0) FROM ins_dwp_counts")
+                (checkpoint.max_id,) = await cur.fetchone()
+        sql, params = page_query(args)
+        last_id = checkpoint.last_id
+        while True:
+            page_rows = 0
+            async with reader.cursor(aiomysql.SSCursor) as cur:
+                await cur.execute(sql, [last_id, checkpoint.max_id, *params, args.page_size])
+                while True:
+                    rows = await cur.fetchmany(args.chunk_size)
+                    if not rows:
+                        break
+                    page_rows += len(rows)
+                    last_id = rows[-1][0]
+                    future = loop.run_in_executor(pool, regrade_chunk, [tuple(r) for r in rows])
+                    pending.append((last_id, len(rows), future))
+                    # bounded read-ahead: keep every worker busy, nothing more
+                    while len(pending) > 2 * args.workers:
+                        await write_oldest()
+            if page_rows < args.page_size:
+                break
+        while pending:
+            await write_oldest()
+    except BaseException:
+        if not args.dry_run:
+            await writer.rollback()
+        raise
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=True, cancel_futures=True)
+        reader.close()
+        writer.close()
+
+    elapsed = time.monotonic() - started
+    verb = "would change" if args.dry_run else "updated"
+    logger.info(
+        f"✅ Re-grading done in {elapsed:.1f}s | scanned={checkpoint.scanned} | "
+        f"{verb}={checkpoint.updated} | failed={checkpoint.failed}"
+    )
+    for transition, count in checkpoint.transitions.most_common():
+        logger.info(f"   {transition}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-grade historical ins_dwp_counts rows")
+    parser.add_argument("--line", help="Only this line")
+    parser.add_argument("--since", help="Only rows created at or after this date/time")
+    parser.add_argument("--until", help="Only rows created before this date/time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Grading processes")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Rows per keyset query")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per task / transaction")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint file")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
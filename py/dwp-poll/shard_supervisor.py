@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Multi-process mode for the DWP poller. The supervisor starts one
+# `dwp_poll.py --shards N --shard-index i` process per shard and restarts a
+# shard that exits, without touching the others. Every shard is a normal
+# poller with its own event loop, MySQL pool and spool file; it only polls the
+# devices assigned to its index, so Modbus reads, peak finding and JSON
+# encoding spread over N cores.
+#
+# Assignment is `device_id % N` unless an explicit map is given with
+# --shard-map / DWP_SHARD_MAP, e.g. "7:0,8:0,12:1" (device_id:shard). Devices
+# missing from the map fall back to the modulo rule.
+#
+# Shards are stopped by closing their stdin, not with SIGTERM: on Windows
+# SIGTERM to a child is TerminateProcess, which would skip the flush of the
+# write queue. EOF on stdin works the same on every platform and also stops
+# the shards cleanly when the supervisor itself dies.
+
+logger = logging.getLogger("DWP")
+
+SHARD_RESTART_BASE_DELAY_SEC = 1.0
+SHARD_RESTART_MAX_DELAY_SEC = 60.0
+SHARD_STABLE_AFTER_SEC = 60.0  # a shard that ran this long restarts with the base delay again
+SHARD_STOP_TIMEOUT_SEC = 20.0
+
+
+def parse_shard_map(text: Optional[str]) -> Dict[int, int]:
+    """Parse "device_id:shard,..." into {device_id: shard}."""
+    assignment: Dict[int, int] = {}
+    for item in (text or "").replace(";", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        dev_id, _, shard = item.partition(":")
+        try:
+            assignment[int(dev_id)] = int(shard)
+        except ValueError:
+            raise ValueError(f"Invalid shard map entry '{item}', expected device_id:shard")
+    return assignment
+
+
+def shard_for_device(dev_id: int, shards: int, shard_map: Optional[Dict[int, int]] = None) -> int:
+    """Shard index that owns a device."""
+    if shard_map and dev_id in shard_map:
+        return shard_map[dev_id] % shards
+    return dev_id % shards
+
+
+def watch_supervisor_pipe(stop: Callable[[], None]):
+    """Call `stop` (from a daemon thread) once the supervisor closes our stdin."""
+
+    fd = sys.stdin.fileno()
+
+    def wait_for_eof():
+        # os.read, not sys.stdin: a daemon thread blocked inside the buffered
+        # reader holds its lock and aborts interpreter shutdown
+        try:
+            while os.read(fd, 4096):
+                pass
+        except OSError:
+            pass
+        stop()
+
+    threading.Thread(target=wait_for_eof, name="supervisor-pipe", daemon=True).start()
+
+
+class ShardSupervisor:
+    def __init__(self, shards: int, worker_args: List[str]):
+        """worker_args: extra CLI arguments passed to every shard (e.g. --machine)."""
+        self.shards = shards
+        self.worker_args = worker_args
+        self.processes: Dict[int, asyncio.subprocess.Process] = {}
+        self.restarts: Dict[int, int] = {}
+        self.running = True
+        self.stop_event = asyncio.Event()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def shard_command(self, index: int) -> List[str]:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dwp_poll.py")
+        return [
+            sys.executable, script,
+            "--shards", str(self.shards),
+            "--shard-index", str(index),
+            "--supervised",
+            *self.worker_args,
+        ]
+
+    async def run_shard(self, index: int):
+        """Keep one shard process alive until the supervisor stops."""
+        delay = SHARD_RESTART_BASE_DELAY_SEC
+        while self.running:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *self.shard_command(index), stdin=asyncio.subprocess.PIPE
+            )
+            if not self.running:
+                # stop() ran while this shard was starting
+                process.stdin.close()
+            self.processes[index] = process
+            logger.info(f"🧩 Shard {index}/{self.shards} started (pid={process.pid})")
+            returncode = await process.wait()
+            self.processes.pop(index, None)
+            if not self.running:
+                break
+
+            if time.monotonic() - started >= SHARD_STABLE_AFTER_SEC:
+                delay = SHARD_RESTART_BASE_DELAY_SEC
+            self.restarts[index] = self.restarts.get(index, 0) + 1
+            logger.error(
+                f"💥 Shard {index} exited with code {returncode}, restarting in {delay:.0f}s "
+                f"(restart #{self.restarts[index]})"
+            )
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, SHARD_RESTART_MAX_DELAY_SEC)
+
+    def stop(self):
+        logger.info("🛑 Shutdown signal received, stopping shards...")
+        self.running = False
+        self.stop_event.set()
+        for process in self.processes.values():
+            if process.returncode is None and process.stdin:
+                process.stdin.close()  # the shard drains and exits (watch_supervisor_pipe)
+
+    def signal_handler(self, signum, frame):
+        self.loop.call_soon_threadsafe(self.stop)
+
+    async def run(self):
+        # signal.signal rather than loop.add_signal_handler, which Windows lacks
+        self.loop = asyncio.get_running_loop()
+        signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+
+        logger.info(f"🚀 DWP shard supervisor started ({self.shards} shards)")
+        tasks = [asyncio.create_task(self.run_shard(i), name=f"shard-{i}") for i in range(self.shards)]
+        await self.stop_event.wait()
+
+        # Shards flush their write queues once stdin closes; give them time to finish
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), SHARD_STOP_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            for index, process in list(self.processes.items()):
+                if process.returncode is None:
+                    logger.warning(f"⚠️ Shard {index} did not stop in time, killing it")
+                    process.kill()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info("👋 DWP shard supervisor stopped.")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for polling idle machines at the slower, adaptive rate.
+
+Run with: python -m pytest -q test_adaptive_polling.py
+"""
+
+import asyncio
+
+import pytest
+
+import dwp_poll
+from dwp_poll import IDLE_GRACE_SEC, IDLE_POLL_INTERVAL_SEC, POLL_INTERVAL_SEC, DeviceConfig, DWPPoller, MachineConfig
+
+TICKS_PER_IDLE = round(IDLE_POLL_INTERVAL_SEC / POLL_INTERVAL_SEC)
+DEVICE = DeviceConfig(
+    1, "Press-G1", "10.0.0.1",
+    {"G1": [MachineConfig("mc1", 100, 101, 102, 103), MachineConfig("mc2", 104, 105, 106, 107)],
+     "G2": [MachineConfig("mc1", 300, 301, 302, 303)]},
+)
+MC1_ADDRESSES = {100, 101, 102, 103}
+ALL_ADDRESSES = MC1_ADDRESSES | {104, 105, 106, 107, 300, 301, 302, 303}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class PressGateway:
+    """G1-mc1 presses from `start` to `end` (seconds); records what each tick read."""
+
+    connected = True
+
+    def __init__(self, clock, start, end, stop_after):
+        self.clock = clock
+        self.start, self.end = start, end
+        self.stop_after = stop_after
+        self.reads = {}  # tick -> addresses read
+        self.poller = None
+        self.ended_tick = None  # first tick that found the cycle ended
+
+    async def read_input_registers(self, address, count):
+        tick = round(self.clock.now / POLL_INTERVAL_SEC)
+        state = self.poller.cycle_states.get("G1-mc1-L")
+        if self.ended_tick is None and self.clock.now > self.end and state.state == "idle":
+            self.ended_tick = tick
+        self.reads.setdefault(tick, set()).update(range(address, address + count))
+        if self.clock.now >= self.stop_after:
+            self.poller.running = False
+        pressing = self.start <= self.clock.now < self.end
+        return [30 if pressing and 100 <= a <= 103 else 0 for a in range(address, address + count)]
+
+
+@pytest.fixture
+def poller(tmp_path, monkeypatch):
+    monkeypatch.setattr(dwp_poll, "SPOOL_PATH", str(tmp_path / "spool.sqlite3"))
+    poller = DWPPoller()
+    poller.monotonic = FakeClock()
+    poller.clock = lambda: 1_750_000_000 + poller.monotonic.now
+    poller.devices = {DEVICE.id: DEVICE}
+    poller.build_read_plan(DEVICE)
+    return poller
+
+
+def test_read_plan_for_covers_exactly_the_due_machines(poller):
+    full = poller.read_plans[DEVICE.id]
+    assert poller.read_plan_for(DEVICE.id, (0, 1, 2)) is full
+    assert set(poller.read_plan_for(DEVICE.id, (0,)).addresses) == MC1_ADDRESSES
+    assert set(poller.read_plan_for(DEVICE.id, (0, 2)).addresses) == MC1_ADDRESSES | {300, 301, 302, 303}
+    # subset plans are cached per combination
+    assert poller.read_plan_for(DEVICE.id, (0,)) is poller.read_plan_for(DEVICE.id, (0,))
+
+
+def test_due_machines_follow_the_hot_window(poller):
+    assert poller.due_machines(DEVICE.id, idle_due=False) == ()
+    assert poller.due_machines(DEVICE.id, idle_due=True) == (0, 1, 2)
+    poller.machine_hot_until[("G2", "mc1")] = 5.0
+    assert poller.due_machines(DEVICE.id, idle_due=False) == (2,)
+    poller.monotonic.now = 5.0
+    assert poller.due_machines(DEVICE.id, idle_due=False) == ()
+
+
+def test_idle_machines_are_polled_on_idle_ticks_only(poller, monkeypatch):
+    # G1-mc1 presses from 2.0 s to 4.0 s; run well past the end of its grace period
+    stop_after = 4.0 + 2 * IDLE_GRACE_SEC
+    gateway = PressGateway(poller.monotonic, 2.0, 4.0, stop_after)
+    gateway.poller = poller
+    poller.clients[DEVICE.id] = gateway
+
+    real_sleep = asyncio.sleep
+
+    async def virtual_sleep(delay, *args):
+        poller.monotonic.now += max(0.0, delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", virtual_sleep)
+    asyncio.run(poller.poll_device(DEVICE))
+
+    start_tick = round(2.0 / POLL_INTERVAL_SEC)
+    fast_ticks = sorted(t for t in gateway.reads if t % TICKS_PER_IDLE)
+    for tick, addresses in gateway.reads.items():
+        # idle ticks read every machine in one coalesced plan, the ones in
+        # between only the machine in a cycle
+        assert addresses == (MC1_ADDRESSES if tick in fast_ticks else ALL_ADDRESSES), tick
+    # the idle tick that sees the press start switches to the full rate...
+    assert start_tick % TICKS_PER_IDLE == 0 and fast_ticks[0] == start_tick + 1
+    assert fast_ticks == [t for t in range(fast_ticks[0], fast_ticks[-1] + 1) if t % TICKS_PER_IDLE]
+    # ...until IDLE_GRACE_SEC after the cycle ended, then back to idle ticks only
+    grace_ticks = round(IDLE_GRACE_SEC / POLL_INTERVAL_SEC)
+    assert abs(fast_ticks[-1] - (gateway.ended_tick - 1 + grace_ticks)) <= 1
+    assert max(gateway.reads) > fast_ticks[-1] + TICKS_PER_IDLE
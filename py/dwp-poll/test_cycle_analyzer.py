@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming cycle analyzer. Every result must match what the
+save worker used to compute over the finished buffer: scipy find_peaks on
+the combined signal, find_cycle_segments and the vectorized waveform stats.
+
+Run with: python -m pytest -q test_cycle_analyzer.py
+"""
+
+import logging
+import random
+
+import pytest
+
+from cycle_analyzer import CycleAnalyzer, analyze_buffer
+from cycle_splitter import combined_signal, find_cycle_segments
+from test_cycle_splitter import random_buffer
+from waveform_checks import std_error_flags_from_stats, waveform_stats
+
+np = pytest.importorskip("numpy")
+find_peaks = pytest.importorskip("scipy.signal").find_peaks
+_select_by_peak_distance = pytest.importorskip("scipy.signal._peak_finding_utils")._select_by_peak_distance
+
+PEAK_HEIGHT = 1
+PEAK_DISTANCE = 3
+
+
+def batch_peaks(th, side):
+    peaks, _ = find_peaks(combined_signal(th, side), height=PEAK_HEIGHT, distance=PEAK_DISTANCE)
+    return [int(p) for p in peaks]
+
+
+def reference_peaks(th, side):
+    """find_peaks(height, distance) with equal heights resolved in favour of
+    the later peak. scipy itself leaves that order to numpy's unstable
+    argsort, so plain find_peaks may pick either one."""
+    x = combined_signal(th, side).astype(np.float64)
+    candidates, _ = find_peaks(x, height=PEAK_HEIGHT)
+    priority = x[candidates] + candidates / 1e6
+    keep = _select_by_peak_distance(candidates, priority, float(PEAK_DISTANCE))
+    return [int(p) for p in candidates[keep]]
+
+
+def random_timestamps(rng: random.Random, n: int):
+    ts, out = rng.randint(1_700_000_000_000, 1_800_000_000_000), []
+    for _ in range(n):
+        out.append(ts)
+        ts += rng.choice([100, 100, 100, 99, 101, 0, 250])
+    return out
+
+
+def test_single_press_cycle():
+    th = [0, 5, 20, 35, 40, 40, 35, 20, 5, 0, 0]
+    side = [0, 4, 18, 30, 36, 36, 30, 18, 4, 0, 0]
+    summary = analyze_buffer(th, side)
+    assert summary.peaks == [4]
+    assert [tuple(s) for s in summary.segments] == [(0, 4, 1, 8)]
+    assert summary.stats.max_th == 40 and summary.stats.max_side == 36
+
+
+def test_split_points_are_known_before_the_cycle_ends():
+    analyzer = CycleAnalyzer()
+    first = [0, 10, 30, 10, 0, 0, 0, 0]
+    for value in first:
+        analyzer.push(value, value)
+    assert analyzer.summary().peaks == [2]
+    # the trailing low run is already a split candidate
+    assert analyzer.low_start == 4
+    for value in [12, 35, 12, 0]:
+        analyzer.push(value, value)
+    assert [tuple(s) for s in analyzer.summary().segments] == [(0, 2, 1, 3), (1, 9, 8, 10)]
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_matches_batch_analysis_on_random_buffers(seed):
+    rng = random.Random(seed)
+    for _ in range(1000):
+        n = rng.randint(1, 300)
+        th, side = random_buffer(rng, n), random_buffer(rng, n)
+        timestamps = random_timestamps(rng, n) if rng.random() < 0.7 else None
+        summary = analyze_buffer(th, side, timestamps)
+
+        peaks = reference_peaks(th, side)
+        assert summary.peaks == peaks, (th, side)
+        assert summary.segments == find_cycle_segments(th, side, peaks), (th, side, peaks)
+        expected = waveform_stats(th, side, timestamps)
+        assert summary.stats._replace(large_jumps=()) == expected, (th, side, timestamps)
+        assert std_error_flags_from_stats(summary.stats, 30, 45) == std_error_flags_from_stats(expected, 30, 45)
+        if timestamps:
+            assert (summary.first_ts_ms, summary.last_ts_ms) == (timestamps[0], timestamps[-1])
+
+
+def test_press_like_waveforms_match_batch_analysis():
+    rng = random.Random(7)
+    for _ in range(300):
+        th, side = [], []
+        for _ in range(rng.randint(1, 3)):
+            n = rng.randint(20, 150)
+            peak = rng.randint(25, 60)
+            ramp = max(2, n // 6)
+            for i in range(n):
+                shape = min(1.0, i / ramp, (n - 1 - i) / ramp)
+                th.append(max(0, int(peak * shape + rng.randint(-2, 2))))
+                side.append(max(0, int(peak * shape + rng.randint(-2, 2))))
+            th.extend([0] * rng.randint(0, 6))
+            side.extend([0] * (len(th) - len(side)))
+        summary = analyze_buffer(th, side)
+        peaks = reference_peaks(th, side)
+        assert summary.peaks == peaks
+        assert summary.segments == find_cycle_segments(th, side, peaks)
+
+
+def test_equal_close_peaks_keep_the_later_one():
+    th = [0, 50, 0, 50, 0, 0]
+    assert analyze_buffer(th, [0] * len(th)).peaks == [3]
+    # no ties: identical to plain find_peaks
+    th = [0, 50, 0, 51, 0, 0, 40, 0]
+    assert analyze_buffer(th, [0] * len(th)).peaks == batch_peaks(th, [0] * len(th)) == [3, 6]
+
+
+def test_large_jumps_match_debug_scan(caplog):
+    th = [0, 35, 0, 35, 80, 0]
+    side = [10] * len(th)
+    with caplog.at_level(logging.DEBUG, logger="DWP"):
+        expected = waveform_stats(th, side)
+    assert analyze_buffer(th, side).stats == expected
+    assert expected.first_hard_jump == (4, 45, 0)
+    assert len(expected.large_jumps) == 3
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Tests for the cycle segmentation engine in cycle_splitter. The expected
+boundaries come from the original backward/forward rescans and nested
+zero-gap check, kept below as the reference.
+
+Run with: python -m pytest -q test_cycle_splitter.py
+"""
+
+import asyncio
+import random
+from typing import List
+
+import pytest
+
+from cycle_splitter import CycleSegment, find_cycle_segments, split_and_save_cycles
+
+END_THRESHOLD = 2
+MIN_ZERO_GAP = 3
+
+
+# ----------------------------
+# REFERENCE (quadratic) IMPLEMENTATION
+# ----------------------------
+def reference_segments(th_buf, side_buf, peaks, end_threshold=END_THRESHOLD, min_zero_gap=MIN_ZERO_GAP):
+    combined = [max(a, b) for a, b in zip(th_buf, side_buf)] if th_buf and side_buf else th_buf or side_buf
+
+    def has_min_zero_gap(start_idx: int, end_idx: int, min_gap: int) -> bool:
+        if end_idx < start_idx:
+            return False
+        run = 0
+        for k in range(start_idx, end_idx + 1):
+            if combined[k] <= end_threshold:
+                run += 1
+                if run >= min_gap:
+                    return True
+            else:
+                run = 0
+        return False
+
+    segments = []
+    prev_peak = None
+    for i, peak_idx in enumerate(peaks):
+        if prev_peak is not None:
+            if not has_min_zero_gap(prev_peak + 1, peak_idx - 1, min_zero_gap):
+                prev_peak = peak_idx
+                continue
+        prev_peak = peak_idx
+
+        start_idx = peak_idx
+        while start_idx > 0 and combined[start_idx - 1] > end_threshold:
+            start_idx -= 1
+
+        end_idx = peak_idx
+        while end_idx < len(combined) - 1 and combined[end_idx + 1] > end_threshold:
+            end_idx += 1
+
+        segments.append((i, peak_idx, start_idx, end_idx))
+    return segments
+
+
+def random_buffer(rng: random.Random, n: int) -> List[int]:
+    out = []
+    while len(out) < n:
+        if rng.random() < 0.4:
+            out.extend([rng.randint(0, END_THRESHOLD)] * rng.randint(1, 6))
+        else:
+            out.extend(rng.randint(0, 60) for _ in range(rng.randint(1, 15)))
+    return out[:n]
+
+
+# ----------------------------
+# TESTS
+# ----------------------------
+def test_two_cycles_separated_by_zero_gap():
+    th = [0, 10, 30, 10, 0, 0, 0, 0, 12, 35, 12, 0]
+    side = [0] * len(th)
+    assert find_cycle_segments(th, side, [2, 9]) == [
+        CycleSegment(0, 2, 1, 3),
+        CycleSegment(1, 9, 8, 10),
+    ]
+
+
+def test_peaks_without_zero_gap_are_one_cycle():
+    th = [0, 10, 30, 10, 1, 10, 30, 10, 0]
+    assert find_cycle_segments(th, [0] * len(th), [2, 6]) == [CycleSegment(0, 2, 1, 3)]
+
+
+def test_side_channel_bridges_th_gap():
+    th = [0, 20, 30, 0, 0, 0, 25, 30, 0]
+    side = [0, 5, 5, 5, 5, 5, 5, 5, 0]
+    assert find_cycle_segments(th, side, [2, 7]) == [CycleSegment(0, 2, 1, 7)]
+
+
+def test_empty_inputs():
+    assert find_cycle_segments([], [], [1]) == []
+    assert find_cycle_segments([1, 5, 1], [0, 0, 0], []) == []
+
+
+def test_matches_reference_on_random_buffers():
+    rng = random.Random(1234)
+    for _ in range(3000):
+        n = rng.randint(1, 200)
+        th, side = random_buffer(rng, n), random_buffer(rng, n)
+        if rng.random() < 0.1:
+            side = []
+        length = len(th) if not side else min(len(th), len(side))
+        peaks = sorted(rng.sample(range(length), rng.randint(0, min(length, 12))))
+        gap = rng.randint(1, 5)
+        expected = reference_segments(th, side, peaks, END_THRESHOLD, gap)
+        actual = [tuple(s) for s in find_cycle_segments(th, side, peaks, END_THRESHOLD, gap)]
+        assert actual == expected, (th, side, peaks, gap)
+
+
+class MemoryDB:
+    def __init__(self):
+        self.cycles = []
+
+    async def save_cycle(self, cycle_data):
+        self.cycles.append(cycle_data)
+        return True
+
+
+def press(peak, n=60):
+    ramp = n // 4
+    return [int(peak * min(1.0, i / ramp, (n - 1 - i) / ramp)) for i in range(n)]
+
+
+def test_split_and_save_cycles_uses_engine_boundaries():
+    th = [0, 10, 30, 30, 10, 0, 0, 0, 0, 15, 35, 35, 15, 0]
+    side = [0, 10, 30, 30, 10, 0, 0, 0, 0, 15, 35, 35, 15, 0]
+    t_buf = [100.0 + 0.1 * i for i in range(len(th))]
+    db = MemoryDB()
+    saved = asyncio.run(
+        split_and_save_cycles(
+            db, None, lambda th, side, kind: kind, lambda name: 3,
+            "G5", "mc3", "L", th, side, [2, 10], 1400, t_buf,
+            poll_interval_sec=0.1, min_duration_s=0, validate_fn=lambda *args: (True, ""),
+        )
+    )
+    assert saved == 2
+    assert [c["th_waveform"] for c in db.cycles] == [[10, 30, 30, 10], [15, 35, 35, 15]]
+    assert all(c["cycle_type"] == "SPLIT" and c["machine"] == 3 for c in db.cycles)
+    assert db.cycles[0]["timestamps"][0] == int(t_buf[1] * 1000)
+
+
+def test_poller_saves_the_same_sub_cycles_as_the_helper():
+    import dwp_poll
+
+    # a 6 s stroke, a 2 s blip (too short), an implausible 6 s stroke, a 7 s stroke
+    broken = press(40)
+    broken[20] += 45
+    th = [0] * 5 + press(40) + [0] * 5 + press(40, 20) + [0] * 5 + broken + [0] * 5 + press(38, 70) + [0] * 5
+    side = list(th)
+    strokes = [(5, 65), (70, 90), (95, 155), (160, 230)]
+    segments = find_cycle_segments(th, side, [th.index(max(th[a:b]), a) for a, b in strokes])
+    assert len(segments) == 4
+    peaks = [s.peak for s in segments]
+
+    poller = dwp_poll.DWPPoller.__new__(dwp_poll.DWPPoller)
+    poller.db = MemoryDB()
+    asyncio.run(poller.split_and_save_cycles("G5", "mc3", "L", th, side, peaks, len(th) * 100, [], segments))
+
+    helper_db = MemoryDB()
+    asyncio.run(
+        split_and_save_cycles(
+            helper_db, None, dwp_poll.determine_quality, dwp_poll.extract_machine_id,
+            "G5", "mc3", "L", th, side, peaks, len(th) * 100, [],
+            dwp_poll.CYCLE_END_THRESHOLD, dwp_poll.SPLIT_MIN_ZERO_GAP,
+            poll_interval_sec=dwp_poll.POLL_INTERVAL_SEC, min_duration_s=dwp_poll.MIN_DURATION_S,
+        )
+    )
+    assert poller.db.cycles == helper_db.cycles
+    # only the two plausible, long enough strokes
+    assert [c["max_th"] for c in poller.db.cycles] == [40, 38]
+    # samples above CYCLE_END_THRESHOLD, 100 ms apart
+    assert [c["duration_s"] for c in poller.db.cycles] == [5.6, 6.6]
+
+
+@pytest.mark.parametrize("n", [500, 5000])
+def test_noisy_multi_peak_buffer_merges_into_first_cycle(n):
+    # every other sample is a peak separated by single low samples, the
+    # worst case for the old per-peak rescans
+    th = [30 if i % 2 else 0 for i in range(n)]
+    peaks = list(range(1, n, 2))
+    segments = find_cycle_segments(th, [0] * n, peaks)
+    assert segments == [CycleSegment(0, 1, 1, 1)]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for flushing over-long cycles from the deadline heap.
+
+Run with: python -m pytest -q test_cycle_timeouts.py
+"""
+
+import asyncio
+
+import pytest
+
+import dwp_poll
+from cycle_buffer import CycleDeadlines
+from dwp_poll import CYCLE_TIMEOUT_SEC, DWPPoller
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def poller(tmp_path, monkeypatch):
+    monkeypatch.setattr(dwp_poll, "SPOOL_PATH", str(tmp_path / "spool.sqlite3"))
+    poller = DWPPoller()
+    poller.monotonic = FakeClock()
+    poller.clock = lambda: 1_750_000_000 + poller.monotonic.now
+    return poller
+
+
+def sample(poller, key, value, at):
+    poller.monotonic.now = at
+    line, machine_name, pos = key.split("-")
+    asyncio.run(poller.process_position(line, machine_name, pos, value, value, key))
+
+
+def queued(poller):
+    items = []
+    while not poller.cycle_queue.empty():
+        line, machine_name, pos, snapshot, duration_ms, cycle_type = poller.cycle_queue.get_nowait()
+        items.append((f"{line}-{machine_name}-{pos}", cycle_type))
+    return items
+
+
+def test_deadlines_pop_in_order():
+    deadlines = CycleDeadlines()
+    deadlines.add(31.0, 1.0, "b")
+    deadlines.add(30.0, 0.0, "a")
+    deadlines.add(31.0, 1.0, "c")
+    assert deadlines.next_deadline() == 30.0
+    assert deadlines.pop_due(30.0) == []
+    assert deadlines.pop_due(31.5) == [(0.0, "a"), (1.0, "b"), (1.0, "c")]
+    assert deadlines.next_deadline() is None and len(deadlines) == 0
+
+
+def test_stalled_cycle_is_saved_as_timeout_once(poller):
+    # G1-mc1-L: starts and then the gateway goes silent
+    sample(poller, "G1-mc1-L", 20, 0.0)
+    assert poller.deadline_event.is_set()
+    # G1-mc1-R: ends normally, then a new cycle starts before the old deadline
+    for i in range(10):
+        sample(poller, "G1-mc1-R", 20, 0.1 * i)
+    for i in range(10, 17):
+        sample(poller, "G1-mc1-R", 0, 0.1 * i)
+    assert queued(poller) == [("G1-mc1-R", "COMPLETE")]
+    sample(poller, "G1-mc1-R", 20, 10.0)
+    # G1-mc2-L: ends normally and stays idle
+    for i in range(10):
+        sample(poller, "G1-mc2-L", 20, 0.1 * i)
+    for i in range(10, 17):
+        sample(poller, "G1-mc2-L", 0, 0.1 * i)
+    queued(poller)
+
+    assert poller.sweep_timeouts(CYCLE_TIMEOUT_SEC - 0.1) == 0
+    assert poller.sweep_timeouts(CYCLE_TIMEOUT_SEC + 0.1) == 1
+    assert queued(poller) == [("G1-mc1-L", "TIMEOUT")]
+    assert poller.cycle_states["G1-mc1-L"].state == "idle"
+    # the restarted cycle keeps running until its own deadline
+    assert poller.cycle_states["G1-mc1-R"].state == "active"
+    assert poller.sweep_timeouts(10.0 + CYCLE_TIMEOUT_SEC + 0.1) == 1
+    assert queued(poller) == [("G1-mc1-R", "TIMEOUT")]
+    # nothing left to save twice
+    assert poller.sweep_timeouts(1000.0) == 0
+    assert len(poller.cycle_deadlines) == 0
+
+
+def test_cycle_dropped_by_a_reload_is_skipped(poller):
+    sample(poller, "G1-mc1-L", 20, 0.0)
+    poller.drop_cycle_states("G1", "mc1")
+    assert poller.sweep_timeouts(CYCLE_TIMEOUT_SEC + 0.1) == 0
+    assert queued(poller) == []
+
+
+def test_sweep_loop_fires_without_new_samples(poller):
+    async def run():
+        task = asyncio.create_task(poller.timeout_sweep_loop())
+        await asyncio.sleep(0)  # waiting for a first deadline
+        poller.monotonic.now = 0.0
+        await poller.process_position("G1", "mc1", "L", 20, 20, "G1-mc1-L")
+        poller.monotonic.now = CYCLE_TIMEOUT_SEC + 1
+        for _ in range(5):
+            await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert queued(poller) == [("G1-mc1-L", "TIMEOUT")]
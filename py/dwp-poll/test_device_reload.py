@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for applying a reloaded ins_dwp_devices config in place.
+
+Run with: python -m pytest -q test_device_reload.py
+"""
+
+import asyncio
+
+import dwp_poll
+from cycle_buffer import CycleState
+from dwp_poll import DeviceConfig, DWPPoller, MachineConfig
+from register_sources import SimulatedRegisterSource
+
+
+def machine(name, base):
+    return MachineConfig(name, base, base + 1, base + 2, base + 3)
+
+
+def active_state():
+    state = CycleState(100)
+    state.start(20, 20, 1000.0, 1.0)
+    return state
+
+
+async def idle(dev):
+    await asyncio.sleep(3600)
+
+
+def test_reload_applies_only_the_differences(tmp_path, monkeypatch):
+    monkeypatch.setattr(dwp_poll, "SPOOL_PATH", str(tmp_path / "spool.sqlite3"))
+    before = {
+        1: DeviceConfig(1, "Press-G1", "10.0.0.1", {"G1": [machine("mc1", 100)]}),
+        2: DeviceConfig(2, "Press-G2", "10.0.0.2", {"G2": [machine("mc1", 200), machine("mc2", 204)]}),
+        3: DeviceConfig(3, "Press-G3", "10.0.0.3", {"G3": [machine("mc1", 300)]}),
+    }
+    after = {
+        1: before[1],
+        # mc2 rewired and the gateway moved
+        2: DeviceConfig(2, "Press-G2", "10.0.0.22", {"G2": [machine("mc1", 200), machine("mc2", 210)]}),
+        4: DeviceConfig(4, "Press-G4", "10.0.0.4", {"G4": [machine("mc1", 400)]}),
+    }
+
+    async def run():
+        poller = DWPPoller()
+        poller.db.pool = object()
+        poller.poll_device = poller.supervise_device = idle
+        poller.devices = dict(before)
+        for dev in before.values():
+            poller.start_device(dev)
+        plans = dict(poller.read_plans)
+        old_tasks = dict(poller.device_tasks)
+        client = poller.clients[2] = SimulatedRegisterSource({})
+        await client.connect()
+        poller.reconnect_events[2] = asyncio.Event()
+        keep_g1, keep_g2 = active_state(), active_state()
+        poller.cycle_states.update({
+            "G1-mc1-L": keep_g1, "G2-mc1-L": keep_g2, "G2-mc2-L": active_state(), "G3-mc1-R": active_state(),
+        })
+        poller.machine_hot_until.update({("G2", "mc1"): 5.0, ("G2", "mc2"): 5.0})
+
+        async def fetch_devices():
+            return dict(after)
+
+        poller.fetch_devices = fetch_devices
+        assert await poller.reload_devices()
+        # nothing changed the second time
+        assert not await poller.reload_devices()
+
+        # unchanged machines keep their buffers and idle-rate state, rewired/removed ones don't
+        assert poller.cycle_states["G1-mc1-L"] is keep_g1
+        assert poller.cycle_states["G2-mc1-L"] is keep_g2
+        assert "G2-mc2-L" not in poller.cycle_states and "G3-mc1-R" not in poller.cycle_states
+        assert poller.machine_hot_until == {("G2", "mc1"): 5.0}
+
+        # only the changed device got a new plan; the new one has one too
+        assert poller.read_plans[1] is plans[1]
+        assert poller.read_plans[2] is not plans[2] and 213 in poller.read_plans[2].addresses
+        assert 4 in poller.read_plans and 3 not in poller.read_plans
+
+        # the moved gateway is reconnected, the removed device is stopped
+        assert 2 not in poller.clients and not client.connected
+        assert poller.reconnect_events[2].is_set()
+        assert old_tasks[3].cancelled() and 3 not in poller.device_tasks
+        assert 4 in poller.device_tasks and poller.device_tasks[1] is old_tasks[1]
+
+        for dev_id in list(poller.devices):
+            await poller.stop_device(dev_id)
+
+    asyncio.run(run())
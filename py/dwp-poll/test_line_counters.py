@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for reserving per-line counts in ins_dwp_line_counters, against a
+small in-memory stand-in for the MySQL statements the poller issues.
+
+Run with: python -m pytest -q test_line_counters.py
+"""
+
+import asyncio
+
+import pytest
+
+from dwp_poll import DatabaseManager
+
+
+class FakeMySQL:
+    """ins_dwp_line_counters + ins_dwp_counts with transactions. Only the
+    committed state is visible outside a transaction."""
+
+    def __init__(self, counters, stored_counts):
+        self.counters = dict(counters)  # line -> count
+        self.stored_counts = dict(stored_counts)  # line -> last count in ins_dwp_counts
+        self.rows = []
+        self.fail_insert = False
+        self.lock_order = []
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.result = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=()):
+        work = self.conn.work
+        if sql.startswith("UPDATE `ins_dwp_line_counters`"):
+            n, line = params
+            self.conn.db.lock_order.append(line)
+            if line in work["counters"]:
+                work["counters"][line] += n
+                self.conn.last_insert_id = work["counters"][line]
+                self.rowcount = 1
+            else:
+                self.rowcount = 0
+        elif "INSERT INTO `ins_dwp_line_counters`" in sql:
+            line, _ = params
+            work["counters"].setdefault(line, self.conn.db.stored_counts.get(line, 0))
+        elif sql == "SELECT LAST_INSERT_ID()":
+            self.result = (self.conn.last_insert_id,)
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    async def fetchone(self):
+        return self.result
+
+    async def executemany(self, sql, rows):
+        assert "INSERT INTO `ins_dwp_counts`" in sql
+        if self.conn.db.fail_insert:
+            raise ConnectionError("Lost connection to MySQL server during query")
+        self.conn.work["rows"].extend(rows)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.work = None
+        self.last_insert_id = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def begin(self):
+        self.work = {"counters": dict(self.db.counters), "rows": []}
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    async def commit(self):
+        self.db.counters = self.work["counters"]
+        self.db.rows.extend(self.work["rows"])
+        self.work = None
+
+    async def rollback(self):
+        self.work = None
+
+
+class FakePool:
+    def __init__(self, db):
+        self.db = db
+
+    def acquire(self):
+        return FakeConnection(self.db)
+
+
+def cycle(line):
+    return {
+        "line": line,
+        "machine": 1,
+        "position": "L",
+        "th_waveform": [0, 30, 0],
+        "side_waveform": [0, 30, 0],
+        "duration_s": 7,
+        "quality_grade": "EXCELLENT",
+        "max_th": 30,
+        "max_side": 30,
+        "sample_count": 3,
+        "cycle_type": "COMPLETE",
+        "ended_at": 1_750_000_000.0,
+    }
+
+
+def manager(db):
+    manager = DatabaseManager({})
+    manager.pool = FakePool(db)
+    manager.use_counter_table = True
+    manager.line_counts_seeded = True
+    return manager
+
+
+def test_mixed_batch_gets_contiguous_ranges_per_line():
+    # G2 has no counter row yet: it starts after its last stored count
+    db = FakeMySQL({"G1": 10}, {"G2": 4})
+    batch = [cycle(line) for line in ("G2", "G1", "G2", "G1", "G1")]
+    asyncio.run(manager(db).insert_cycles(batch))
+
+    assert [(row[0], row[2]) for row in db.rows] == [("G2", 5), ("G1", 11), ("G2", 6), ("G1", 12), ("G1", 13)]
+    assert db.counters == {"G1": 13, "G2": 6}
+    # counter rows are locked in line order, whatever the batch order
+    # (G2 is updated again once its row was created)
+    assert db.lock_order == ["G1", "G2", "G2"]
+
+
+def test_two_pollers_never_hand_out_the_same_count():
+    db = FakeMySQL({"G1": 10}, {})
+    asyncio.run(manager(db).insert_cycles([cycle("G1"), cycle("G1")]))
+    asyncio.run(manager(db).insert_cycles([cycle("G1")]))
+    assert [row[2] for row in db.rows] == [11, 12, 13]
+
+
+def test_failed_insert_leaves_the_counters_unchanged():
+    db = FakeMySQL({"G1": 10}, {"G2": 4})
+    db.fail_insert = True
+    with pytest.raises(ConnectionError):
+        asyncio.run(manager(db).insert_cycles([cycle("G1"), cycle("G2"), cycle("G1")]))
+    assert db.counters == {"G1": 10} and db.rows == []
+
+    # the next batch reuses the rolled-back range
+    db.fail_insert = False
+    asyncio.run(manager(db).insert_cycles([cycle("G1"), cycle("G2")]))
+    assert [(row[0], row[2]) for row in db.rows] == [("G1", 11), ("G2", 5)]
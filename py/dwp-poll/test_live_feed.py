@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for the live waveform feed's delta frames.
+
+Run with: python -m pytest -q test_live_feed.py
+"""
+
+from cycle_buffer import CycleState
+from live_feed import LiveFeed
+
+
+def test_delta_frames_follow_a_cycle():
+    state = CycleState(100)
+    feed = LiveFeed(lambda: {"L1-mc1-L": state})
+    assert feed.delta_frame() == {}
+
+    state.start(10, 11, 1000.0, 1.0)
+    state.append(20, 21, 1000.1, 1.1)
+    assert feed.delta_frame() == {"L1-mc1-L": {"cycle": 1000.0, "offset": 0, "th": [10, 20], "side": [11, 21]}}
+    # nothing new
+    assert feed.delta_frame() == {}
+
+    state.append(30, 31, 1000.2, 1.2)
+    assert feed.delta_frame() == {"L1-mc1-L": {"cycle": 1000.0, "offset": 2, "th": [30], "side": [31]}}
+
+    state.reset()
+    assert feed.delta_frame() == {"L1-mc1-L": None}
+    assert feed.delta_frame() == {}
+
+
+def test_restart_between_frames_resends_from_zero():
+    state = CycleState(100)
+    feed = LiveFeed(lambda: {"L1-mc1-R": state})
+    state.start(10, 10, 1000.0, 1.0)
+    state.append(12, 12, 1000.1, 1.1)
+    feed.delta_frame()
+
+    # ended and a new, longer cycle started before the next frame
+    state.reset()
+    state.start(5, 6, 1001.0, 2.0)
+    state.append(7, 8, 1001.1, 2.1)
+    state.append(9, 9, 1001.2, 2.2)
+    assert feed.delta_frame() == {"L1-mc1-R": {"cycle": 1001.0, "offset": 0, "th": [5, 7, 9], "side": [6, 8, 9]}}
+
+
+def test_full_frame_matches_what_deltas_have_sent():
+    a, b = CycleState(100), CycleState(100)
+    feed = LiveFeed(lambda: {"L1-mc1-L": a, "L1-mc1-R": b})
+    a.start(10, 10, 1000.0, 1.0)
+    feed.delta_frame()
+    a.append(20, 20, 1000.1, 1.1)  # not broadcast yet
+    assert feed.full_frame() == {"L1-mc1-L": {"cycle": 1000.0, "offset": 0, "th": [10], "side": [10]}}
+    assert feed.delta_frame() == {"L1-mc1-L": {"cycle": 1000.0, "offset": 1, "th": [20], "side": [20]}}
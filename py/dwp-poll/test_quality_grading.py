@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled quality grading tables: every grade must match the
+plain comparison chain.
+
+Run with: python -m pytest -q test_quality_grading.py
+"""
+
+import random
+
+import pytest
+
+from quality_grading import GRADE_NAMES, QualityTable, QualityThresholds, reference_grade
+
+DEFAULT_THRESHOLDS = QualityThresholds(30, 45, 25, 55, 15, 70, 10, 80)
+
+
+@pytest.mark.parametrize(
+    "thresholds",
+    [DEFAULT_THRESHOLDS, QualityThresholds(40, 41, 20, 60, 35, 90, 38, 50)],
+)
+def test_table_matches_reference_around_every_threshold(thresholds):
+    table = QualityTable(thresholds)
+    values = list(range(0, 120)) + [200, 1000, 65534, 65535]
+    for th in values:
+        for side in values:
+            assert table.grade(th, side) == reference_grade(th, side, thresholds), (th, side)
+
+
+def test_batch_matches_single_grades():
+    table = QualityTable(DEFAULT_THRESHOLDS)
+    rng = random.Random(3)
+    th = [rng.choice([rng.randint(0, 100), rng.randint(0, 65535)]) for _ in range(5000)]
+    side = [rng.choice([rng.randint(0, 100), rng.randint(0, 65535)]) for _ in range(5000)]
+    assert table.grade_batch(th, side) == [table.grade(a, b) for a, b in zip(th, side)]
+    codes = table.grade_codes(th, side)
+    assert [GRADE_NAMES[c] for c in codes] == table.grade_batch(th, side)
+
+
+def test_cycle_types_pass_through():
+    table = QualityTable(DEFAULT_THRESHOLDS)
+    assert table.grade(35, 35, "TIMEOUT") == "TIMEOUT"
+    assert table.grade(35, 35, "SPLIT") == "EXCELLENT"
+    grades = table.grade_batch([35, 35, 35, 5], [35, 35, 35, 5], ["COMPLETE", "OVERFLOW", "SHORT_CYCLE", "SPLIT"])
+    assert grades == ["EXCELLENT", "OVERFLOW", "SHORT_CYCLE", "SENSOR_LOW"]
+
+
+def test_out_of_range_values_clamp():
+    table = QualityTable(DEFAULT_THRESHOLDS)
+    assert table.grade(-5, 3) == reference_grade(-5, 3, DEFAULT_THRESHOLDS) == "SENSOR_LOW"
+    assert table.grade(70000, 35) == reference_grade(70000, 35, DEFAULT_THRESHOLDS) == "PRESSURE_HIGH"
+    assert table.grade_batch([-5, 70000], [3, 35]) == ["SENSOR_LOW", "PRESSURE_HIGH"]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for merging machine registers into block reads.
+
+Run with: python -m pytest -q test_read_planner.py
+"""
+
+import random
+
+from read_planner import MAX_READ_REGISTERS, ReadBlock, ReadPlan, plan_blocks
+
+# Registers of the fallback Press-G5 device (mc1..mc4, TH/Side L/R each)
+PRESS_G5 = [199, 201, 200, 202, 203, 205, 204, 206, 309, 311, 310, 312, 313, 315, 314, 316]
+
+
+def test_press_g5_is_one_request():
+    plan = ReadPlan(PRESS_G5)
+    assert plan.blocks == [ReadBlock(199, 118)]
+    values = plan.demux([list(range(1000, 1118))])
+    assert values == {addr: 1000 + addr - 199 for addr in PRESS_G5}
+
+
+def test_splits_at_the_register_limit():
+    assert plan_blocks([0, MAX_READ_REGISTERS - 1]) == [ReadBlock(0, MAX_READ_REGISTERS)]
+    assert plan_blocks([0, MAX_READ_REGISTERS]) == [ReadBlock(0, 1), ReadBlock(MAX_READ_REGISTERS, 1)]
+    # unsorted, duplicated: 3..130 would be 128 registers
+    assert plan_blocks([5, 3, 5, 300, 130]) == [ReadBlock(3, 3), ReadBlock(130, 1), ReadBlock(300, 1)]
+    assert plan_blocks([]) == []
+
+
+def test_short_response_reads_missing_addresses_as_zero():
+    plan = ReadPlan([10, 11, 12, 200, 201])
+    assert plan.blocks == [ReadBlock(10, 3), ReadBlock(200, 2)]
+    assert plan.demux([[7, 8], [9]]) == {10: 7, 11: 8, 12: 0, 200: 9, 201: 0}
+    # a block with no response at all
+    assert plan.demux([[7, 8, 9]]) == {10: 7, 11: 8, 12: 9, 200: 0, 201: 0}
+
+
+def test_random_layouts_are_covered_within_the_limit():
+    rng = random.Random(2)
+    for _ in range(300):
+        addresses = [rng.randrange(0, 2000) for _ in range(rng.randint(1, 60))]
+        max_count = rng.choice([4, 50, MAX_READ_REGISTERS])
+        plan = ReadPlan(addresses, max_count)
+        covered = set()
+        for prev, block in zip([None] + plan.blocks, plan.blocks):
+            assert 1 <= block.count <= max_count
+            if prev is not None:
+                # sorted, no overlap, and the greedy packing could not have extended prev
+                assert block.start >= prev.start + max_count
+            covered.update(range(block.start, block.start + block.count))
+        assert set(addresses) <= covered
+        # every register answers with its own address
+        responses = [list(range(b.start, b.start + b.count)) for b in plan.blocks]
+        assert plan.demux(responses) == {addr: addr for addr in set(addresses)}
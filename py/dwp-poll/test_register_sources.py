@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the simulated register source.
+
+Run with: python -m pytest -q test_register_sources.py
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from register_sources import PressSimulator, SimulatedRegisterSource
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_press_goes_through_idle_and_stroke():
+    press = PressSimulator(random.Random(1), 0.0, cycle_seconds=(10.0, 10.0), idle_seconds=(5.0, 5.0), peak=(40, 40))
+    press.start, press.end = 100.0, 110.0
+    assert press.sample(99.9) == (0, 0)
+    th, side = press.sample(105.0)  # hold
+    assert 39 <= th <= 41 and 39 <= side <= 41
+    assert press.sample(100.2)[0] < 10  # ramp
+    # after the stroke: next idle gap, then the next stroke
+    assert press.sample(112.0) == (0, 0)
+    assert press.start == 115.0 and press.end == 125.0
+
+
+def test_registers_map_to_positions_and_unmapped_read_zero():
+    clock = FakeClock()
+    source = SimulatedRegisterSource({0: ("mc1-L", 0), 1: ("mc1-L", 1), 3: ("mc1-R", 0)}, seed=7, latency=0, jitter=0, clock=clock)
+    press = source.presses["mc1-L"]
+    clock.now = press.start + (press.end - press.start) / 2
+
+    async def read():
+        assert await source.connect()
+        return await source.read_input_registers(0, 5)
+
+    values = asyncio.run(read())
+    assert len(values) == 5
+    assert values[0] > 0 and values[1] > 0
+    assert values[2] == 0 and values[4] == 0
+
+
+def test_drops_disconnect_until_reconnected():
+    source = SimulatedRegisterSource({0: ("mc1-L", 0)}, seed=3, latency=0, jitter=0, drop_rate=1.0)
+
+    async def run():
+        await source.connect()
+        with pytest.raises(ConnectionError):
+            await source.read_input_registers(0, 1)
+        assert not source.connected
+        with pytest.raises(ConnectionError):
+            await source.read_input_registers(0, 1)
+        source.drop_rate = 0.0
+        await source.connect()
+        return await source.read_input_registers(0, 1)
+
+    assert len(asyncio.run(run())) == 1
+    assert source.requests == 2
+
+
+def test_simulated_poller_stays_out_of_the_production_database(tmp_path, monkeypatch):
+    import dwp_poll
+
+    monkeypatch.setattr(dwp_poll, "SPOOL_PATH", str(tmp_path / "spool.sqlite3"))
+    with pytest.raises(ValueError):
+        dwp_poll.DWPPoller(simulate_db=dwp_poll.DB_CONFIG["db"])
+    poller = dwp_poll.DWPPoller(simulate_db="dwp_loadtest")
+    assert poller.db.config["db"] == "dwp_loadtest"
+    assert poller.db.spool_path.endswith(".simulate")
+    assert poller.source_factory == poller.simulated_source
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for re-grading stored ins_dwp_counts rows (no database needed).
+
+Run with: python -m pytest -q test_regrade_counts.py
+"""
+
+import json
+
+from quality_grading import QualityTable, QualityThresholds
+from regrade_counts import regrade_chunk, regrade_row
+from waveform_codec import decode_pv, encode_pv
+
+OLD = QualityTable(QualityThresholds(30, 45, 25, 55, 15, 70, 10, 80))
+NEW = QualityTable(QualityThresholds(35, 50, 25, 55, 15, 70, 10, 80))
+
+
+def press(peak, n=60):
+    ramp = n // 4
+    return [int(peak * min(1.0, i / ramp, (n - 1 - i) / ramp)) for i in range(n)]
+
+
+def stored_row(row_id, th, side, cycle_type="COMPLETE", table=OLD, compact=False):
+    """A row the way DatabaseManager.build_count_row writes it."""
+    max_th, max_side = max(th), max(side)
+    pv = {
+        "waveforms": [th, side],
+        "timestamps": [1_750_000_000_000 + 100 * i for i in range(len(th))],
+        "quality": {
+            "grade": table.grade(max_th, max_side, cycle_type),
+            "peaks": {"th": max_th, "side": max_side},
+            "cycle_type": cycle_type,
+            "sample_count": len(th),
+        },
+    }
+    if compact:
+        pv = encode_pv(pv)
+    std_error = table.std_error(max_th, max_side)
+    return (row_id, json.dumps(pv), 6, json.dumps(std_error))
+
+
+def test_unchanged_row_is_skipped():
+    assert regrade_row(stored_row(1, press(40), press(38)), OLD) is None
+
+
+def test_new_bands_change_grade_and_std_error():
+    row_id, pv, std_error, old, new = regrade_row(stored_row(7, press(32), press(33)), NEW)
+    assert (row_id, old, new) == (7, "EXCELLENT", "GOOD")
+    assert json.loads(pv)["quality"]["grade"] == "GOOD"
+    assert json.loads(std_error) == [[0], [0]]
+
+
+def test_compact_pv_keeps_its_samples():
+    row = stored_row(3, press(32), press(33), compact=True)
+    _, pv, _, _, _ = regrade_row(row, NEW)
+    stored, regraded = json.loads(row[1]), json.loads(pv)
+    assert regraded["data"] == stored["data"] and regraded["v"] == 2
+    assert decode_pv(regraded)["quality"]["grade"] == "GOOD"
+
+
+def test_invalid_waveforms():
+    # an impossible jump fails the sanity check
+    th = press(40)
+    th[20] += 45
+    _, pv, _, old, new = regrade_row(stored_row(4, th, press(40)), OLD)
+    assert (old, new) == ("PRESSURE_HIGH", "DEFECTIVE")
+    assert json.loads(pv)["quality"]["cycle_type"] == "INVALID_WAVEFORM"
+    # split sub-cycles are checked too; the row keeps its type for a later run
+    _, pv, _, old, new = regrade_row(stored_row(5, th, press(40), "SPLIT"), OLD)
+    assert (old, new) == ("PRESSURE_HIGH", "DEFECTIVE")
+    quality = json.loads(pv)["quality"]
+    assert (quality["cycle_type"], quality["original_cycle_type"]) == ("INVALID_WAVEFORM", "SPLIT")
+    # a formerly invalid row that passes now is graded as a complete cycle
+    row = stored_row(6, press(40), press(38), "INVALID_WAVEFORM")
+    _, pv, _, _, new = regrade_row(row, OLD)
+    assert new == "EXCELLENT" and json.loads(pv)["quality"]["cycle_type"] == "COMPLETE"
+
+
+def test_restored_split_row_gets_its_type_back():
+    row = stored_row(8, press(40), press(38), "INVALID_WAVEFORM")
+    pv = json.loads(row[1])
+    pv["quality"]["original_cycle_type"] = "SPLIT"
+    _, pv, _, _, new = regrade_row((8, json.dumps(pv), 6, row[3]), OLD)
+    assert new == "EXCELLENT"
+    quality = json.loads(pv)["quality"]
+    assert quality["cycle_type"] == "SPLIT" and "original_cycle_type" not in quality
+
+
+def test_chunk_grades_match_single_rows():
+    rows = [
+        stored_row(1, press(40), press(38), table=QualityTable(QualityThresholds(41, 50, 25, 55, 15, 70, 10, 80))),
+        stored_row(2, press(32), press(33)),
+        stored_row(3, press(60), press(20), "SPLIT"),
+        stored_row(4, press(5), press(6)),
+    ]
+    updates, failed = regrade_chunk(rows, NEW)
+    assert failed == 0
+    assert updates == [u for u in (regrade_row(row, NEW) for row in rows) if u is not None]
+    assert [(u[0], u[3], u[4]) for u in updates] == [(1, "GOOD", "EXCELLENT"), (2, "EXCELLENT", "GOOD")]
+
+
+def test_unreadable_rows_are_counted_not_fatal():
+    updates, failed = regrade_chunk([(1, "not json", 6, "[[1],[1]]"), stored_row(2, press(40), press(40))])
+    assert (updates, failed) == ([], 1)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Equivalence tests: the vectorized checks in waveform_checks must return the
+same verdicts and reasons as the original per-sample implementation, which
+is kept below verbatim as the reference.
+
+Run with: python -m pytest -q test_waveform_checks.py
+"""
+
+import logging
+import random
+import statistics
+from typing import List, Optional, Tuple
+
+import pytest
+
+import waveform_checks
+
+logger = logging.getLogger("DWP.reference")
+
+
+# ----------------------------
+# REFERENCE (pre-numpy) IMPLEMENTATION
+# ----------------------------
+def reference_validate_waveform_sanity(
+    th_waveform: List[int],
+    side_waveform: List[int],
+    sample_count: int,
+    duration_ms: int,
+    position: str,
+    timestamps_ms: Optional[List[int]] = None,
+) -> Tuple[bool, str]:
+    """
+    Returns (is_valid, reason_if_invalid)
+    Flags physically implausible waveforms.
+    """
+    if not th_waveform or not side_waveform:
+        return False, "Empty waveform"
+
+    if len(th_waveform) != len(side_waveform):
+        return False, "TH/Side length mismatch"
+
+    max_th = max(th_waveform)
+    max_side = max(side_waveform)
+    min_th = min(th_waveform)
+    min_side = min(side_waveform)
+
+    # -------------------------
+    # 1. Side pressure near-zero while TH is high → sensor fault
+    #    In split cycles, allow *brief* side drop, but not entire flat zero
+    # -------------------------
+    if max_th >= 30 and max_side <= 3:
+        nonzero_side = sum(1 for v in side_waveform if v > 5)
+        zero_side_ratio = (len(side_waveform) - nonzero_side) / len(side_waveform)
+        if zero_side_ratio > 0.8:  # >80% zeros → likely sensor disconnected
+            return (
+                False,
+                f"Side sensor likely disconnected: TH={max_th}, Side max={max_side}, {zero_side_ratio:.0%} zeros",
+            )
+
+    # -------------------------
+    # 2. Extreme Δ/dt (jumps > 30 in one 100ms sample)
+    # -------------------------
+    for i in range(1, len(th_waveform)):
+        dth = abs(th_waveform[i] - th_waveform[i - 1])
+        dside = abs(side_waveform[i] - side_waveform[i - 1])
+        if dth > 30 or dside > 30:
+            if dth > 40 or dside > 40:
+                return (
+                    False,
+                    f"Impossible pressure jump: ΔTH={dth}, ΔSide={dside} at sample {i}",
+                )
+            # else: log warning but allow (e.g., noise spike)
+            logger.debug(
+                f"⚠️ Large pressure jump ΔTH={dth}, ΔSide={dside} at sample {i}"
+            )
+
+    # -------------------------
+    # 3. Flatline detection
+    # -------------------------
+    if max_th - min_th <= 1 and max_side - min_side <= 1 and sample_count > 3:
+        if max_th == 0 and max_side == 0:
+            return False, "Zero flatline — no cycle detected"
+        return False, "Flatline waveform — no pressure change"
+
+    # -------------------------
+    # 4. Duration vs sample sanity
+    # Expected sample interval: prefer measured median interval if
+    # per-sample timestamps are available. Otherwise fall back to 100ms.
+    # This avoids false "Too few samples" when actual poll interval is
+    # slower than the nominal 100ms due to network/IO latency.
+    # -------------------------
+    median_interval_ms = 100
+    if timestamps_ms and len(timestamps_ms) > 1:
+        try:
+            diffs = [
+                timestamps_ms[i] - timestamps_ms[i - 1]
+                for i in range(1, len(timestamps_ms))
+            ]
+            # ignore zero diffs if any (defensive)
+            diffs = [d for d in diffs if d > 0]
+            if diffs:
+                median_interval_ms = max(1, int(statistics.median(diffs)))
+        except Exception:
+            median_interval_ms = 100
+
+    expected_samples = max(1, round(duration_ms / median_interval_ms))
+    if sample_count < 1 or expected_samples == 0:
+        return False, "Invalid duration or sample count"
+    # Allow sparser buffers now: treat <15% of expected as missed samples
+    if sample_count < expected_samples * 0.15:  # <15% expected → missed samples
+        return (
+            False,
+            f"Too few samples: {sample_count} for {duration_ms}ms (expected ~{expected_samples}, median_interval={median_interval_ms}ms)",
+        )
+
+    # -------------------------
+    # 5. Negative values (shouldn't happen, but guard)
+    # -------------------------
+    if min_th < 0 or min_side < 0:
+        return False, "Negative pressure reading"
+
+    # All passed
+    return True, "OK"
+
+def reference_compute_std_error_flags(
+    th_waveform: List[int],
+    side_waveform: List[int],
+    max_th: int,
+    max_side: int,
+) -> List[List[int]]:
+    """
+    Returns [[th_flag], [side_flag]] where 1 = OK, 0 = suspect
+    Enhances original logic with waveform-aware checks
+    """
+    th_flag = 1 if (30 <= max_th <= 45) else 0
+    side_flag = 1 if (30 <= max_side <= 45) else 0
+
+    # Side sensor likely failed if TH active but Side flat near zero
+    if max_th >= 30 and max_side <= 3:
+        nonzero_side = sum(1 for v in side_waveform if v > 5)
+        if nonzero_side <= 1:
+            side_flag = 0
+
+    # TH sensor likely failed if Side active but TH flat near zero
+    if max_side >= 30 and max_th <= 3:
+        nonzero_th = sum(1 for v in th_waveform if v > 5)
+        if nonzero_th <= 1:
+            th_flag = 0
+
+    # Flatline sensors
+    if len(set(th_waveform)) == 1 and len(th_waveform) > 2:
+        th_flag = 0
+    if len(set(side_waveform)) == 1 and len(side_waveform) > 2:
+        side_flag = 0
+
+    return [[th_flag], [side_flag]]
+
+
+# ----------------------------
+# WAVEFORM GENERATORS
+# ----------------------------
+def press_cycle(rng: random.Random, n: int, peak: int) -> List[int]:
+    """Smooth rise / hold / release shape with a little sensor noise."""
+    rise = max(1, n // 4)
+    out = []
+    for i in range(n):
+        if i < rise:
+            v = peak * i / rise
+        elif i > n - rise:
+            v = peak * (n - i) / rise
+        else:
+            v = peak
+        out.append(max(0, int(v + rng.randint(-2, 2))))
+    return out
+
+
+def timestamps(rng: random.Random, n: int, interval_ms: int = 100, jitter: int = 15) -> List[int]:
+    t = 1_700_000_000_000
+    out = []
+    for _ in range(n):
+        out.append(t)
+        t += max(0, interval_ms + rng.randint(-jitter, jitter))
+    return out
+
+
+def random_case(rng: random.Random):
+    n = rng.randint(0, 120)
+    kind = rng.choice(["press", "noise", "flat", "side_dead", "th_dead", "spiky", "mismatch"])
+    if kind == "press":
+        th, side = press_cycle(rng, n, rng.randint(5, 90)), press_cycle(rng, n, rng.randint(5, 90))
+    elif kind == "noise":
+        th = [rng.randint(0, 100) for _ in range(n)]
+        side = [rng.randint(0, 100) for _ in range(n)]
+    elif kind == "flat":
+        v = rng.choice([0, 1, 20])
+        th, side = [v + rng.randint(0, 1) for _ in range(n)], [v] * n
+    elif kind == "side_dead":
+        th, side = press_cycle(rng, n, rng.randint(30, 60)), [rng.randint(0, 3) for _ in range(n)]
+    elif kind == "th_dead":
+        th, side = [rng.randint(0, 3) for _ in range(n)], press_cycle(rng, n, rng.randint(30, 60))
+    elif kind == "spiky":
+        th, side = press_cycle(rng, n, 40), press_cycle(rng, n, 40)
+        for _ in range(rng.randint(1, 3)):
+            if n:
+                th[rng.randrange(n)] += rng.randint(25, 50)
+    else:
+        th, side = press_cycle(rng, n, 40), press_cycle(rng, n + 1, 40)
+    ts = rng.choice([None, [], timestamps(rng, len(th)), timestamps(rng, len(th), 250, 0)])
+    duration_ms = rng.choice([len(th) * 100, rng.randint(0, 60_000)])
+    sample_count = rng.choice([len(th), rng.randint(0, 200)])
+    return th, side, sample_count, duration_ms, ts
+
+
+# ----------------------------
+# TESTS
+# ----------------------------
+EDGE_CASES = [
+    ([], [], 0, 0, None),
+    ([10], [], 1, 100, None),
+    ([10, 20], [10], 2, 200, None),
+    ([0, 0, 0, 0], [0, 0, 0, 0], 4, 400, None),
+    ([20, 21, 20, 21], [5, 5, 5, 5], 4, 400, None),
+    ([0, 31, 0], [0, 10, 0], 3, 300, None),
+    ([0, 41, 0], [0, 10, 0], 3, 300, None),
+    ([0, 35, 80], [0, 0, 0], 3, 300, None),
+    ([40] * 10, [0] * 10, 10, 1000, None),
+    ([0, 10, 20, 30, 20, 10], [0, 10, 20, 30, 20, 10], 6, 60_000, [0, 100, 200, 300, 400, 500]),
+    ([0, 10, 20, 30, 20, 10], [0, 10, 20, 30, 20, 10], 6, 600, [5, 5, 5, 5, 5, 5]),
+    ([0, 10, 20, 30, 20, 10], [0, 10, 20, 30, 20, 10], 6, 600, [0, 100, 300, 600, 1000, 1500]),
+    ([-1, 10, 20, 30], [0, 10, 20, 30], 4, 400, None),
+    ([0, 10, 20, 30], [0, 10, 20, 30], 0, 400, None),
+]
+
+
+@pytest.mark.parametrize("case", EDGE_CASES)
+def test_validate_matches_reference_on_edge_cases(case):
+    th, side, sample_count, duration_ms, ts = case
+    expected = reference_validate_waveform_sanity(th, side, sample_count, duration_ms, "L", ts)
+    assert waveform_checks.validate_waveform_sanity(th, side, sample_count, duration_ms, "L", ts) == expected
+
+
+def test_validate_matches_reference_on_random_waveforms():
+    rng = random.Random(20240611)
+    for _ in range(5000):
+        th, side, sample_count, duration_ms, ts = random_case(rng)
+        expected = reference_validate_waveform_sanity(th, side, sample_count, duration_ms, "R", ts)
+        actual = waveform_checks.validate_waveform_sanity(th, side, sample_count, duration_ms, "R", ts)
+        assert actual == expected, (th, side, sample_count, duration_ms, ts)
+
+
+def test_validate_accepts_numpy_input():
+    np = pytest.importorskip("numpy")
+    th, side = [0, 10, 20, 30, 20, 10], [0, 12, 22, 31, 20, 10]
+    ts = [0, 100, 200, 300, 400, 500]
+    assert waveform_checks.validate_waveform_sanity(
+        np.array(th), np.array(side), 6, 500, "L", np.array(ts)
+    ) == reference_validate_waveform_sanity(th, side, 6, 500, "L", ts)
+
+
+def test_large_jump_debug_logs_match_reference(caplog):
+    th, side = [0, 32, 0, 35, 0, 45, 0], [10, 10, 10, 10, 10, 10, 10]
+    with caplog.at_level(logging.DEBUG):
+        reference_validate_waveform_sanity(th, side, 7, 700, "L")
+        waveform_checks.validate_waveform_sanity(th, side, 7, 700, "L")
+    reference = [r.getMessage() for r in caplog.records if r.name == "DWP.reference"]
+    vectorized = [r.getMessage() for r in caplog.records if r.name == "DWP"]
+    assert reference == vectorized
+    assert len(vectorized) == 4
+
+
+def test_std_error_flags_match_reference_on_random_waveforms():
+    rng = random.Random(7)
+    for _ in range(5000):
+        th, side, _, _, _ = random_case(rng)
+        if not th or not side:
+            continue
+        max_th, max_side = max(th), max(side)
+        expected = reference_compute_std_error_flags(th, side, max_th, max_side)
+        actual = waveform_checks.compute_std_error_flags(th, side, max_th, max_side, 30, 45)
+        assert actual == expected, (th, side)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact pv encoding.
+
+The vectors in tests/Fixtures/dwp_pv_compact.json are also decoded by the
+Laravel side (tests/Unit/InsDwpCountPvTest.php), so both decoders are held
+to the same bytes.
+
+Run with: python -m pytest -q test_waveform_codec.py
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from waveform_codec import PV_FORMAT_COMPACT, decode_pv, encode_pv
+
+FIXTURES = Path(__file__).resolve().parents[2] / "tests" / "Fixtures" / "dwp_pv_compact.json"
+QUALITY = {"grade": "GOOD", "peaks": {"th": 40, "side": 41}, "cycle_type": "COMPLETE", "sample_count": 4}
+
+
+def pv(th, side, timestamps=None) -> dict:
+    data = {"waveforms": [th, side], "quality": QUALITY}
+    if timestamps is not None:
+        data["timestamps"] = timestamps
+    return data
+
+
+@pytest.mark.parametrize("case", json.loads(FIXTURES.read_text()), ids=lambda case: case["name"])
+def test_shared_vectors(case):
+    assert decode_pv(case["encoded"]) == case["decoded"]
+    assert decode_pv(json.dumps(encode_pv(case["decoded"]))) == case["decoded"]
+
+
+def test_round_trip_with_timestamps():
+    data = pv([0, 20, 40, 0], [0, 21, 41, 0], [1700000000000, 1700000000100, 1700000000199, 1700000000301])
+    encoded = encode_pv(data)
+    assert encoded["v"] == PV_FORMAT_COMPACT and encoded["quality"] == QUALITY
+    assert decode_pv(json.dumps(encoded)) == data
+
+
+def test_round_trip_without_timestamps():
+    encoded = encode_pv(pv([0, 20, 40, 0], [0, 21, 41, 0]))
+    assert encoded["t0"] is None
+    assert decode_pv(encoded) == pv([0, 20, 40, 0], [0, 21, 41, 0], [])
+
+
+def test_round_trip_empty_waveforms():
+    encoded = encode_pv(pv([], []))
+    assert encoded["n"] == 0
+    assert decode_pv(encoded) == pv([], [], [])
+
+
+def test_deltas_wrap_around_u16():
+    # 65535 -> 0 and 0 -> 65535 are stored as deltas of 1 and 65535
+    data = pv([65535, 0, 65535, 1], [0, 65535, 0, 65534], [0, 65535, 65535, 131070])
+    assert decode_pv(encode_pv(data)) == data
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        pv([0, -1, 3, 0], [0, 1, 2, 0]),  # negative sample
+        pv([0, 1, 2, 0], [0, 65536, 2, 0]),  # sample above 16 bits
+        pv([0, 1, 2, 0], [0, 1, 2]),  # unequal channel lengths
+        pv([0, 1, 2, 0], [0, 1, 2, 0], [0, 100, 200]),  # timestamp count mismatch
+        pv([0, 1, 2, 0], [0, 1, 2, 0], [0, 100, 65636, 65736]),  # gap over 65535 ms
+        pv([0, 1, 2, 0], [0, 1, 2, 0], [0, 100, 50, 150]),  # timestamps going back
+    ],
+)
+def test_falls_back_to_json(data):
+    assert encode_pv(data) is data
+    assert decode_pv(json.dumps(data)) == data
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        decode_pv({"v": PV_FORMAT_COMPACT, "enc": "lz4", "n": 0, "data": ""})
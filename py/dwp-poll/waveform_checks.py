@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+import logging
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Vectorized waveform sanity checks used by the poller before a cycle is
+# graded. They work on numpy arrays so the cost per cycle stays flat when the
+# sample rate goes up, and return exactly the same verdicts (and reasons) as
+# the original per-sample loops. The checks themselves run on a WaveformStats
+# summary, which the streaming cycle analyzer can also produce incrementally.
+
+logger = logging.getLogger("DWP")
+
+
+def _as_array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.int64)
+
+
+class WaveformStats(NamedTuple):
+    """Everything the sanity checks and std_error flags need from a waveform.
+
+    Built in one vectorized pass by waveform_stats(), or sample by sample by
+    cycle_analyzer.CycleAnalyzer while the cycle is still being polled.
+    """
+
+    length: int
+    max_th: int
+    min_th: int
+    max_side: int
+    min_side: int
+    th_over_5: int  # samples with TH > 5
+    side_over_5: int  # samples with Side > 5
+    # (sample, ΔTH, ΔSide) of the first jump > 40, and jumps > 30 before it
+    first_hard_jump: Optional[Tuple[int, int, int]]
+    large_jumps: Tuple[Tuple[int, int, int], ...]
+    median_interval_ms: Optional[int]  # None without usable timestamps
+
+
+def waveform_stats(
+    th_waveform: Sequence[int],
+    side_waveform: Sequence[int],
+    timestamps_ms: Optional[Sequence[int]] = None,
+) -> WaveformStats:
+    th = _as_array(th_waveform)
+    side = _as_array(side_waveform)
+
+    first_hard_jump = None
+    large_jumps: Tuple[Tuple[int, int, int], ...] = ()
+    if len(th) > 1:
+        dth = np.abs(np.diff(th))
+        dside = np.abs(np.diff(side))
+        hard = np.flatnonzero((dth > 40) | (dside > 40))
+        first_hard = int(hard[0]) if hard.size else len(dth)
+        if hard.size:
+            first_hard_jump = (first_hard + 1, int(dth[first_hard]), int(dside[first_hard]))
+        if logger.isEnabledFor(logging.DEBUG):
+            # only needed for the debug log, skip the scan otherwise
+            large_jumps = tuple(
+                (int(j) + 1, int(dth[j]), int(dside[j]))
+                for j in np.flatnonzero((dth[:first_hard] > 30) | (dside[:first_hard] > 30))
+            )
+
+    median_interval_ms = None
+    if timestamps_ms is not None and len(timestamps_ms) > 1:
+        try:
+            diffs = np.diff(_as_array(timestamps_ms))
+            # ignore zero diffs if any (defensive)
+            diffs = diffs[diffs > 0]
+            if diffs.size:
+                median_interval_ms = max(1, int(np.median(diffs)))
+        except Exception:
+            median_interval_ms = None
+
+    return WaveformStats(
+        length=len(th),
+        max_th=int(th.max()),
+        min_th=int(th.min()),
+        max_side=int(side.max()),
+        min_side=int(side.min()),
+        th_over_5=int(np.count_nonzero(th > 5)),
+        side_over_5=int(np.count_nonzero(side > 5)),
+        first_hard_jump=first_hard_jump,
+        large_jumps=large_jumps,
+        median_interval_ms=median_interval_ms,
+    )
+
+
+def check_waveform_stats(stats: WaveformStats, sample_count: int, duration_ms: int) -> Tuple[bool, str]:
+    """
+    Returns (is_valid, reason_if_invalid) for a non-empty waveform.
+    """
+    max_th, min_th = stats.max_th, stats.min_th
+    max_side, min_side = stats.max_side, stats.min_side
+
+    # 1. Side pressure near-zero while TH is high → sensor fault.
+    #    In split cycles, allow *brief* side drop, but not entire flat zero
+    if max_th >= 30 and max_side <= 3:
+        zero_side_ratio = (stats.length - stats.side_over_5) / stats.length
+        if zero_side_ratio > 0.8:  # >80% zeros → likely sensor disconnected
+            return (
+                False,
+                f"Side sensor likely disconnected: TH={max_th}, Side max={max_side}, {zero_side_ratio:.0%} zeros",
+            )
+
+    # 2. Extreme Δ/dt (jumps > 30 in one 100ms sample); > 40 is impossible
+    if logger.isEnabledFor(logging.DEBUG):
+        # noise spikes before the first impossible jump are only logged
+        for sample, dth, dside in stats.large_jumps:
+            logger.debug(f"⚠️ Large pressure jump ΔTH={dth}, ΔSide={dside} at sample {sample}")
+    if stats.first_hard_jump is not None:
+        sample, dth, dside = stats.first_hard_jump
+        return False, f"Impossible pressure jump: ΔTH={dth}, ΔSide={dside} at sample {sample}"
+
+    # 3. Flatline detection
+    if max_th - min_th <= 1 and max_side - min_side <= 1 and sample_count > 3:
+        if max_th == 0 and max_side == 0:
+            return False, "Zero flatline — no cycle detected"
+        return False, "Flatline waveform — no pressure change"
+
+    # 4. Duration vs sample sanity. Prefer the measured median interval when
+    #    per-sample timestamps are available, otherwise assume 100ms; slower
+    #    real polling must not read as "Too few samples".
+    median_interval_ms = stats.median_interval_ms or 100
+
+    expected_samples = max(1, round(duration_ms / median_interval_ms))
+    if sample_count < 1 or expected_samples == 0:
+        return False, "Invalid duration or sample count"
+    # Allow sparser buffers now: treat <15% of expected as missed samples
+    if sample_count < expected_samples * 0.15:
+        return (
+            False,
+            f"Too few samples: {sample_count} for {duration_ms}ms (expected ~{expected_samples}, median_interval={median_interval_ms}ms)",
+        )
+
+    # 5. Negative values (shouldn't happen, but guard)
+    if min_th < 0 or min_side < 0:
+        return False, "Negative pressure reading"
+
+    return True, "OK"
+
+
+def validate_waveform_sanity(
+    th_waveform: Sequence[int],
+    side_waveform: Sequence[int],
+    sample_count: int,
+    duration_ms: int,
+    position: str,
+    timestamps_ms: Optional[Sequence[int]] = None,
+) -> Tuple[bool, str]:
+    """
+    Returns (is_valid, reason_if_invalid)
+    Flags physically implausible waveforms.
+    """
+    if th_waveform is None or side_waveform is None or len(th_waveform) == 0 or len(side_waveform) == 0:
+        return False, "Empty waveform"
+
+    if len(th_waveform) != len(side_waveform):
+        return False, "TH/Side length mismatch"
+
+    return check_waveform_stats(
+        waveform_stats(th_waveform, side_waveform, timestamps_ms), sample_count, duration_ms
+    )
+
+
+def compute_std_error_flags(
+    th_waveform: Sequence[int],
+    side_waveform: Sequence[int],
+    max_th: int,
+    max_side: int,
+    good_min: int,
+    good_max: int,
+) -> List[List[int]]:
+    """
+    Returns [[th_flag], [side_flag]] where 1 = OK, 0 = suspect
+    """
+    th = _as_array(th_waveform)
+    side = _as_array(side_waveform)
+    th_flag = 1 if (good_min <= max_th <= good_max) else 0
+    side_flag = 1 if (good_min <= max_side <= good_max) else 0
+
+    # Side sensor likely failed if TH active but Side flat near zero
+    if max_th >= 30 and max_side <= 3 and np.count_nonzero(side > 5) <= 1:
+        side_flag = 0
+
+    # TH sensor likely failed if Side active but TH flat near zero
+    if max_side >= 30 and max_th <= 3 and np.count_nonzero(th > 5) <= 1:
+        th_flag = 0
+
+    # Flatline sensors
+    if th.size > 2 and th.min() == th.max():
+        th_flag = 0
+    if side.size > 2 and side.min() == side.max():
+        side_flag = 0
+
+    return [[th_flag], [side_flag]]
+
+
+def std_error_flags_from_stats(stats: WaveformStats, good_min: int, good_max: int) -> List[List[int]]:
+    """compute_std_error_flags() for a waveform already summarised as WaveformStats."""
+    max_th, max_side = stats.max_th, stats.max_side
+    th_flag = 1 if (good_min <= max_th <= good_max) else 0
+    side_flag = 1 if (good_min <= max_side <= good_max) else 0
+
+    if max_th >= 30 and max_side <= 3 and stats.side_over_5 <= 1:
+        side_flag = 0
+    if max_side >= 30 and max_th <= 3 and stats.th_over_5 <= 1:
+        th_flag = 0
+
+    if stats.length > 2 and stats.min_th == stats.max_th:
+        th_flag = 0
+    if stats.length > 2 and stats.min_side == stats.max_side:
+        side_flag = 0
+
+    return [[th_flag], [side_flag]]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+import base64
+import json
+import struct
+import zlib
+from typing import Optional, Union
+
+# Compact encoding for the `pv` column of ins_dwp_counts.
+#
+# Format 1 (legacy, still the default) is plain JSON:
+#   {"waveforms": [[th...], [side...]], "timestamps": [epoch_ms...], "quality": {...}}
+#
+# Format 2 keeps `quality` as plain JSON but packs the samples:
+#   {"v": 2, "enc": "zlib-delta-u16le", "n": N, "t0": first_epoch_ms | null,
+#    "data": base64(zlib(dth[N] + dside[N] + dt[N-1])), "quality": {...}}
+# where every value is a little-endian uint16, dth/dside are the first value
+# followed by sample-to-sample differences (mod 2^16) and dt are the
+# millisecond gaps between consecutive timestamps (omitted when t0 is null).
+# Pressure curves are smooth and the gaps sit near the poll interval, so the
+# blob compresses to a small fraction of the JSON text. The Laravel side decodes both formats with
+# InsDwpCount::decodePv().
+
+PV_FORMAT_COMPACT = 2
+PV_ENCODING_NAME = "zlib-delta-u16le"
+_U16_MAX = 0xFFFF
+
+
+def _fits_u16(values) -> bool:
+    return all(0 <= v <= _U16_MAX for v in values)
+
+
+def _delta_u16(values) -> list:
+    return [(b - a) & _U16_MAX for a, b in zip([0] + values, values)]
+
+
+def _undelta_u16(deltas) -> list:
+    out, acc = [], 0
+    for d in deltas:
+        acc = (acc + d) & _U16_MAX
+        out.append(acc)
+    return out
+
+
+def encode_pv(pv_data: dict) -> dict:
+    """Pack the waveforms/timestamps of a legacy pv dict into format 2.
+
+    Returns `pv_data` unchanged when it cannot be represented losslessly
+    (non-16-bit samples, unequal channel lengths, gaps over 65.5 s or
+    non-monotonic timestamps).
+    """
+    waveforms = pv_data.get("waveforms") or [[], []]
+    th, side = list(waveforms[0]), list(waveforms[1])
+    timestamps = pv_data.get("timestamps")
+    n = len(th)
+
+    if len(side) != n or not _fits_u16(th) or not _fits_u16(side):
+        return pv_data
+
+    dt = []
+    if timestamps:
+        if len(timestamps) != n:
+            return pv_data
+        dt = [int(b) - int(a) for a, b in zip(timestamps, timestamps[1:])]
+        if not _fits_u16(dt):
+            return pv_data
+
+    blob = struct.pack(f"<{2 * n + len(dt)}H", *_delta_u16(th), *_delta_u16(side), *dt)
+    encoded = {
+        "v": PV_FORMAT_COMPACT,
+        "enc": PV_ENCODING_NAME,
+        "n": n,
+        "t0": int(timestamps[0]) if timestamps else None,
+        "data": base64.b64encode(zlib.compress(blob)).decode("ascii"),
+    }
+    # keep any other keys (quality, ...) readable as plain JSON
+    for key, value in pv_data.items():
+        if key not in ("waveforms", "timestamps"):
+            encoded[key] = value
+    return encoded
+
+
+def decode_pv(pv: Union[str, bytes, dict, None]) -> Optional[dict]:
+    """Decode a pv value (JSON text or dict, either format) to the legacy shape."""
+    if pv is None:
+        return None
+    data = json.loads(pv) if isinstance(pv, (str, bytes)) else dict(pv)
+    if not isinstance(data, dict) or data.get("v") != PV_FORMAT_COMPACT:
+        return data
+    if data.get("enc") != PV_ENCODING_NAME:
+        raise ValueError(f"Unsupported pv encoding: {data.get('enc')}")
+
+    n = int(data.pop("n"))
+    t0 = data.pop("t0", None)
+    raw = zlib.decompress(base64.b64decode(data.pop("data")))
+    values = struct.unpack(f"<{len(raw) // 2}H", raw)
+    data.pop("v")
+    data.pop("enc")
+
+    timestamps = []
+    if t0 is not None:
+        timestamps = [int(t0)]
+        for gap in values[2 * n :]:
+            timestamps.append(timestamps[-1] + gap)
+    decoded = {
+        "waveforms": [_undelta_u16(values[:n]), _undelta_u16(values[n : 2 * n])],
+        "timestamps": timestamps,
+    }
+    decoded.update(data)
+    return decoded
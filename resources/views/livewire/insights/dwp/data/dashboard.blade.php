@@ -187,8 +187,8 @@ public function updateData()
             $rightLast = $latestCounts->where('mechine', $machineName)->where('position', 'R')->first();
 
             // Parse enhanced PV structure
-            $leftPv = $leftLast ? (json_decode($leftLast->pv, true) ?? null) : null;
-            $rightPv = $rightLast ? (json_decode($rightLast->pv, true) ?? null) : null;
+            $leftPv = $leftLast ? (InsDwpCount::decodePv($leftLast->pv) ?: null) : null;
+            $rightPv = $rightLast ? (InsDwpCount::decodePv($rightLast->pv) ?: null) : null;
 
             // Extract waveforms from enhanced PV structure
             $leftWaveforms = $leftPv['waveforms'] ?? [[0], [0]];
@@ -207,7 +207,7 @@ public function updateData()
             $allPeaks = [];
             if (isset($recentRecords[$machineName])) {
                 foreach ($recentRecords[$machineName] as $record) {
-                    $decodedPv = json_decode($record->pv, true) ?? [];
+                    $decodedPv = InsDwpCount::decodePv($record->pv);
                     // Check for enhanced PV structure
                     if (isset($decodedPv['waveforms']) && is_array($decodedPv['waveforms'])) {
                         // Use waveforms from enhanced structure
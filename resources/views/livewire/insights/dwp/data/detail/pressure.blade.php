@@ -64,7 +64,7 @@ private function getMax(array $array)
     private function renderPressureChartClient()
     {
         $isTimeAxis = false;
-        $pvRaw = json_decode($this->detail['pv'] ?? '[]', true);
+        $pvRaw = InsDwpCount::decodePv($this->detail['pv'] ?? '[]');
         $waveforms = $pvRaw['waveforms'] ?? [];
         $duration = (int) ($this->detail['duration'] ?? 0);
         // Get values and timestamps
@@ -330,7 +330,7 @@ private function generateCharts()
         // Loop through each database record - optimized processing
         foreach ($counts as $count) {
             // Decode JSON once
-            $arrayPv = is_string($count->pv) ? json_decode($count->pv, true) : $count->pv;
+            $arrayPv = InsDwpCount::decodePv($count->pv);
             
             if (!is_array($arrayPv)) {
                 continue;
@@ -506,7 +506,7 @@ private function generatePressureSummaryChart($data)
             }
 
             // Parse the PV data
-            $arrayPv = is_string($record->pv) ? json_decode($record->pv, true) : $record->pv;
+            $arrayPv = InsDwpCount::decodePv($record->pv);
             
             if (!is_array($arrayPv)) {
                 continue;
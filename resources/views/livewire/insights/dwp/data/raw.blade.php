@@ -275,7 +275,7 @@ public function with(): array
         if ($this->status) {
             $allCounts = $query->get();
             $filteredCounts = $allCounts->filter(function($count) {
-                $pv = json_decode($count->pv, true);
+                $pv = InsDwpCount::decodePv($count->pv);
                 if (!isset($pv['waveforms']) || !isset($pv['timestamps'])) {
                     return false;
                 }
@@ -417,9 +417,9 @@ public function download($type)
                     $this->getCountsQuery()->chunk(1000, function ($counts) use ($file) {
                         foreach ($counts as $count) {
                             $device = $this->getDeviceForLine($count->line);
-                            $pv = json_decode($count->pv, true)['waveforms'];
-                            $toe = $this->getMedian($pv[0]);
-                            $side = $this->getMedian($pv[1]);
+                            $pv = InsDwpCount::decodePv($count->pv)['waveforms'] ?? [];
+                            $toe = $this->getMedian($pv[0] ?? []);
+                            $side = $this->getMedian($pv[1] ?? []);
                             
                             // Get standards specific to this count's line and machine
                             $standards = $this->getStandardsForCount($count->line, $count->mechine);
@@ -719,10 +719,11 @@ private function repeatWaveform(array $valuesRaw, array $timestampsRaw, int $dur
                         @endphp
                         @foreach ($counts as $count)
                             @php
-                                $pv = json_decode($count->pv, true)['waveforms'];
-                                $pvTimestamp = json_decode($count->pv, true)['timestamps'];
-                                $toeHeelArray = $this->repeatWaveform($pv[0] ?? null, $pvTimestamp ?? [], (int)($count->duration ?? 0));
-                                $sideArray = $this->repeatWaveform($pv[1] ?? null, $pvTimestamp ?? [], (int)($count->duration ?? 0));
+                                $decoded = InsDwpCount::decodePv($count->pv);
+                                $pv = $decoded['waveforms'] ?? [];
+                                $pvTimestamp = $decoded['timestamps'] ?? [];
+                                $toeHeelArray = $this->repeatWaveform($pv[0] ?? [], $pvTimestamp, (int)($count->duration ?? 0));
+                                $sideArray = $this->repeatWaveform($pv[1] ?? [], $pvTimestamp, (int)($count->duration ?? 0));
 
                                 $toeHeelValue = $toeHeelArray ? $this->getMedian($toeHeelArray) : null;
                                 $sideValue = $sideArray ? $this->getMedian($sideArray) : null;
@@ -0,0 +1,27 @@
+<?php
+
+use App\Models\InsDwpCount;
+
+// Vectors written by py/dwp-poll/waveform_codec.py::encode_pv; the Python
+// tests (test_waveform_codec.py) decode the same file.
+dataset('compact pv', function () {
+    $cases = json_decode(file_get_contents(__DIR__ . '/../Fixtures/dwp_pv_compact.json'), true);
+    foreach ($cases as $case) {
+        yield $case['name'] => [$case['encoded'], $case['decoded']];
+    }
+});
+
+test('decodePv reads the compact format written by the poller', function (string $encoded, array $decoded) {
+    expect(InsDwpCount::decodePv($encoded))->toEqual($decoded);
+})->with('compact pv');
+
+test('decodePv passes plain JSON through', function () {
+    $pv = [
+        'waveforms' => [[0, 12, 30, 0], [0, 11, 31, 0]],
+        'timestamps' => [1700000000000, 1700000000100, 1700000000200, 1700000000300],
+        'quality' => ['grade' => 'GOOD'],
+    ];
+
+    expect(InsDwpCount::decodePv(json_encode($pv)))->toEqual($pv);
+    expect(InsDwpCount::decodePv($pv))->toEqual($pv);
+});